@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la recherche de voisins en ligne : similarité exacte vs candidats MinHash/LSH re-scorés (rappel, latence).
+
+Usage : python benchmarks/bench_collaborative_lsh.py [processed_data/engine_bundle] [--users 200] [--bands 32 64 128]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from recommendation_engine.bundle import load_bundle
+from recommendation_engine.collaborative_filtering import CollaborativeFilteringRecommender
+from recommendation_engine.user_index import UserInteractionIndex
+from config import RECOMMENDATION_CONFIG
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('bundle_path', nargs='?', default='processed_data/engine_bundle')
+    parser.add_argument('--users', type=int, default=200, help="Nombre d'utilisateurs échantillonnés")
+    parser.add_argument('--hashes', type=int, default=RECOMMENDATION_CONFIG['lsh_hashes'])
+    parser.add_argument('--bands', type=int, nargs='+', default=[32, 64, 128])
+    args = parser.parse_args()
+
+    bundle = load_bundle(args.bundle_path)
+    user_interactions = bundle.user_interactions
+    user_index = UserInteractionIndex(user_interactions)
+    k = RECOMMENDATION_CONFIG['max_similar_users']
+    base_config = dict(RECOMMENDATION_CONFIG, collaborative_mode='user', user_neighbours='on_request')
+
+    exact = CollaborativeFilteringRecommender(user_interactions, bundle.articles_metadata,
+                                              dict(base_config, neighbour_search='exact'), user_index)
+    rng = np.random.default_rng(0)
+    sampled = rng.choice(len(exact.user_to_idx), min(args.users, len(exact.user_to_idx)), replace=False).tolist()
+
+    def run(recommender):
+        latencies, neighbours = [], []
+        for user_idx in sampled:
+            start = time.perf_counter()
+            users, _ = recommender._find_similar_users(user_idx, k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            neighbours.append(set(users.tolist()))
+        return np.array(latencies), neighbours
+
+    exact_latencies, reference = run(exact)
+    print(f"{len(sampled)} utilisateurs, {len(exact.user_to_idx)} utilisateurs indexés, {k} voisins\n")
+    print(f"{'recherche':<22}{'construction (s)':>18}{'ms/requête':>12}{'p95 (ms)':>10}{'candidats':>11}{f'rappel@{k}':>12}")
+    print(f"{'exacte':<22}{'-':>18}{exact_latencies.mean():>12.2f}{np.percentile(exact_latencies, 95):>10.2f}"
+          f"{'-':>11}{1.0:>12.3f}")
+
+    for n_bands in args.bands:
+        config = dict(base_config, neighbour_search='lsh', lsh_hashes=args.hashes, lsh_bands=n_bands)
+        start = time.perf_counter()
+        recommender = CollaborativeFilteringRecommender(user_interactions, bundle.articles_metadata, config, user_index)
+        build_s = time.perf_counter() - start
+        latencies, found = run(recommender)
+        n_candidates = np.mean([len(recommender.lsh_index.candidates(recommender.interactions.row(user_idx).indices))
+                                for user_idx in sampled])
+        recall = np.mean([len(ref & res) / len(ref) for ref, res in zip(reference, found) if ref])
+        name = f"lsh ({args.hashes}h, {n_bands}b)"
+        print(f"{name:<22}{build_s:>18.2f}{latencies.mean():>12.2f}{np.percentile(latencies, 95):>10.2f}"
+              f"{n_candidates:>11.0f}{recall:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark du filtrage collaboratif : mode user-based vs mode item-item (construction, latence, recouvrement).
+
+Usage : python benchmarks/bench_collaborative_modes.py [processed_data/engine_bundle] [--users 200] [--n 10]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from recommendation_engine.bundle import load_bundle
+from recommendation_engine.collaborative_filtering import CollaborativeFilteringRecommender
+from recommendation_engine.user_index import UserInteractionIndex
+from config import RECOMMENDATION_CONFIG
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('bundle_path', nargs='?', default='processed_data/engine_bundle')
+    parser.add_argument('--users', type=int, default=200, help="Nombre d'utilisateurs échantillonnés")
+    parser.add_argument('--n', type=int, default=10, help="Nombre de recommandations par utilisateur")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    bundle = load_bundle(args.bundle_path)
+    user_interactions = bundle.user_interactions
+    user_index = UserInteractionIndex(user_interactions)
+
+    variants = {
+        'user (à la requête)': dict(collaborative_mode='user', user_neighbours='on_request'),
+        'user (table)': dict(collaborative_mode='user', user_neighbours='table'),
+        'item-item': dict(collaborative_mode='item'),
+    }
+    rng = np.random.default_rng(0)
+    sampled_users = rng.choice(user_index.user_ids, min(args.users, len(user_index.user_ids)), replace=False).tolist()
+    print(f"{len(sampled_users)} utilisateurs, {len(user_interactions)} interactions, n={args.n}\n")
+    print(f"{'mode':<22}{'construction (s)':>18}{'ms/requête':>12}{'p95 (ms)':>10}{'recouvrement':>14}")
+
+    reference = None
+    for name, overrides in variants.items():
+        config = dict(RECOMMENDATION_CONFIG, neighbour_workers=args.workers, **overrides)
+        start = time.perf_counter()
+        recommender = CollaborativeFilteringRecommender(user_interactions, bundle.articles_metadata, config, user_index)
+        build_s = time.perf_counter() - start
+
+        latencies, results = [], []
+        for user_id in sampled_users:
+            start = time.perf_counter()
+            scores = recommender.recommend(user_id, args.n)
+            latencies.append((time.perf_counter() - start) * 1000)
+            results.append(set(sorted(scores, key=scores.get, reverse=True)[:args.n]))
+        if reference is None:
+            reference = results
+        overlap = np.mean([len(ref & res) / max(1, len(ref)) for ref, res in zip(reference, results)])
+        print(f"{name:<22}{build_s:>18.2f}{np.mean(latencies):>12.2f}{np.percentile(latencies, 95):>10.2f}{overlap:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la recherche content-based : recherche exacte vs index IVF (recall@k et latence).
+
+Usage : python benchmarks/bench_content_ann.py [processed_data/engine_bundle] [--users 500] [--k 50]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from recommendation_engine.bundle import load_bundle
+from recommendation_engine.ann_index import IVFIndex, IVF_ARRAYS
+from recommendation_engine.content_based import ContentBasedRecommender
+from recommendation_engine.user_index import UserInteractionIndex
+from config import RECOMMENDATION_CONFIG
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('bundle_path', nargs='?', default='processed_data/engine_bundle')
+    parser.add_argument('--users', type=int, default=500, help="Nombre d'utilisateurs échantillonnés")
+    parser.add_argument('--k', type=int, default=50, help="Nombre de candidats demandés (k du recall@k)")
+    parser.add_argument('--n-lists', type=int, default=None)
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    bundle = load_bundle(args.bundle_path)
+    articles_metadata = bundle.articles_metadata
+    user_interactions = bundle.user_interactions
+    article_id_to_embedding_idx = {a: i for i, a in enumerate(articles_metadata['article_id'].tolist())}
+    user_index = UserInteractionIndex(user_interactions)
+
+    recommender = ContentBasedRecommender(user_interactions, articles_metadata, bundle.embeddings,
+                                          article_id_to_embedding_idx, dict(RECOMMENDATION_CONFIG, content_index='exact'),
+                                          user_index)
+
+    build_start = time.perf_counter()
+    if all(name in bundle.arrays for name in IVF_ARRAYS) and args.n_lists is None:
+        index = IVFIndex.from_arrays(recommender.normalized_embeddings, bundle.arrays)
+        print(f"Index IVF chargé depuis le bundle ({index.n_lists} listes)")
+    else:
+        index = IVFIndex.build(recommender.normalized_embeddings, n_lists=args.n_lists)
+        print(f"Index IVF construit ({index.n_lists} listes) en {time.perf_counter() - build_start:.2f}s")
+
+    # Requêtes : centroïdes de profils d'utilisateurs réels tirés au hasard
+    rng = np.random.default_rng(0)
+    sampled_users = rng.choice(user_index.user_ids, min(args.users, len(user_index.user_ids)), replace=False)
+    queries = []
+    for user_id in sampled_users.tolist():
+        centroid = recommender._user_profile_centroid(user_id)
+        if centroid is not None and np.linalg.norm(centroid) > 0:
+            queries.append(((centroid / np.linalg.norm(centroid)).astype(np.float32), recommender._read_rows(user_id)))
+    print(f"{len(queries)} requêtes, {recommender.n_scored_articles} articles, k={args.k}\n")
+
+    start = time.perf_counter()
+    exact_results = [recommender.score_centroid(query, excluded, args.k)[0] for query, excluded in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    print(f"{'mode':<14}{'recall@k':>10}{'ms/requête':>14}{'accélération':>14}")
+    print(f"{'exact':<14}{1.0:>10.3f}{exact_ms:>14.3f}{1.0:>13.1f}x")
+    for nprobe in args.nprobe:
+        start = time.perf_counter()
+        ivf_results = [index.search(query, args.k, nprobe, excluded)[0] for query, excluded in queries]
+        ivf_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        recall = np.mean([len(np.intersect1d(exact, approx)) / max(1, len(exact))
+                          for exact, approx in zip(exact_results, ivf_results)])
+        print(f"{f'ivf nprobe={nprobe}':<14}{recall:>10.3f}{ivf_ms:>14.3f}{exact_ms / ivf_ms:>13.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Rapport de quantification des embeddings : mémoire économisée et accord de classement avec le mode exact.
+
+Usage : python benchmarks/bench_embedding_quantization.py [processed_data/engine_bundle] [--users 500] [--k 10]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from recommendation_engine.bundle import load_bundle
+from recommendation_engine.content_based import ContentBasedRecommender
+from recommendation_engine.user_index import UserInteractionIndex
+from config import RECOMMENDATION_CONFIG
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('bundle_path', nargs='?', default='processed_data/engine_bundle')
+    parser.add_argument('--users', type=int, default=500, help="Nombre d'utilisateurs échantillonnés")
+    parser.add_argument('--k', type=int, default=10, help="Taille du classement comparé")
+    parser.add_argument('--shortlist', type=int, nargs='+', default=[0, 50, 200],
+                        help="Tailles de liste restreinte re-scorée (0 : sans re-scoring)")
+    args = parser.parse_args()
+
+    bundle = load_bundle(args.bundle_path)
+    articles_metadata = bundle.articles_metadata
+    user_interactions = bundle.user_interactions
+    article_id_to_embedding_idx = {a: i for i, a in enumerate(articles_metadata['article_id'].tolist())}
+    user_index = UserInteractionIndex(user_interactions)
+
+    def build(quantization, shortlist=0):
+        config = dict(RECOMMENDATION_CONFIG, content_index='exact', embedding_quantization=quantization,
+                      rescore_shortlist=shortlist)
+        return ContentBasedRecommender(user_interactions, articles_metadata, bundle.embeddings,
+                                       article_id_to_embedding_idx, config, user_index)
+
+    exact = build('none')
+    rng = np.random.default_rng(0)
+    sampled_users = rng.choice(user_index.user_ids, min(args.users, len(user_index.user_ids)), replace=False).tolist()
+
+    start = time.perf_counter()
+    reference = [exact.recommend_candidates(user_id, args.k)[0] for user_id in sampled_users]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(sampled_users)
+    exact_bytes = exact.normalized_embeddings.nbytes
+
+    print(f"{len(sampled_users)} utilisateurs, {exact.n_scored_articles} articles, k={args.k}\n")
+    print(f"{'mode':<10}{'liste':>7}{'mémoire (MB)':>14}{'économie':>10}{'recall@k':>10}{'ordre identique':>17}{'ms/requête':>12}")
+    print(f"{'float32':<10}{'-':>7}{exact_bytes / 1e6:>14.1f}{'-':>10}{1.0:>10.3f}{1.0:>17.3f}{exact_ms:>12.3f}")
+    for mode in ('float16', 'int8'):
+        for shortlist in args.shortlist:
+            recommender = build(mode, shortlist)
+            start = time.perf_counter()
+            results = [recommender.recommend_candidates(user_id, args.k)[0] for user_id in sampled_users]
+            elapsed_ms = (time.perf_counter() - start) * 1000 / len(sampled_users)
+            recall = np.mean([len(np.intersect1d(ref, res)) / max(1, len(ref)) for ref, res in zip(reference, results)])
+            same_order = np.mean([np.array_equal(ref, res) for ref, res in zip(reference, results)])
+            nbytes = recommender.quantized_embeddings.nbytes
+            print(f"{mode:<10}{shortlist:>7}{nbytes / 1e6:>14.1f}{1 - nbytes / exact_bytes:>9.0%} "
+                  f"{recall:>10.3f}{same_order:>17.3f}{elapsed_ms:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
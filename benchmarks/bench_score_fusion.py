@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la combinaison des candidats des composants : tampon dense vs algorithme à seuil (latence, profondeur lue).
+
+Usage : python benchmarks/bench_score_fusion.py [processed_data/engine_bundle] [--users 200] [-n 5] [--repeat 20]
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from recommendation_engine.bundle import load_bundle
+from recommendation_engine.recommender import RecommendationEngine
+from config import RECOMMENDATION_CONFIG
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('bundle_path', nargs='?', default='processed_data/engine_bundle')
+    parser.add_argument('--users', type=int, default=200, help="Nombre d'utilisateurs échantillonnés (hors cold start)")
+    parser.add_argument('-n', '--recommendations', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=20, help="Fusions chronométrées par utilisateur")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    bundle = load_bundle(args.bundle_path)
+    engine = RecommendationEngine(bundle.articles_metadata, bundle.user_interactions, bundle.embeddings,
+                                  bundle.data_summary, bundle.arrays)
+    counts = bundle.user_interactions['user_id'].value_counts()
+    hybrid_users = counts[counts >= RECOMMENDATION_CONFIG['min_interactions_collab']].index.to_numpy()
+    rng = np.random.default_rng(0)
+    sampled = rng.choice(hybrid_users, min(args.users, len(hybrid_users)), replace=False).tolist()
+
+    # Candidats calculés une fois par utilisateur : seule la fusion est chronométrée
+    n, weights = args.recommendations, RECOMMENDATION_CONFIG['weights']
+    requests = []
+    for user_id in sampled:
+        read_rows = np.array([engine.article_id_to_embedding_idx[article_id]
+                              for article_id in engine.user_index.read_articles(user_id).tolist()
+                              if article_id in engine.article_id_to_embedding_idx], dtype=np.int64)
+        components = [
+            (*engine.content_based_recommender.recommend_candidates(user_id, n * 2), weights['content_based']),
+            (*engine.collaborative_recommender.recommend_candidates(user_id, n * 2), weights['collaborative']),
+            (*engine.popularity_recommender.recommend_candidates(user_id, n * 2), weights['popularity']),
+        ]
+        requests.append((components, read_rows))
+
+    results = {}
+    for name, fusion in (('dense', engine.score_fusion), ('threshold', engine.threshold_fusion)):
+        latencies, fused = [], []
+        for components, read_rows in requests:
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                _, scores = fusion.fuse(components, read_rows, n * 5)
+            latencies.append((time.perf_counter() - start) * 1e6 / args.repeat)
+            fused.append(scores)
+        results[name] = np.array(latencies), fused
+
+    print(f"{len(sampled)} utilisateurs, {len(bundle.articles_metadata)} articles, {n * 5} articles fusionnés\n")
+    print(f"{'fusion':<12}{'µs/fusion':>12}{'p95 (µs)':>10}{'scores identiques':>22}")
+    for name, (latencies, fused) in results.items():
+        identical = np.mean([len(a) == len(b) and np.allclose(a, b, rtol=1e-5)
+                             for a, b in zip(results['dense'][1], fused)])
+        print(f"{name:<12}{latencies.mean():>12.1f}{np.percentile(latencies, 95):>10.1f}{identical:>22.1%}")
+
+    stats = engine.threshold_fusion.depth_stats()
+    print(f"\nAlgorithme à seuil : {stats.pop('rounds'):.1f} tours en moyenne, profondeur moyenne lue par liste "
+          f"(sur {n * 2} candidats) :")
+    for name, depth in stats.items():
+        print(f"  {name:<16}{depth:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
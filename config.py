@@ -5,12 +5,47 @@ RECOMMENDATION_CONFIG = {
         'popularity': 0.3
     },
     'cold_start_weights': {
-        'popularity': 0.7,
-        'category_diversity': 0.3
+        # Part popularité du score cold start (le reste : fraîcheur) ; la diversité des catégories
+        # est assurée par le tour à tour des listes pré-classées par catégorie
+        'popularity': 0.7
     },
     'similarity_threshold': 0.1,
     'min_interactions_collab': 3,
     'max_similar_users': 50,
     'freshness_decay_days': 7,
-    'category_diversity_factor': 0.2
+    'category_diversity_factor': 0.2,
+    'init_workers': 3,
+    # Recherche content-based : 'exact' (produit matrice-vecteur complet) ou 'ivf' (index approché)
+    'content_index': 'exact',
+    'ivf_n_lists': None,  # None : ~sqrt(nombre d'articles)
+    'ivf_nprobe': 8,
+    # Stockage compact des embeddings pour le premier passage : 'none', 'float16' ou 'int8'
+    'embedding_quantization': 'none',
+    'rescore_shortlist': 200,  # candidats re-scorés en pleine précision
+    'user_profile_max_users': 50000,  # profils content-based gardés en cache (LRU)
+    # Voisins du filtrage collaboratif : 'auto' (table précalculée si présente), 'table' ou 'on_request'
+    'user_neighbours': 'auto',
+    'neighbour_workers': None,  # processus pour le calcul des tables de voisins (None : tous les cœurs)
+    # Voisins calculés à la requête : 'exact' (produit creux avec tous les utilisateurs) ou 'lsh' (candidats MinHash)
+    'neighbour_search': 'exact',
+    'lsh_hashes': 128,
+    'lsh_bands': 64,  # 2 minima par bande
+    # Filtrage collaboratif : 'user' (utilisateurs similaires), 'item' (similarité article-article)
+    # ou 'mf' (factorisation ALS implicite)
+    'collaborative_mode': 'user',
+    'item_similarity_top_k': 50,  # voisins gardés par article en mode 'item'
+    'mf_factors': 64,
+    'mf_regularization': 0.1,
+    'mf_alpha': 40.0,  # confiance c = 1 + alpha * nombre de clics
+    'mf_iterations': 10,
+    # Nouveaux clics : delta fusionné dans la matrice utilisateur-article en arrière-plan
+    'delta_compaction_interval_s': 60,
+    'delta_max_interactions': 100000,  # compaction anticipée au-delà
+    # Popularité : compteurs de clics décrus avec cette demi-vie (None : simples nombres de clics)
+    'trending_half_life_hours': None,
+    'trending_refresh_interval_s': 30,  # reclassement périodique après de nouveaux clics
+    'category_list_size': 50,  # articles pré-classés par catégorie pour le cold start
+    # Combinaison des candidats des composants : 'dense' (tampon dense, toutes les listes lues en entier)
+    # ou 'threshold' (algorithme à seuil, mêmes résultats, listes lues jusqu'au seuil d'arrêt)
+    'fusion_mode': 'dense'
 }
@@ -20,10 +20,7 @@ def check_azure_function_setup():
         ('requirements.txt', 'Dépendances Python'),
         ('recommendation_engine/recommender.py', 'Moteur de recommandation'),
         ('config.py', 'Configuration'),
-        ('../../processed_data/articles_metadata.json', 'Données articles'),
-        ('../../processed_data/user_interactions.json', 'Données interactions'),
-        ('../../processed_data/embeddings_optimized.pkl', 'Embeddings'),
-        ('../../processed_data/data_summary.json', 'Résumé des données')
+        ('../../processed_data/engine_bundle/manifest.json', 'Bundle compilé du moteur (manifest)')
     ]
     
     print("📁 Vérification des fichiers requis:")
@@ -44,7 +41,6 @@ def check_azure_function_setup():
         ('azure.storage.blob', 'Azure Blob Storage'),
         ('pandas', 'Pandas'),
         ('numpy', 'NumPy'),
-        ('pickle', 'Pickle (built-in)'),
         ('json', 'JSON (built-in)')
     ]
     
@@ -4,14 +4,12 @@ import json
 import os
 import pandas as pd
 import numpy as np
-import pickle
-import gc
+import tempfile
 from typing import Optional, List, Dict
 from azure.storage.blob import BlobServiceClient
-from io import BytesIO
 
 # Variables globales
-recommender_engine = None
+popularity_tier = None
 logger = logging.getLogger(__name__)
 
 # Flag pour vérifier la disponibilité des modules
@@ -23,6 +21,11 @@ try:
     import os
     sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
     from recommendation_engine.recommender import RecommendationEngine
+    from recommendation_engine.artifact_cache import ArtifactCache
+    from recommendation_engine.engine_holder import EngineHolder, default_memory_budget_bytes
+    from recommendation_engine.popularity_tier import PopularityTier, POPULARITY_TIER_ARRAYS
+    from recommendation_engine.shared_state import SharedEngineState, build_with_shared_state, default_shared_state_root
+    from recommendation_engine.bundle import load_bundle, load_arrays, read_manifest, estimate_bundle_bytes, bundle_files, MANIFEST_FILENAME, DEFAULT_BUNDLE_DIRNAME
     from config import RECOMMENDATION_CONFIG
     logger.info("Successfully imported RecommendationEngine and config")
 except ImportError as e:
@@ -40,153 +43,213 @@ except ImportError as e:
 # Informations de connexion Azure
 AZURE_STORAGE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
 CONTAINER_NAME = "processed-data"
+BUNDLE_BLOB_PREFIX = "engine_bundle"
+BLOB_DOWNLOAD_CONCURRENCY = int(os.getenv("BLOB_DOWNLOAD_CONCURRENCY", "8"))
+BLOB_DOWNLOAD_RANGE_MB = int(os.getenv("BLOB_DOWNLOAD_RANGE_MB", "8"))
+ARTIFACT_CACHE_DIR = os.getenv("ARTIFACT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "recommendation_artifact_cache"))
+ARTIFACT_CACHE_MAX_MB = int(os.getenv("ARTIFACT_CACHE_MAX_MB", "4096"))
+# Sert le tier de popularité tant que le moteur complet n'est pas prêt
+PROGRESSIVE_STARTUP = os.getenv("PROGRESSIVE_STARTUP", "true").lower() == "true"
+# Rafraîchissement à chaud du moteur quand une nouvelle version du bundle est publiée
+ENGINE_REFRESH_INTERVAL_S = int(os.getenv("ENGINE_REFRESH_INTERVAL_S", "300"))
+# Budget mémoire de deux moteurs pendant une bascule (non défini : 80 % de la mémoire du conteneur ; 0 : pas de limite)
+ENGINE_MEMORY_BUDGET_MB = os.getenv("ENGINE_MEMORY_BUDGET_MB")
+# Tableaux dérivés (embeddings normalisés, index, tables de voisins...) calculés par un seul worker
+# et mappés en lecture seule par les autres (FUNCTIONS_WORKER_PROCESS_COUNT > 1)
+SHARED_ENGINE_STATE = os.getenv("SHARED_ENGINE_STATE", "true").lower() == "true"
+SHARED_ENGINE_STATE_DIR = os.getenv("SHARED_ENGINE_STATE_DIR") or (default_shared_state_root() if RECOMMENDATION_MODULES_AVAILABLE else None)
 
-def optimize_dataframe_memory(df):
-    """Optimise la mémoire utilisée par un DataFrame pandas."""
-    for col in df.columns:
-        if df[col].dtype == 'float64':
-            df[col] = df[col].astype('float32')
-        if df[col].dtype == 'int64':
-            df[col] = df[col].astype('int32')
-    return df
-
-def download_blob_as_text(blob_service_client, blob_name):
-    blob_client = blob_service_client.get_blob_client(container=CONTAINER_NAME, blob=blob_name)
-    stream = blob_client.download_blob()
-    return stream.readall().decode("utf-8")
-
-def download_blob_as_bytes(blob_service_client, blob_name):
-    blob_client = blob_service_client.get_blob_client(container=CONTAINER_NAME, blob=blob_name)
-    stream = blob_client.download_blob()
-    return stream.readall()
+def get_artifact_cache() -> ArtifactCache:
+    return ArtifactCache(
+        ARTIFACT_CACHE_DIR,
+        max_bytes=ARTIFACT_CACHE_MAX_MB * 1024 * 1024,
+        max_concurrency=BLOB_DOWNLOAD_CONCURRENCY,
+        range_size=BLOB_DOWNLOAD_RANGE_MB * 1024 * 1024
+    )
 
-def initialize_recommendation_engine() -> Optional[RecommendationEngine]:
-    global recommender_engine
-    
-    if recommender_engine is not None:
-        return recommender_engine
-    
-    if not RECOMMENDATION_MODULES_AVAILABLE:
-        logger.error("Recommendation modules not available")
+def fetch_bundle_from_blob_storage(blob_service_client, array_names=None):
+    """
+    Récupère le bundle (ou seulement les tableaux `array_names`) via le cache d'artefacts local.
+    Si rien n'a changé depuis le dernier démarrage, seules les propriétés des blobs sont lues.
+
+    Returns:
+        (dossier du manifest, manifest, chemins locaux par nom de fichier, nombre de fichiers téléchargés)
+    """
+    cache = get_artifact_cache()
+    manifest_blob = f"{BUNDLE_BLOB_PREFIX}/{MANIFEST_FILENAME}"
+    manifest_path = cache.fetch(blob_service_client, CONTAINER_NAME, [manifest_blob])[manifest_blob]
+    manifest = read_manifest(os.path.dirname(manifest_path))
+
+    if array_names is None:
+        file_names = bundle_files(manifest)
+    else:
+        file_names = [manifest['arrays'][name]['file'] for name in array_names]
+    blob_names = {f"{BUNDLE_BLOB_PREFIX}/{file_name}": file_name for file_name in file_names}
+    local_paths = cache.fetch(blob_service_client, CONTAINER_NAME, blob_names)
+    file_paths = {blob_names[blob_name]: path for blob_name, path in local_paths.items()}
+    return os.path.dirname(manifest_path), manifest, file_paths, len(cache.last_fetch_misses)
+
+def build_engine_from_blob_storage(blob_service_client) -> RecommendationEngine:
+    """
+    Construit le moteur à partir du bundle publié dans Blob Storage, mappé en mémoire
+    directement depuis le cache d'artefacts.
+    """
+    bundle_path, manifest, file_paths, downloaded = fetch_bundle_from_blob_storage(blob_service_client)
+    logger.info(f"Engine bundle {manifest['data_version']} available in artifact cache ({downloaded} files downloaded)")
+    # Les checksums ne sont vérifiés que lorsque des fichiers viennent d'être téléchargés
+    return build_engine_from_bundle(bundle_path, bool(downloaded), file_paths)
+
+def get_local_bundle_path() -> str:
+    base_path = os.path.join(os.path.dirname(__file__), '..', '..', 'processed_data')
+    return os.path.join(base_path, DEFAULT_BUNDLE_DIRNAME)
+
+def load_popularity_tier() -> Optional[PopularityTier]:
+    """
+    Charge le tier de popularité précalculé du bundle (quelques Ko), servi pendant que
+    le moteur complet se construit en arrière-plan.
+    """
+    global popularity_tier
+
+    if popularity_tier is not None:
+        return popularity_tier
+
+    try:
+        if AZURE_STORAGE_CONNECTION_STRING:
+            blob_service_client = BlobServiceClient.from_connection_string(AZURE_STORAGE_CONNECTION_STRING)
+            bundle_path, manifest, file_paths, _ = fetch_bundle_from_blob_storage(blob_service_client, POPULARITY_TIER_ARRAYS)
+            arrays = load_arrays(bundle_path, POPULARITY_TIER_ARRAYS, manifest, file_paths)
+        else:
+            # En local, l'historique est déjà sur disque : on l'utilise pour filtrer les articles lus
+            bundle_path = get_local_bundle_path()
+            arrays = load_arrays(bundle_path, POPULARITY_TIER_ARRAYS + ('user_interactions.user_id', 'user_interactions.click_article_id'))
+        popularity_tier = PopularityTier.from_arrays(arrays)
+        logger.info(f"Popularity tier loaded ({len(popularity_tier.article_ids)} ranked articles)")
+        return popularity_tier
+    except Exception as e:
+        logger.error(f"Error loading popularity tier: {e}", exc_info=True)
         return None
 
+def build_engine_from_bundle(bundle_path: str, verify_checksums: bool = False,
+                             file_paths: Optional[Dict[str, str]] = None) -> RecommendationEngine:
+    """
+    Construit le moteur à partir d'un bundle mappé en mémoire.
+    Avec SHARED_ENGINE_STATE, les tableaux dérivés sont calculés par le premier worker de l'hôte
+    et mappés par les suivants ; les états des versions précédentes sont supprimés une fois inutilisés.
+    Si l'état partagé ne peut être écrit (ex: /dev/shm plein), le moteur est servi sans partage.
+    """
+    bundle = load_bundle(bundle_path, verify_checksums=verify_checksums, file_paths=file_paths)
+
+    def build(artifacts):
+        return RecommendationEngine(
+            articles_metadata=bundle.articles_metadata,
+            user_interactions=bundle.user_interactions,
+            embeddings=bundle.embeddings,
+            data_summary=bundle.data_summary,
+            artifacts=artifacts
+        )
+
+    if not SHARED_ENGINE_STATE:
+        return build(bundle.arrays)
+    shared_state = SharedEngineState(SHARED_ENGINE_STATE_DIR, bundle.data_version, RECOMMENDATION_CONFIG)
+    return build_with_shared_state(shared_state, build, bundle.arrays)
+
+def build_engine_from_local_files() -> Optional[RecommendationEngine]:
+    """Construit le moteur de recommandation depuis le bundle local"""
+    try:
+        logger.info("Attempting to load from local processed_data folder...")
+        
+        # Chemin vers le bundle local
+        bundle_path = get_local_bundle_path()
+        if not os.path.exists(os.path.join(bundle_path, MANIFEST_FILENAME)):
+            logger.error(f"Local engine bundle not found: {bundle_path} "
+                         f"(compile it with `python -m recommendation_engine.bundle`)")
+            return None
+        
+        engine = build_engine_from_bundle(bundle_path)
+        
+        logger.info("RecommendationEngine initialized successfully from local files")
+        return engine
+        
+    except Exception as e:
+        logger.error(f"Error initializing from local files: {e}", exc_info=True)
+        return None
+
+
+def build_recommendation_engine() -> Optional[RecommendationEngine]:
+    """Construit un nouveau moteur depuis Blob Storage, ou depuis les fichiers locaux en repli."""
     try:
         # Vérifier si la chaîne de connexion Azure est disponible
         if not AZURE_STORAGE_CONNECTION_STRING:
             logger.warning("AZURE_STORAGE_CONNECTION_STRING not set, trying local files...")
-            return initialize_from_local_files()
+            return build_engine_from_local_files()
         
         logger.info("Initializing from Azure Blob Storage...")
         blob_service_client = BlobServiceClient.from_connection_string(AZURE_STORAGE_CONNECTION_STRING)
 
-        # articles_metadata.json
-        articles_metadata_text = download_blob_as_text(blob_service_client, "articles_metadata.json")
-        articles_metadata_list = [json.loads(line) for line in articles_metadata_text.strip().split("\n")]
-        articles_metadata = pd.DataFrame(articles_metadata_list)
-        articles_metadata = optimize_dataframe_memory(articles_metadata)
-
-        # embeddings_optimized.pkl
-        embeddings_bytes = download_blob_as_bytes(blob_service_client, "embeddings_optimized.pkl")
-        embeddings = pickle.loads(embeddings_bytes)
-
-        # data_summary.json
-        data_summary_text = download_blob_as_text(blob_service_client, "data_summary.json")
-        data_summary = json.loads(data_summary_text)
-
-        # user_interactions.json
-        user_interactions_text = download_blob_as_text(blob_service_client, "user_interactions.json")
-        user_interactions_list = [json.loads(line) for line in user_interactions_text.strip().split("\n")]
-        user_interactions = pd.DataFrame(user_interactions_list)
-        user_interactions = optimize_dataframe_memory(user_interactions)
-
-        recommender_engine = RecommendationEngine(
-            articles_metadata=articles_metadata,
-            user_interactions=user_interactions,
-            embeddings=embeddings,
-            data_summary=data_summary
-        )
-
-        del articles_metadata_list, user_interactions_list
-        gc.collect()
+        engine = build_engine_from_blob_storage(blob_service_client)
 
         logger.info("RecommendationEngine initialized successfully from Azure Blob Storage")
-        return recommender_engine
+        return engine
 
     except Exception as e:
         logger.error(f"Error initializing RecommendationEngine from Azure: {e}", exc_info=True)
         logger.info("Falling back to local files...")
-        return initialize_from_local_files()
+        return build_engine_from_local_files()
 
 
-def initialize_from_local_files() -> Optional[RecommendationEngine]:
-    """Initialise le moteur de recommandation depuis les fichiers locaux"""
-    global recommender_engine
-    
+def read_published_manifest() -> Dict:
+    """Lit le manifest du bundle publié (via le cache d'artefacts) ou du bundle local."""
+    if AZURE_STORAGE_CONNECTION_STRING:
+        blob_service_client = BlobServiceClient.from_connection_string(AZURE_STORAGE_CONNECTION_STRING)
+        manifest_blob = f"{BUNDLE_BLOB_PREFIX}/{MANIFEST_FILENAME}"
+        manifest_path = get_artifact_cache().fetch(blob_service_client, CONTAINER_NAME, [manifest_blob])[manifest_blob]
+        return read_manifest(os.path.dirname(manifest_path))
+    return read_manifest(get_local_bundle_path())
+
+
+def get_published_version() -> Optional[str]:
+    """Version des données publiées : ETag du manifest dans Blob Storage, ou data_version du bundle local."""
     try:
-        logger.info("Attempting to load from local processed_data folder...")
-        
-        # Chemins vers les fichiers locaux
-        base_path = os.path.join(os.path.dirname(__file__), '..', '..', 'processed_data')
-        
-        # Articles metadata
-        articles_metadata_path = os.path.join(base_path, 'articles_metadata.json')
-        if not os.path.exists(articles_metadata_path):
-            logger.error(f"Local file not found: {articles_metadata_path}")
-            return None
-        
-        with open(articles_metadata_path, 'r', encoding='utf-8') as f:
-            articles_metadata_list = [json.loads(line) for line in f.read().strip().split('\n')]
-        articles_metadata = pd.DataFrame(articles_metadata_list)
-        articles_metadata = optimize_dataframe_memory(articles_metadata)
-        
-        # Embeddings
-        embeddings_path = os.path.join(base_path, 'embeddings_optimized.pkl')
-        if not os.path.exists(embeddings_path):
-            logger.error(f"Local file not found: {embeddings_path}")
-            return None
-        
-        with open(embeddings_path, 'rb') as f:
-            embeddings = pickle.load(f)
-        
-        # Data summary
-        data_summary_path = os.path.join(base_path, 'data_summary.json')
-        if not os.path.exists(data_summary_path):
-            logger.error(f"Local file not found: {data_summary_path}")
-            return None
-        
-        with open(data_summary_path, 'r', encoding='utf-8') as f:
-            data_summary = json.load(f)
-        
-        # User interactions
-        user_interactions_path = os.path.join(base_path, 'user_interactions.json')
-        if not os.path.exists(user_interactions_path):
-            logger.error(f"Local file not found: {user_interactions_path}")
-            return None
-        
-        with open(user_interactions_path, 'r', encoding='utf-8') as f:
-            user_interactions_list = [json.loads(line) for line in f.read().strip().split('\n')]
-        user_interactions = pd.DataFrame(user_interactions_list)
-        user_interactions = optimize_dataframe_memory(user_interactions)
-        
-        # Initialiser le moteur
-        recommender_engine = RecommendationEngine(
-            articles_metadata=articles_metadata,
-            user_interactions=user_interactions,
-            embeddings=embeddings,
-            data_summary=data_summary
-        )
-        
-        del articles_metadata_list, user_interactions_list
-        gc.collect()
-        
-        logger.info("RecommendationEngine initialized successfully from local files")
-        return recommender_engine
-        
+        if AZURE_STORAGE_CONNECTION_STRING:
+            blob_service_client = BlobServiceClient.from_connection_string(AZURE_STORAGE_CONNECTION_STRING)
+            blob_client = blob_service_client.get_blob_client(container=CONTAINER_NAME, blob=f"{BUNDLE_BLOB_PREFIX}/{MANIFEST_FILENAME}")
+            return blob_client.get_blob_properties().etag
+        return read_manifest(get_local_bundle_path())['data_version']
     except Exception as e:
-        logger.error(f"Error initializing from local files: {e}", exc_info=True)
+        logger.warning(f"Unable to read published bundle version: {e}")
         return None
 
 
+def estimate_published_engine_bytes() -> int:
+    return estimate_bundle_bytes(read_published_manifest())
+
+
+def engine_derived_bytes(engine: RecommendationEngine) -> int:
+    """Mémoire des tableaux dérivés d'un moteur (calculés à l'init ou mappés depuis l'état partagé), en plus du bundle."""
+    arrays = {**getattr(engine, 'shared_arrays', {}), **engine.derived_arrays}
+    return sum(int(array.nbytes) for array in arrays.values())
+
+
+engine_holder = EngineHolder(
+    get_published_version,
+    build_recommendation_engine,
+    memory_estimate_fn=estimate_published_engine_bytes,
+    memory_budget_bytes=int(ENGINE_MEMORY_BUDGET_MB) * 1024 * 1024 if ENGINE_MEMORY_BUDGET_MB is not None
+    else default_memory_budget_bytes(),
+    check_interval_s=ENGINE_REFRESH_INTERVAL_S,
+    engine_footprint_fn=engine_derived_bytes
+) if RECOMMENDATION_MODULES_AVAILABLE else None
+
+
+def initialize_recommendation_engine() -> Optional[RecommendationEngine]:
+    """Retourne le moteur courant, en le construisant (ou en attendant sa construction) si nécessaire."""
+    if not RECOMMENDATION_MODULES_AVAILABLE:
+        logger.error("Recommendation modules not available")
+        return None
+
+    return engine_holder.get() or engine_holder.load()
+
+
 def main(req: func.HttpRequest) -> func.HttpResponse:
     """
     Point d'entrée principal de l'Azure Function pour les recommandations.
@@ -231,8 +294,18 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
         
         logger.info(f'Processing request for user_id={user_id}, n_recommendations={n_recommendations}')
         
-        # Initialiser le moteur de recommandation
-        recommender = initialize_recommendation_engine()
+        # Initialiser le moteur de recommandation (ou le tier de popularité pendant son chargement)
+        if engine_holder is not None:
+            engine_holder.start()
+        recommender = engine_holder.get() if engine_holder is not None else None
+        served_tier = "full"
+        if recommender is None and PROGRESSIVE_STARTUP:
+            recommender = load_popularity_tier()
+            served_tier = "popularity"
+        if recommender is None:
+            # Pas de tier disponible : attendre le chargement en cours plutôt que d'en lancer un second
+            recommender = initialize_recommendation_engine()
+            served_tier = "full"
         if not recommender:
             logger.error('Failed to initialize recommendation engine')
             return func.HttpResponse(
@@ -246,7 +319,10 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
         
         # Générer les recommandations
         try:
-            recommendations = recommender.recommend_articles(user_id, n_recommendations)
+            if served_tier == "full":
+                recommendations = recommender.recommend_articles(user_id, n_recommendations)
+            else:
+                recommendations = recommender.recommend(user_id, n_recommendations)
             
             if not recommendations:
                 logger.info(f'No recommendations found for user {user_id}')
@@ -255,6 +331,7 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
                         "user_id": user_id,
                         "recommendations": [],
                         "count": 0,
+                        "tier": served_tier,
                         "message": "No recommendations available for this user"
                     }),
                     status_code=200,
@@ -281,10 +358,11 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
                 "user_id": int(user_id),  # Assurer que c'est un int Python
                 "recommendations": convert_numpy_types(recommendations),
                 "count": len(recommendations),
+                "tier": served_tier,
                 "message": "Recommendations generated successfully"
             }
             
-            logger.info(f'Successfully generated {len(recommendations)} recommendations for user {user_id}')
+            logger.info(f'Successfully generated {len(recommendations)} recommendations for user {user_id} (tier: {served_tier})')
             
             return func.HttpResponse(
                 json.dumps(response_data, ensure_ascii=False),
@@ -0,0 +1,127 @@
+import numpy as np
+import logging
+from typing import Dict, Optional
+from scipy.sparse import csr_matrix
+from .utils import l2_normalize_rows, top_k_indices
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+IVF_ARRAYS = ('content_ivf.centroids', 'content_ivf.list_offsets', 'content_ivf.list_rows')
+ASSIGN_BLOCK_SIZE = 65536
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Affecte chaque vecteur (normalisé) au centroïde le plus proche en cosinus, par blocs."""
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_BLOCK_SIZE):
+        block = vectors[start:start + ASSIGN_BLOCK_SIZE]
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def spherical_kmeans(vectors: np.ndarray, n_clusters: int, n_iter: int = 10,
+                     sample_size: int = 100000, seed: int = 0) -> np.ndarray:
+    """
+    K-means sphérique (similarité cosinus) en NumPy pur, entraîné sur un échantillon.
+
+    Returns:
+        Centroïdes normalisés (n_clusters x dimensions), float32.
+    """
+    rng = np.random.default_rng(seed)
+    # Échantillon matérialisé en float32 : `vectors` peut être une matrice mappée ou des embeddings quantifiés
+    if len(vectors) > sample_size:
+        sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))], dtype=np.float32)
+    else:
+        sample = np.asarray(vectors[:len(vectors)], dtype=np.float32)
+    n_clusters = min(n_clusters, len(sample))
+    centroids = np.array(sample[rng.choice(len(sample), n_clusters, replace=False)], dtype=np.float32)
+
+    for _ in range(n_iter):
+        assignments = _assign(sample, centroids)
+        # Somme des vecteurs par cluster via un produit creux (one-hot clusters x échantillon)
+        one_hot = csr_matrix((np.ones(len(sample), dtype=np.float32), (assignments, np.arange(len(sample)))),
+                             shape=(n_clusters, len(sample)))
+        sums = np.asarray(one_hot @ sample, dtype=np.float32)
+        counts = np.bincount(assignments, minlength=n_clusters)
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            # Clusters vides : réinitialisés sur des points tirés au hasard
+            sums[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+        centroids = l2_normalize_rows(sums)
+    return centroids
+
+
+class IVFIndex:
+    """
+    Index de plus proches voisins approché de type IVF (inverted file) pour la similarité cosinus.
+
+    Les vecteurs sont répartis en `n_lists` listes par k-means sphérique. Une requête ne compare
+    le vecteur qu'aux centroïdes, puis aux vecteurs des `nprobe` listes les plus proches :
+    le coût croît avec nprobe * n / n_lists au lieu de n.
+    """
+    def __init__(self, vectors: np.ndarray, centroids: np.ndarray, list_offsets: np.ndarray, list_rows: np.ndarray):
+        self.vectors = vectors
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_rows = list_rows
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, n_lists: Optional[int] = None, n_iter: int = 10, seed: int = 0) -> 'IVFIndex':
+        """
+        Construit l'index sur des vecteurs normalisés L2 (n_lists par défaut : ~sqrt(n)).
+        """
+        n_lists = n_lists or max(1, int(np.sqrt(len(vectors))))
+        logger.info(f"Building IVF index: {len(vectors)} vectors, {n_lists} lists...")
+        centroids = spherical_kmeans(vectors, n_lists, n_iter=n_iter, seed=seed)
+        assignments = _assign(vectors, centroids)
+        list_rows = np.argsort(assignments, kind='stable').astype(np.int32)
+        list_offsets = np.concatenate(([0], np.cumsum(np.bincount(assignments, minlength=len(centroids))))).astype(np.int64)
+        logger.info(f"IVF index built: {len(centroids)} lists, largest list {int(np.diff(list_offsets).max())} vectors.")
+        return cls(vectors, centroids, list_offsets, list_rows)
+
+    @classmethod
+    def from_arrays(cls, vectors: np.ndarray, arrays: Dict[str, np.ndarray]) -> 'IVFIndex':
+        """Recharge un index précalculé (ex: depuis le bundle) pour les vecteurs donnés."""
+        return cls(vectors, *(np.asarray(arrays[name]) for name in IVF_ARRAYS))
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return dict(zip(IVF_ARRAYS, (self.centroids, self.list_offsets, self.list_rows)))
+
+    def search(self, query: np.ndarray, k: int, nprobe: int = 8, excluded_rows: np.ndarray = None):
+        """
+        Recherche les `k` vecteurs les plus similaires à `query` (normalisée) dans les `nprobe` listes
+        les plus proches.
+
+        Returns:
+            (lignes, similarités cosinus), triés par score décroissant.
+        """
+        probed_lists = top_k_indices(self.centroids @ query, min(nprobe, self.n_lists))
+        candidate_rows = np.concatenate([
+            self.list_rows[self.list_offsets[i]:self.list_offsets[i + 1]] for i in probed_lists
+        ]) if len(probed_lists) else np.empty(0, dtype=np.int32)
+        scores = self.vectors[candidate_rows] @ query
+        if excluded_rows is not None and len(excluded_rows):
+            scores[np.isin(candidate_rows, excluded_rows)] = -np.inf
+        top = top_k_indices(scores, k)
+        return candidate_rows[top].astype(np.int64), scores[top]
+
+
+# Construction hors ligne : python -m recommendation_engine.ann_index processed_data/engine_bundle
+if __name__ == "__main__":
+    import argparse
+    from .bundle import load_bundle, add_arrays_to_bundle
+
+    parser = argparse.ArgumentParser(description="Construit l'index IVF des embeddings et l'ajoute au bundle.")
+    parser.add_argument('bundle_path')
+    parser.add_argument('--n-lists', type=int, default=None)
+    args = parser.parse_args()
+
+    bundle = load_bundle(args.bundle_path)
+    index = IVFIndex.build(l2_normalize_rows(bundle.embeddings), n_lists=args.n_lists)
+    add_arrays_to_bundle(args.bundle_path, index.to_arrays())
+    print(f"Index IVF ({index.n_lists} listes) ajouté au bundle {args.bundle_path}")
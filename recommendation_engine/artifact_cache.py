@@ -0,0 +1,162 @@
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import logging
+from typing import Dict, Iterable, List
+from .blob_download import download_blobs, DEFAULT_MAX_CONCURRENCY, DEFAULT_RANGE_SIZE
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ENTRY_FILENAME = "entry.json"
+DEFAULT_MAX_CACHE_BYTES = 4 * 1024 * 1024 * 1024
+
+
+def _hash(value: str) -> str:
+    return hashlib.sha1(value.encode('utf-8')).hexdigest()[:20]
+
+
+class ArtifactCache:
+    """
+    Cache disque des artefacts Blob Storage, indexé par nom de blob + ETag (ou date de modification).
+
+    Au redémarrage, seule une requête de propriétés est émise par blob : si l'ETag n'a pas changé,
+    le fichier local est réutilisé (et peut être mappé en mémoire directement).
+    Les entrées sont écrites dans un dossier temporaire puis renommées (atomique), si bien que
+    plusieurs workers d'un même hôte peuvent partager le cache sans se corrompre. Les entrées
+    les moins récemment utilisées sont supprimées au-delà de `max_bytes`.
+    """
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_CACHE_BYTES,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY, range_size: int = DEFAULT_RANGE_SIZE):
+        self.cache_dir = cache_dir
+        self.entries_dir = os.path.join(cache_dir, 'entries')
+        self.tmp_dir = os.path.join(cache_dir, 'tmp')
+        self.max_bytes = max_bytes
+        self.max_concurrency = max_concurrency
+        self.range_size = range_size
+        self.last_fetch_misses = []
+        os.makedirs(self.entries_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def _entry_path(self, blob_name: str, version: str) -> str:
+        return os.path.join(self.entries_dir, _hash(blob_name), _hash(version))
+
+    @staticmethod
+    def _version_of(properties) -> str:
+        etag = getattr(properties, 'etag', None)
+        if etag:
+            return str(etag)
+        return str(getattr(properties, 'last_modified', properties.size))
+
+    def fetch(self, blob_service_client, container_name: str, blob_names: Iterable[str]) -> Dict[str, str]:
+        """
+        Retourne le chemin local de chaque blob, en ne téléchargeant que ceux absents du cache.
+
+        Args:
+            blob_service_client: Client BlobServiceClient (ou équivalent).
+            container_name: Conteneur source.
+            blob_names: Blobs à récupérer.
+
+        Returns:
+            {nom du blob: chemin local du fichier en cache}.
+        """
+        local_paths = {}
+        missing = {}
+        for blob_name in blob_names:
+            blob_client = blob_service_client.get_blob_client(container=container_name, blob=blob_name)
+            properties = blob_client.get_blob_properties()
+            version = self._version_of(properties)
+            entry_path = self._entry_path(blob_name, version)
+            file_path = os.path.join(entry_path, os.path.basename(blob_name))
+            if os.path.exists(os.path.join(entry_path, ENTRY_FILENAME)):
+                os.utime(os.path.join(entry_path, ENTRY_FILENAME))
+                local_paths[blob_name] = file_path
+            else:
+                missing[blob_name] = (version, properties.size)
+
+        logger.info(f"Artifact cache: {len(local_paths)} hits, {len(missing)} misses in {self.cache_dir}")
+        self.last_fetch_misses = list(missing)
+        if missing:
+            local_paths.update(self._download(blob_service_client, container_name, missing))
+            self.evict(protected=local_paths.values())
+        return local_paths
+
+    def _download(self, blob_service_client, container_name: str, missing: Dict) -> Dict[str, str]:
+        staging = {}
+        for blob_name, (version, size) in missing.items():
+            tmp_entry = os.path.join(self.tmp_dir, uuid.uuid4().hex)
+            os.makedirs(tmp_entry)
+            staging[blob_name] = tmp_entry
+
+        try:
+            download_blobs(
+                blob_service_client, container_name,
+                {name: os.path.join(tmp_entry, os.path.basename(name)) for name, tmp_entry in staging.items()},
+                max_concurrency=self.max_concurrency, range_size=self.range_size
+            )
+            local_paths = {}
+            for blob_name, tmp_entry in staging.items():
+                version, size = missing[blob_name]
+                with open(os.path.join(tmp_entry, ENTRY_FILENAME), 'w', encoding='utf-8') as f:
+                    json.dump({'blob_name': blob_name, 'version': version, 'size': size}, f)
+                entry_path = self._entry_path(blob_name, version)
+                os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+                try:
+                    os.rename(tmp_entry, entry_path)
+                except OSError:
+                    # Un autre worker a publié la même entrée entre-temps : on garde la sienne
+                    if not os.path.exists(os.path.join(entry_path, ENTRY_FILENAME)):
+                        raise
+                local_paths[blob_name] = os.path.join(entry_path, os.path.basename(blob_name))
+            return local_paths
+        finally:
+            for tmp_entry in staging.values():
+                shutil.rmtree(tmp_entry, ignore_errors=True)
+
+    def _list_entries(self) -> List[Dict]:
+        entries = []
+        for blob_dir in os.listdir(self.entries_dir):
+            blob_path = os.path.join(self.entries_dir, blob_dir)
+            for version_dir in os.listdir(blob_path):
+                entry_path = os.path.join(blob_path, version_dir)
+                marker = os.path.join(entry_path, ENTRY_FILENAME)
+                try:
+                    with open(marker, 'r', encoding='utf-8') as f:
+                        entry = json.load(f)
+                    entry['path'] = entry_path
+                    entry['last_used'] = os.path.getmtime(marker)
+                except (OSError, ValueError):
+                    continue
+                entries.append(entry)
+        return entries
+
+    def evict(self, protected: Iterable[str] = ()) -> int:
+        """
+        Supprime les entrées les moins récemment utilisées jusqu'à repasser sous `max_bytes`.
+        Les entrées contenant un chemin de `protected` ne sont jamais supprimées.
+
+        Returns:
+            Le nombre d'octets libérés.
+        """
+        protected_entries = {os.path.dirname(path) for path in protected}
+        entries = sorted(self._list_entries(), key=lambda entry: entry['last_used'])
+        total_size = sum(entry['size'] for entry in entries)
+        freed = 0
+        for entry in entries:
+            if total_size - freed <= self.max_bytes:
+                break
+            if entry['path'] in protected_entries:
+                continue
+            # Renommage atomique avant suppression : l'entrée disparaît d'un coup pour les autres workers.
+            # Les fichiers déjà mappés en mémoire par un worker restent valides jusqu'à leur fermeture.
+            trash = os.path.join(self.tmp_dir, uuid.uuid4().hex)
+            try:
+                os.rename(entry['path'], trash)
+            except OSError:
+                continue
+            shutil.rmtree(trash, ignore_errors=True)
+            freed += entry['size']
+            logger.info(f"Evicted {entry['blob_name']} ({entry['version']}, {entry['size']} bytes) from artifact cache")
+        return freed
@@ -0,0 +1,90 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_RANGE_SIZE = 8 * 1024 * 1024
+
+
+class _ArtifactProgress:
+    """Suit les plages restantes d'un artefact pour journaliser son temps de téléchargement."""
+    def __init__(self, blob_name: str, size: int, n_ranges: int):
+        self.blob_name = blob_name
+        self.size = size
+        self.remaining = n_ranges
+        self.start_time = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def range_done(self):
+        with self.lock:
+            self.remaining -= 1
+            finished = self.remaining == 0
+        if finished:
+            elapsed = time.perf_counter() - self.start_time
+            throughput = self.size / (1024 * 1024) / elapsed if elapsed > 0 else float('inf')
+            logger.info(f"Downloaded {self.blob_name}: {self.size} bytes in {elapsed:.2f}s ({throughput:.1f} MB/s)")
+
+
+def _split_ranges(size: int, range_size: int) -> List[Tuple[int, int]]:
+    if size == 0:
+        return []
+    return [(offset, min(range_size, size - offset)) for offset in range(0, size, range_size)]
+
+
+def _download_range(blob_client, file_path: str, offset: int, length: int, progress: _ArtifactProgress):
+    data = blob_client.download_blob(offset=offset, length=length).readall()
+    if len(data) != length:
+        raise IOError(f"Short read for {progress.blob_name} at offset {offset}: {len(data)}/{length} bytes")
+    with open(file_path, 'r+b') as f:
+        f.seek(offset)
+        f.write(data)
+    progress.range_done()
+
+
+def download_blobs(blob_service_client, container_name: str, blob_to_path: Dict[str, str],
+                   max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                   range_size: int = DEFAULT_RANGE_SIZE) -> Dict[str, int]:
+    """
+    Télécharge plusieurs blobs en parallèle, chaque gros blob étant découpé en plages d'octets.
+
+    Chaque fichier de destination est préalloué à la taille du blob, puis chaque plage est
+    écrite à son offset par un worker du pool. Tous les artefacts partagent le même pool.
+
+    Args:
+        blob_service_client: Client BlobServiceClient (ou équivalent exposant get_blob_client).
+        container_name: Conteneur source.
+        blob_to_path: {nom du blob: chemin local de destination}.
+        max_concurrency: Nombre maximal de requêtes de plage simultanées.
+        range_size: Taille d'une plage en octets.
+
+    Returns:
+        {nom du blob: taille en octets}.
+    """
+    start_time = time.perf_counter()
+    sizes = {}
+    tasks = []
+    for blob_name, file_path in blob_to_path.items():
+        blob_client = blob_service_client.get_blob_client(container=container_name, blob=blob_name)
+        size = blob_client.get_blob_properties().size
+        sizes[blob_name] = size
+        with open(file_path, 'wb') as f:
+            f.truncate(size)
+        ranges = _split_ranges(size, range_size)
+        progress = _ArtifactProgress(blob_name, size, len(ranges))
+        tasks.extend((blob_client, file_path, offset, length, progress) for offset, length in ranges)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="blob-download") as executor:
+        futures = [executor.submit(_download_range, *task) for task in tasks]
+        for future in futures:
+            future.result()
+
+    total_size = sum(sizes.values())
+    logger.info(f"Downloaded {len(blob_to_path)} artifacts ({total_size} bytes, {len(tasks)} ranges) "
+                f"in {time.perf_counter() - start_time:.2f}s with concurrency {max_concurrency}")
+    return sizes
@@ -0,0 +1,312 @@
+import pandas as pd
+import numpy as np
+import os
+import json
+import shutil
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT = "recommendation-engine-bundle"
+BUNDLE_FORMAT_VERSION = 1
+MANIFEST_FILENAME = "manifest.json"
+DEFAULT_BUNDLE_DIRNAME = "engine_bundle"
+
+# Types explicites des colonnes d'interactions (les timestamps en ms ne tiennent pas en int32)
+INTERACTION_DTYPES = {
+    'user_id': np.int32,
+    'session_id': np.int64,
+    'click_article_id': np.int32,
+    'click_timestamp': np.int64,
+}
+
+METADATA_DTYPES = {
+    'article_id': np.int32,
+    'category_id': np.int32,
+    'created_at_ts': np.int64,
+    'publisher_id': np.int32,
+    'words_count': np.int32,
+}
+
+
+class BundleError(Exception):
+    """Erreur levée lorsqu'un bundle est absent, incomplet ou corrompu."""
+
+
+class EngineBundle:
+    """
+    Données du moteur chargées depuis un bundle compilé.
+    Les tableaux sont mappés en mémoire (lecture seule) et ne sont pas copiés.
+    """
+    def __init__(self, bundle_path: str, manifest: Dict, arrays: Dict[str, np.ndarray]):
+        self.bundle_path = bundle_path
+        self.manifest = manifest
+        self.arrays = arrays
+        self.data_version = manifest['data_version']
+        self.data_summary = manifest['data_summary']
+        self.embeddings = arrays['embeddings']
+        self.articles_metadata = self._build_frame('articles_metadata')
+        self.user_interactions = self._build_frame('user_interactions')
+
+    def _build_frame(self, frame_name: str) -> pd.DataFrame:
+        columns = self.manifest['frames'][frame_name]
+        return pd.DataFrame({col: self.arrays[f"{frame_name}.{col}"] for col in columns}, copy=False)
+
+    def get_array(self, name: str, default=None) -> Optional[np.ndarray]:
+        """Retourne un tableau additionnel du bundle (ex: tables précalculées), ou `default`."""
+        return self.arrays.get(name, default)
+
+
+def _array_filename(name: str) -> str:
+    return name.replace('.', '__') + '.npy'
+
+
+def _sha256_file(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _column_to_array(series: pd.Series, dtype=None) -> np.ndarray:
+    if dtype is not None:
+        return np.ascontiguousarray(series.to_numpy(dtype=dtype))
+    if series.dtype == object or pd.api.types.is_string_dtype(series.dtype):
+        # Chaînes stockées en unicode de largeur fixe pour rester mappables en mémoire
+        return np.ascontiguousarray(series.astype(str).to_numpy(dtype=str))
+    return np.ascontiguousarray(series.to_numpy())
+
+
+def _write_array(bundle_path: str, name: str, array: np.ndarray) -> Dict:
+    filename = _array_filename(name)
+    path = os.path.join(bundle_path, filename)
+    np.save(path, np.ascontiguousarray(array), allow_pickle=False)
+    return {
+        'file': filename,
+        'dtype': np.lib.format.dtype_to_descr(array.dtype),
+        'shape': list(array.shape),
+        'sha256': _sha256_file(path),
+    }
+
+
+def _data_version(arrays_manifest: Dict) -> str:
+    digest = hashlib.sha256()
+    for name in sorted(arrays_manifest):
+        digest.update(name.encode('utf-8'))
+        digest.update(arrays_manifest[name]['sha256'].encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def _write_manifest(bundle_path: str, manifest: Dict):
+    tmp_path = os.path.join(bundle_path, MANIFEST_FILENAME + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(bundle_path, MANIFEST_FILENAME))
+
+
+def compile_bundle(articles_metadata: pd.DataFrame, user_interactions: pd.DataFrame,
+                   embeddings: np.ndarray, data_summary: Dict, bundle_path: str,
+                   extra_arrays: Dict[str, np.ndarray] = None, config: Dict = None) -> Dict:
+    """
+    Compile les données du moteur en un bundle binaire versionné.
+
+    Le bundle est un dossier contenant un fichier .npy par colonne / tableau
+    (contigu, typé) et un manifest.json avec les types, formes et checksums SHA-256.
+    L'écriture se fait dans un dossier temporaire remplacé à la fin.
+
+    Args:
+        articles_metadata: Métadonnées des articles (alignées sur les lignes des embeddings).
+        user_interactions: Interactions utilisateur-article.
+        embeddings: Matrice des embeddings (articles x dimensions).
+        data_summary: Résumé des données.
+        bundle_path: Dossier de destination du bundle.
+        extra_arrays: Tableaux additionnels à inclure (ex: tables précalculées).
+        config: Configuration du moteur (défaut: RECOMMENDATION_CONFIG), utilisée pour
+                précalculer le tier de popularité servi au démarrage.
+
+    Returns:
+        Le manifest du bundle écrit.
+    """
+    from config import RECOMMENDATION_CONFIG
+    from .popularity_tier import compute_popularity_tier
+
+    logger.info(f"Compiling engine bundle into {bundle_path}...")
+    if len(articles_metadata) != embeddings.shape[0]:
+        raise BundleError(
+            f"articles_metadata ({len(articles_metadata)} rows) and embeddings "
+            f"({embeddings.shape[0]} rows) are not aligned."
+        )
+
+    tmp_path = bundle_path.rstrip(os.sep) + '.tmp'
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    arrays = {}
+    frames = {}
+    for frame_name, frame, dtypes in (('articles_metadata', articles_metadata, METADATA_DTYPES),
+                                      ('user_interactions', user_interactions, INTERACTION_DTYPES)):
+        frames[frame_name] = list(frame.columns)
+        for col in frame.columns:
+            arrays[f"{frame_name}.{col}"] = _column_to_array(frame[col], dtypes.get(col))
+
+    arrays['embeddings'] = np.ascontiguousarray(embeddings, dtype=np.float32)
+    # Utilisateurs dans l'ordre de première apparition (ordre utilisé par le filtrage collaboratif)
+    arrays['id_maps.user_ids'] = np.ascontiguousarray(
+        pd.unique(arrays['user_interactions.user_id']), dtype=np.int32
+    )
+    arrays.update(compute_popularity_tier(user_interactions, articles_metadata, config or RECOMMENDATION_CONFIG))
+    for name, array in (extra_arrays or {}).items():
+        arrays[name] = np.asarray(array)
+
+    arrays_manifest = {name: _write_array(tmp_path, name, array) for name, array in arrays.items()}
+
+    manifest = {
+        'format': BUNDLE_FORMAT,
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'data_version': _data_version(arrays_manifest),
+        'data_summary': data_summary,
+        'frames': frames,
+        'arrays': arrays_manifest,
+    }
+    _write_manifest(tmp_path, manifest)
+
+    if os.path.exists(bundle_path):
+        shutil.rmtree(bundle_path)
+    os.replace(tmp_path, bundle_path)
+
+    logger.info(f"Engine bundle compiled: version {manifest['data_version']}, {len(arrays_manifest)} arrays.")
+    return manifest
+
+
+def add_arrays_to_bundle(bundle_path: str, arrays: Dict[str, np.ndarray]) -> Dict:
+    """
+    Ajoute (ou remplace) des tableaux dans un bundle existant et met à jour son manifest.
+    La version des données n'est pas modifiée : ces tableaux sont dérivés des données du bundle.
+    """
+    manifest = read_manifest(bundle_path)
+    for name, array in arrays.items():
+        manifest['arrays'][name] = _write_array(bundle_path, name, np.asarray(array))
+        logger.info(f"Array '{name}' {tuple(np.shape(array))} added to bundle {bundle_path}.")
+    _write_manifest(bundle_path, manifest)
+    return manifest
+
+
+def estimate_bundle_bytes(manifest: Dict) -> int:
+    """Taille totale (octets) des tableaux d'un bundle, d'après son manifest."""
+    total = 0
+    for entry in manifest['arrays'].values():
+        total += int(np.prod(entry['shape'], dtype=np.int64)) * np.dtype(entry['dtype']).itemsize
+    return total
+
+
+def read_manifest(bundle_path: str) -> Dict:
+    """Lit et valide le manifest d'un bundle."""
+    manifest_path = os.path.join(bundle_path, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        raise BundleError(f"Bundle manifest not found: {manifest_path}")
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != BUNDLE_FORMAT:
+        raise BundleError(f"Unknown bundle format: {manifest.get('format')}")
+    if manifest.get('format_version') != BUNDLE_FORMAT_VERSION:
+        raise BundleError(
+            f"Unsupported bundle format version {manifest.get('format_version')} "
+            f"(expected {BUNDLE_FORMAT_VERSION})."
+        )
+    return manifest
+
+
+def bundle_files(manifest: Dict) -> List[str]:
+    """Liste des fichiers composant un bundle (manifest exclu)."""
+    return [entry['file'] for entry in manifest['arrays'].values()]
+
+
+def _array_path(bundle_path: str, entry: Dict, file_paths: Dict[str, str] = None) -> str:
+    if file_paths and entry['file'] in file_paths:
+        return file_paths[entry['file']]
+    return os.path.join(bundle_path, entry['file'])
+
+
+def verify_bundle(bundle_path: str, manifest: Dict = None, file_paths: Dict[str, str] = None):
+    """Vérifie les checksums de tous les fichiers du bundle. Lève BundleError en cas d'écart."""
+    manifest = manifest or read_manifest(bundle_path)
+    for name, entry in manifest['arrays'].items():
+        path = _array_path(bundle_path, entry, file_paths)
+        if not os.path.exists(path):
+            raise BundleError(f"Bundle file missing for '{name}': {path}")
+        if _sha256_file(path) != entry['sha256']:
+            raise BundleError(f"Checksum mismatch for bundle array '{name}' ({path}).")
+
+
+def load_arrays(bundle_path: str, names: Iterable[str], manifest: Dict = None,
+                file_paths: Dict[str, str] = None) -> Dict[str, np.ndarray]:
+    """Mappe en mémoire une partie des tableaux d'un bundle (ex: le tier de popularité seul)."""
+    manifest = manifest or read_manifest(bundle_path)
+    arrays = {}
+    for name in names:
+        entry = manifest['arrays'][name]
+        array = np.load(_array_path(bundle_path, entry, file_paths), mmap_mode='r', allow_pickle=False)
+        if list(array.shape) != entry['shape'] or np.lib.format.dtype_to_descr(array.dtype) != entry['dtype']:
+            raise BundleError(f"Bundle array '{name}' does not match its manifest entry.")
+        arrays[name] = array
+    return arrays
+
+
+def load_bundle(bundle_path: str, verify_checksums: bool = False, file_paths: Dict[str, str] = None) -> EngineBundle:
+    """
+    Charge un bundle compilé en mappant ses tableaux en mémoire (sans copie).
+
+    Args:
+        bundle_path: Dossier du bundle.
+        verify_checksums: Vérifie les SHA-256 de tous les fichiers avant chargement
+                          (lit l'intégralité des fichiers, à réserver aux bundles fraîchement téléchargés).
+        file_paths: Emplacements des fichiers hors du dossier du bundle (ex: cache d'artefacts),
+                    indexés par nom de fichier du manifest.
+
+    Returns:
+        Un EngineBundle.
+    """
+    manifest = read_manifest(bundle_path)
+    if verify_checksums:
+        verify_bundle(bundle_path, manifest, file_paths)
+
+    arrays = load_arrays(bundle_path, manifest['arrays'], manifest, file_paths)
+    logger.info(f"Engine bundle {manifest['data_version']} memory-mapped from {bundle_path}.")
+    return EngineBundle(bundle_path, manifest, arrays)
+
+
+# Compilation hors ligne : python -m recommendation_engine.bundle processed_data/
+if __name__ == "__main__":
+    import argparse
+    from .data_loader import DataLoader
+
+    parser = argparse.ArgumentParser(description="Compile les données traitées en bundle binaire pour le moteur.")
+    parser.add_argument('processed_data_path', nargs='?', default='processed_data/')
+    parser.add_argument('--output', default=None, help="Dossier du bundle (défaut: <processed_data_path>/engine_bundle)")
+    parser.add_argument('--from-blob', metavar='CONTAINER', default=None,
+                        help="Lit les artefacts bruts depuis ce conteneur Azure (AZURE_STORAGE_CONNECTION_STRING)")
+    args = parser.parse_args()
+
+    loader = DataLoader(args.processed_data_path)
+    if args.from_blob:
+        from azure.storage.blob import BlobServiceClient
+        client = BlobServiceClient.from_connection_string(os.environ["AZURE_STORAGE_CONNECTION_STRING"])
+        loaded = loader.load_legacy_data_from_blob(client, args.from_blob)
+    else:
+        loaded = loader.load_legacy_data()
+    if not loaded:
+        raise SystemExit("Impossible de charger les données traitées.")
+
+    output_path = args.output or os.path.join(args.processed_data_path, DEFAULT_BUNDLE_DIRNAME)
+    compiled_manifest = compile_bundle(
+        loader.get_articles_metadata(), loader.get_user_interactions(),
+        loader.get_embeddings_optimized(), loader.get_data_summary(), output_path
+    )
+    print(f"Bundle {compiled_manifest['data_version']} écrit dans {output_path}")
@@ -1,30 +1,87 @@
 import pandas as pd
 import numpy as np
 import logging
-from typing import List, Dict
+from typing import List, Dict, Tuple
 from scipy.sparse import csr_matrix
-from sklearn.metrics.pairwise import cosine_similarity as sk_cosine_similarity
-from .utils import normalize_scores, filter_read_articles
+from .utils import normalize_scores, top_k_indices
+from .user_index import UserInteractionIndex
+from .neighbour_table import USER_NEIGHBOUR_ARRAYS, ITEM_NEIGHBOUR_ARRAYS, compute_user_neighbours, \
+    compute_item_neighbours, neighbour_table_to_csr, l2_normalize_csr
+from .matrix_factorization import MF_ARRAYS, train_implicit_als
+from .interaction_delta import IncrementalUserArticleMatrix
+from .minhash_lsh import MinHashLSH
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Matrice utilisateur-article de base (CSR), partageable entre workers comme les autres tableaux dérivés
+USER_ARTICLE_ARRAYS = ('collaborative.user_article_indptr', 'collaborative.user_article_indices',
+                       'collaborative.user_article_data')
+
 class CollaborativeFilteringRecommender:
-    def __init__(self, user_interactions: pd.DataFrame, articles_metadata: pd.DataFrame, config: Dict):
+    def __init__(self, user_interactions: pd.DataFrame, articles_metadata: pd.DataFrame, config: Dict,
+                 user_index: UserInteractionIndex = None, artifacts: Dict[str, np.ndarray] = None):
         logger.info("Initializing CollaborativeFilteringRecommender...")
         self.user_interactions = user_interactions
+        self.user_index = user_index if user_index is not None else UserInteractionIndex(user_interactions)
         self.articles_metadata = articles_metadata
         self.config = config
         
+        self.derived_arrays = {}  # tables calculées à l'init (absentes des artefacts), partageables entre workers
         # Pre-calculate user-item matrix for efficient lookup
-        self.user_article_matrix, self.user_to_idx, self.idx_to_user, \
-            self.article_to_idx, self.idx_to_article = self._create_user_article_matrix()
+        user_article_matrix, self.user_to_idx, self.idx_to_user, \
+            self.article_to_idx, self.idx_to_article = self._create_user_article_matrix(artifacts or {})
+        # Base CSR + delta des nouveaux clics (les dictionnaires ci-dessus sont étendus sur place)
+        self.interactions = IncrementalUserArticleMatrix(user_article_matrix, self.user_to_idx, self.idx_to_user,
+                                                         self.article_to_idx, self.idx_to_article)
+        self.interactions.max_delta_interactions = self.config.get('delta_max_interactions', 100000)
+        # Ligne de articles_metadata de chaque colonne de la base (première occurrence de l'article)
+        self._metadata_rows = np.flatnonzero(~self.articles_metadata['article_id'].duplicated().to_numpy())
+
+        # Mode 'user' (utilisateurs similaires), 'item' (articles similaires, indépendant du nombre d'utilisateurs)
+        # ou 'mf' (facteurs latents ALS : un produit matrice-vecteur par requête)
+        self.mode = self.config.get('collaborative_mode', 'user')
+        self.neighbour_indices, self.neighbour_similarities = None, None
+        self.item_similarity = None
+        self.user_factors, self.item_factors = None, None
+        self.lsh_index = None
+        if self.mode == 'item':
+            self.item_similarity = self._load_item_similarity(artifacts or {})
+        elif self.mode == 'mf':
+            self.user_factors, self.item_factors = self._load_factors(artifacts or {})
+        else:
+            # Table des plus proches voisins précalculée : la recherche des utilisateurs similaires devient une lecture
+            self.neighbour_indices, self.neighbour_similarities = self._load_neighbour_table(artifacts or {})
+            if self.config.get('neighbour_search', 'exact') == 'lsh':
+                # Recherche en ligne (utilisateurs hors table) : candidats MinHash/LSH re-scorés exactement
+                self.lsh_index = MinHashLSH.build(user_article_matrix, self.config.get('lsh_hashes', 128),
+                                                  self.config.get('lsh_bands', 64))
+                self.interactions.add_compaction_listener(self.lsh_index.update)
         
         logger.info("CollaborativeFilteringRecommender initialized successfully.")
 
-    def _create_user_article_matrix(self):
+    @property
+    def user_article_matrix(self) -> csr_matrix:
+        """Matrice utilisateur-article de base (sans le delta des clics non encore compactés)."""
+        return self.interactions.base
+
+    @property
+    def article_ids(self) -> np.ndarray:
+        """article_id de chaque colonne de la matrice."""
+        return self.interactions.article_ids
+
+    def record_interaction(self, user_id: int, article_id: int):
         """
-        Crée une matrice utilisateur-article (sparse) à partir des interactions.
+        Enregistre un nouveau clic dans le delta : il est pris en compte dès la requête suivante,
+        et fusionné dans la matrice de base par la compaction périodique.
+        """
+        self.interactions.add_interaction(user_id, article_id)
+        self.interactions.start_compaction(self.config.get('delta_compaction_interval_s', 60))
+
+    def _create_user_article_matrix(self, artifacts: Dict[str, np.ndarray]):
+        """
+        Crée une matrice utilisateur-article (sparse) à partir des interactions,
+        ou la reprend des artefacts (ex: état partagé entre workers) si elle y est.
         """
         logging.info("Création de la matrice utilisateur-article...")
         
@@ -38,6 +95,13 @@ class CollaborativeFilteringRecommender:
         article_to_idx = {article_id: i for i, article_id in enumerate(unique_articles)}
         idx_to_article = {i: article_id for article_id, i in article_to_idx.items()}
 
+        shape = (len(unique_users), len(unique_articles))
+        if all(name in artifacts for name in USER_ARTICLE_ARRAYS) \
+                and len(artifacts[USER_ARTICLE_ARRAYS[0]]) == shape[0] + 1:
+            indptr, indices, data = (artifacts[name] for name in USER_ARTICLE_ARRAYS)
+            logging.info("Matrice utilisateur-article reprise des artefacts.")
+            return csr_matrix((data, indices, indptr), shape=shape), user_to_idx, idx_to_user, article_to_idx, idx_to_article
+
         # Prepare data for sparse matrix
         rows = self.user_interactions['user_id'].map(user_to_idx)
         cols = self.user_interactions['click_article_id'].map(article_to_idx)
@@ -51,86 +115,238 @@ class CollaborativeFilteringRecommender:
         cols = cols[valid_interactions].astype(int)
         data = np.ones(len(rows)) # Implicit feedback: 1 for interaction
 
-        user_article_matrix = csr_matrix((data, (rows, cols)), 
-                                         shape=(len(unique_users), len(unique_articles)))
+        user_article_matrix = csr_matrix((data, (rows, cols)), shape=shape)
+        self.derived_arrays.update(zip(USER_ARTICLE_ARRAYS, (user_article_matrix.indptr, user_article_matrix.indices,
+                                                             user_article_matrix.data)))
         
         logging.info(f"Matrice utilisateur-article créée: {user_article_matrix.shape} (sparsité: {100 * (1 - user_article_matrix.nnz / (user_article_matrix.shape[0] * user_article_matrix.shape[1])):.2f}%)")
         return user_article_matrix, user_to_idx, idx_to_user, article_to_idx, idx_to_article
 
-    def _find_similar_users(self, user_idx: int, max_similar_users: int) -> List[int]:
+    def use_shared_arrays(self, arrays: Dict[str, np.ndarray]):
+        """
+        Remplace les tableaux calculés à l'init par leurs copies partagées (mêmes valeurs, mappées en mémoire) :
+        le worker qui a construit l'état partagé libère ainsi ses copies privées.
+        """
+        if all(name in arrays for name in USER_ARTICLE_ARRAYS) and self.interactions.compactions == 0:
+            indptr, indices, data = (arrays[name] for name in USER_ARTICLE_ARRAYS)
+            self.interactions.base = csr_matrix((data, indices, indptr), shape=self.interactions.base.shape)
+        if self.neighbour_indices is not None and all(name in arrays for name in USER_NEIGHBOUR_ARRAYS):
+            self.neighbour_indices, self.neighbour_similarities = (arrays[name] for name in USER_NEIGHBOUR_ARRAYS)
+        if self.user_factors is not None and all(name in arrays for name in MF_ARRAYS):
+            self.user_factors, self.item_factors = (arrays[name] for name in MF_ARRAYS)
+        self.derived_arrays = {name: arrays.get(name, array) for name, array in self.derived_arrays.items()}
+
+    def _load_neighbour_table(self, artifacts: Dict[str, np.ndarray]):
+        """
+        Charge la table des voisins depuis les artefacts, ou la calcule selon config['user_neighbours'] :
+        'auto' (table si précalculée, sinon calcul à la requête), 'table' (calculée à l'init si absente)
+        ou 'on_request' (calcul à chaque requête).
+        """
+        mode = self.config.get('user_neighbours', 'auto')
+        if mode == 'on_request':
+            return None, None
+        if all(name in artifacts for name in USER_NEIGHBOUR_ARRAYS):
+            indices, similarities = (np.asarray(artifacts[name]) for name in USER_NEIGHBOUR_ARRAYS)
+            if indices.shape[0] == self.user_article_matrix.shape[0]:
+                if indices.shape[1] < self.config['max_similar_users']:
+                    logging.warning(f"Table des voisins limitée à {indices.shape[1]} voisins "
+                                    f"(max_similar_users = {self.config['max_similar_users']}).")
+                return indices, similarities
+            logging.warning("Table des voisins incohérente avec les interactions chargées, elle est ignorée.")
+        if mode == 'table':
+            table = compute_user_neighbours(self.user_article_matrix, self.config['max_similar_users'],
+                                            n_workers=self.config.get('neighbour_workers'))
+            self.derived_arrays.update(table)
+            return tuple(table[name] for name in USER_NEIGHBOUR_ARRAYS)
+        return None, None
+
+    def _load_item_similarity(self, artifacts: Dict[str, np.ndarray]) -> csr_matrix:
+        """
+        Matrice creuse article-article élaguée aux `item_similarity_top_k` voisins par article,
+        chargée depuis les artefacts si elle y a été précalculée, sinon calculée à l'init.
+        """
+        n_articles = self.user_article_matrix.shape[1]
+        if all(name in artifacts for name in ITEM_NEIGHBOUR_ARRAYS) \
+                and artifacts[ITEM_NEIGHBOUR_ARRAYS[0]].shape[0] == n_articles:
+            indices, similarities = (np.asarray(artifacts[name]) for name in ITEM_NEIGHBOUR_ARRAYS)
+        else:
+            table = compute_item_neighbours(self.user_article_matrix, self.config.get('item_similarity_top_k', 50),
+                                            n_workers=self.config.get('neighbour_workers'))
+            self.derived_arrays.update(table)
+            indices, similarities = (table[name] for name in ITEM_NEIGHBOUR_ARRAYS)
+        item_similarity = neighbour_table_to_csr(indices, similarities, n_articles)
+        logging.info(f"Matrice de similarité article-article chargée: {item_similarity.nnz} similarités.")
+        return item_similarity
+
+    def _load_factors(self, artifacts: Dict[str, np.ndarray]):
+        """
+        Facteurs utilisateurs / articles de la factorisation ALS implicite, chargés depuis les artefacts
+        (entraînés hors ligne), ou entraînés à l'init s'ils sont absents ou incohérents avec les données.
+        """
+        if all(name in artifacts for name in MF_ARRAYS) \
+                and artifacts['mf.user_factors'].shape[0] == self.user_article_matrix.shape[0] \
+                and artifacts['mf.item_factors'].shape[0] == self.user_article_matrix.shape[1]:
+            return tuple(np.asarray(artifacts[name]) for name in MF_ARRAYS)
+        logging.warning("Facteurs ALS absents des artefacts : entraînement à l'initialisation "
+                        "(à précalculer avec `python -m recommendation_engine.matrix_factorization`).")
+        factors = train_implicit_als(self.user_article_matrix, self.config.get('mf_factors', 64),
+                                     self.config.get('mf_regularization', 0.1), self.config.get('mf_alpha', 40.0),
+                                     self.config.get('mf_iterations', 10), self.config.get('neighbour_workers'))
+        self.derived_arrays.update(factors)
+        return tuple(factors[name] for name in MF_ARRAYS)
+
+    def _factorized_scores(self, user_id: int, user_idx: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Score factorisé de tous les articles : produit des facteurs articles par le facteur de l'utilisateur, articles lus masqués."""
+        if user_idx >= self.user_factors.shape[0]:
+            logging.info(f"Utilisateur {user_id} absent des facteurs ALS (nouvel utilisateur). Retourne des scores vides.")
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = self.item_factors @ self.user_factors[user_idx]
+        read_idx = self.interactions.row(user_idx).indices
+        scores[read_idx[read_idx < len(scores)]] = -np.inf
+        return np.arange(len(scores)), scores
+
+    def _item_based_scores(self, user_id: int, user_idx: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score item-item : produit creux du vecteur de lecture de l'utilisateur par la matrice de similarité
+        article-article, articles lus masqués.
+        """
+        user_vector = self.interactions.row(user_idx)
+        scores = (user_vector[:, :self.item_similarity.shape[0]] @ self.item_similarity).tocsr()
+        candidate_idx, candidate_scores = scores.indices.astype(np.int64), scores.data.astype(np.float32)
+        candidate_scores[np.isin(candidate_idx, user_vector.indices)] = -np.inf
+        if len(candidate_idx) == 0:
+            logging.info(f"Aucun article similaire trouvé pour l'utilisateur {user_id}. Retourne des scores vides.")
+        return candidate_idx, candidate_scores
+
+    def _user_based_scores(self, user_id: int, user_idx: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Score user-based : somme des similarités des voisins ayant lu chaque article, articles lus masqués."""
+        # Find similar users
+        max_similar_users = self.config['max_similar_users']
+        similar_user_indices, similar_user_similarities = self._find_similar_users(user_idx, max_similar_users)
+
+        if len(similar_user_indices) == 0:
+            logging.info(f"Aucun utilisateur similaire trouvé pour l'utilisateur {user_id}. Retourne des scores vides.")
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        # Score de chaque article : somme des similarités des voisins qui l'ont lu (lignes normalisées),
+        # en un seul produit creux vecteur de similarités x lignes des voisins (base + delta)
+        neighbour_weights = csr_matrix(similar_user_similarities.reshape(1, -1))
+        scores = (neighbour_weights @ l2_normalize_csr(self.interactions.rows(similar_user_indices))).tocsr()
+        candidate_idx, candidate_scores = scores.indices.astype(np.int64), scores.data.astype(np.float32)
+
+        # Masque des articles déjà lus par l'utilisateur
+        candidate_scores[np.isin(candidate_idx, self.interactions.row(user_idx).indices)] = -np.inf
+        return candidate_idx, candidate_scores
+
+    def _exact_similarities(self, query: csr_matrix) -> Tuple[np.ndarray, np.ndarray]:
+        """Similarités cosinus de la ligne normalisée `query` avec tous les utilisateurs ayant un article en commun."""
+        # Similarités creuses : seuls les utilisateurs ayant un article en commun sont calculés
+        normalized_base_transposed = self.interactions.normalized_base_transposed()
+        similarities = (query[:, :normalized_base_transposed.shape[0]] @ normalized_base_transposed).tocsr()
+        candidate_users, candidate_similarities = similarities.indices.astype(np.int64), similarities.data.astype(np.float32)
+        touched_users = self.interactions.touched_users()
+        if len(touched_users):
+            # Utilisateurs modifiés par le delta : similarités recalculées sur leurs lignes combinées
+            touched_similarities = (l2_normalize_csr(self.interactions.rows(touched_users)) @ query.T).toarray().ravel()
+            keep = ~np.isin(candidate_users, touched_users)
+            candidate_users = np.concatenate((candidate_users[keep], touched_users.astype(np.int64)))
+            candidate_similarities = np.concatenate((candidate_similarities[keep], touched_similarities.astype(np.float32)))
+        return candidate_users, candidate_similarities
+
+    def _lsh_similarities(self, query: csr_matrix) -> Tuple[np.ndarray, np.ndarray]:
+        """Similarités cosinus exactes des seuls candidats LSH (et des utilisateurs modifiés par le delta)."""
+        touched_users = self.interactions.touched_users().astype(np.int64)
+        candidate_users = np.setdiff1d(self.lsh_index.candidates(query.indices), touched_users)
+        normalized_base = self.interactions.normalized_base()
+        candidate_users = candidate_users[candidate_users < normalized_base.shape[0]]
+        similarities = (normalized_base[candidate_users] @ query[:, :normalized_base.shape[1]].T).toarray().ravel()
+        if len(touched_users):
+            touched_similarities = (l2_normalize_csr(self.interactions.rows(touched_users)) @ query.T).toarray().ravel()
+            candidate_users = np.concatenate((candidate_users, touched_users))
+            similarities = np.concatenate((similarities, touched_similarities))
+        return candidate_users, similarities.astype(np.float32)
+
+    def _find_similar_users(self, user_idx: int, max_similar_users: int) -> Tuple[np.ndarray, np.ndarray]:
         """
         Trouve les utilisateurs les plus similaires à un utilisateur donné.
-        Utilise la similarité cosinus sur la matrice utilisateur-article.
+        Utilise la similarité cosinus sur la matrice utilisateur-article (table précalculée si disponible,
+        sinon calcul exact ou re-scoring des candidats MinHash/LSH selon config['neighbour_search']).
+
+        Returns:
+            (indices des utilisateurs similaires, similarités), triés par similarité décroissante (> 0).
         """
         if user_idx not in self.idx_to_user:
             logging.warning(f"Utilisateur avec index {user_idx} non trouvé dans le mapping.")
-            return []
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
 
-        user_vector = self.user_article_matrix[user_idx]
-        
-        # Calculate cosine similarity between the user vector and all other user vectors
-        # This can be slow for very large matrices. Consider approximate methods for production.
-        similarities = sk_cosine_similarity(user_vector, self.user_article_matrix).flatten()
-        
-        # Get indices of similar users, excluding the user itself
-        similar_user_indices = similarities.argsort()[::-1][1:] # Exclude self
-        
-        # Filter by similarity threshold if needed (not explicitly in prompt, but good practice)
-        # similarities[similar_user_indices] > self.config['similarity_threshold']
-        
-        # Take top N similar users
-        top_similar_users = [idx for idx in similar_user_indices if similarities[idx] > 0][:max_similar_users] # Only positive similarity
+        if self.neighbour_indices is not None and user_idx < self.neighbour_indices.shape[0]:
+            neighbours = self.neighbour_indices[user_idx, :max_similar_users]
+            valid = neighbours >= 0
+            logging.info(f"Trouvé {int(valid.sum())} utilisateurs similaires pour l'utilisateur {self.idx_to_user[user_idx]} (table précalculée).")
+            return neighbours[valid].astype(np.int64), self.neighbour_similarities[user_idx, :max_similar_users][valid]
+
+        query = l2_normalize_csr(self.interactions.row(user_idx))
+        if self.lsh_index is not None:
+            candidate_users, candidate_similarities = self._lsh_similarities(query)
+        else:
+            candidate_users, candidate_similarities = self._exact_similarities(query)
+        # Exclut l'utilisateur lui-même et les similarités nulles
+        candidate_similarities[(candidate_users == user_idx) | (candidate_similarities <= 0)] = -np.inf
+        top = top_k_indices(candidate_similarities, max_similar_users)
         
-        logging.info(f"Trouvé {len(top_similar_users)} utilisateurs similaires pour l'utilisateur {self.idx_to_user[user_idx]}.")
-        return top_similar_users
+        logging.info(f"Trouvé {len(top)} utilisateurs similaires pour l'utilisateur {self.idx_to_user[user_idx]}.")
+        return candidate_users[top].astype(np.int64), candidate_similarities[top]
+
+    def _column_scores(self, user_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Colonnes (articles) candidates et scores bruts selon config['collaborative_mode'], non triés,
+        articles lus à -inf ; tableaux vides si l'utilisateur est inconnu ou sans candidat.
+        """
+        user_idx = self.user_to_idx.get(user_id)
+        if user_idx is None:
+            logging.info(f"Utilisateur {user_id} non trouvé dans les données d'interactions. Retourne des scores vides.")
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if self.mode == 'item':
+            return self._item_based_scores(user_id, user_idx)
+        if self.mode == 'mf':
+            return self._factorized_scores(user_id, user_idx)
+        return self._user_based_scores(user_id, user_idx)
+
+    def _candidate_columns(self, user_id: int, n_recommendations: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Les `n_recommendations` meilleures colonnes candidates et leurs scores bruts, triés par score décroissant."""
+        columns, scores = self._column_scores(user_id)
+        top = top_k_indices(scores, n_recommendations)
+        if len(columns) and len(top) == 0:
+            logging.info(f"Aucun article candidat pour l'utilisateur {user_id}. Retourne des scores vides.")
+        elif len(top):
+            logging.info(f"Recommandations collaboratives (mode {self.mode}) générées pour l'utilisateur {user_id}.")
+        return columns[top], scores[top]
+
+    def recommend_candidates(self, user_id: int, n_candidates: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Retourne les `n_candidates` meilleurs articles collaboratifs de l'utilisateur.
+
+        Returns:
+            (lignes des articles dans articles_metadata, scores bruts), triés par score décroissant.
+            Les articles ajoutés par le delta et absents des métadonnées sont ignorés.
+        """
+        columns, scores = self._candidate_columns(user_id, n_candidates)
+        in_metadata = columns < len(self._metadata_rows)
+        return self._metadata_rows[columns[in_metadata]], scores[in_metadata]
 
     def recommend(self, user_id: int, n_recommendations: int = 5) -> Dict[int, float]:
         """
-        Recommande des articles basés sur le filtrage collaboratif (user-based).
+        Recommande des articles basés sur le filtrage collaboratif (user-based, item-item ou factorisation
+        selon config['collaborative_mode']).
         
         Args:
             user_id: ID de l'utilisateur.
             n_recommendations: Nombre de recommandations à générer (avant combinaison).
             
         Returns:
-            Dictionnaire des scores de recommandation {article_id: score}.
+            Dictionnaire des scores normalisés {article_id: score} des `n_recommendations` meilleurs candidats.
         """
         logging.info(f"Génération de recommandations basées sur le filtrage collaboratif pour l'utilisateur {user_id}.")
-
-        user_idx = self.user_to_idx.get(user_id)
-        if user_idx is None:
-            logging.info(f"Utilisateur {user_id} non trouvé dans les données d'interactions. Retourne des scores vides.")
-            return {}
-
-        # Find similar users
-        max_similar_users = self.config['max_similar_users']
-        similar_user_indices = self._find_similar_users(user_idx, max_similar_users)
-
-        if not similar_user_indices:
-            logging.info(f"Aucun utilisateur similaire trouvé pour l'utilisateur {user_id}. Retourne des scores vides.")
-            return {}
-
-        # Collect articles read by similar users
-        candidate_article_scores = {}
-        for s_user_idx in similar_user_indices:
-            # Get articles read by similar user
-            articles_read_by_similar_user_indices = self.user_article_matrix[s_user_idx].nonzero()[1]
-            
-            for article_idx in articles_read_by_similar_user_indices:
-                article_id = self.idx_to_article[article_idx]
-                # Simple scoring: increment count for each time an article is read by a similar user
-                # Can be weighted by similarity score of the similar user
-                candidate_article_scores[article_id] = candidate_article_scores.get(article_id, 0) + 1 
-        
-        # Filter out articles already read by the current user
-        user_read_article_ids = self.user_interactions[self.user_interactions['user_id'] == user_id]['click_article_id'].unique()
-        filtered_candidate_scores = {
-            aid: score for aid, score in candidate_article_scores.items() 
-            if aid not in user_read_article_ids
-        }
-
+        columns, scores = self._candidate_columns(user_id, n_recommendations)
         # Normalize scores
-        normalized_scores = normalize_scores(filtered_candidate_scores)
-        
-        logging.info(f"Recommandations collaboratives générées pour l'utilisateur {user_id}.")
-        return normalized_scores
+        return normalize_scores(dict(zip(self.article_ids[columns].tolist(), scores.tolist())))
@@ -2,23 +2,101 @@ import pandas as pd
 import numpy as np
 import logging
 from typing import List, Dict
-from .utils import calculate_cosine_similarity, normalize_scores, filter_read_articles
+from .utils import normalize_scores, l2_normalize_rows, top_k_indices, top_k_per_row
+from .user_index import UserInteractionIndex
+from .ann_index import IVFIndex, IVF_ARRAYS
+from .quantization import QuantizedEmbeddings, QUANTIZED_ARRAYS
+from .user_profiles import UserProfileStore
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Blocs du scoring par lots : une matrice de scores (utilisateurs x articles) de 512 x 32768 float32 = 64 Mo
+BATCH_USER_BLOCK_SIZE = 512
+BATCH_ARTICLE_BLOCK_SIZE = 32768
+NORMALIZED_EMBEDDINGS_ARRAY = 'content.normalized_embeddings'
+
 class ContentBasedRecommender:
     def __init__(self, user_interactions: pd.DataFrame, articles_metadata: pd.DataFrame, 
-                 embeddings_optimized: np.ndarray, article_id_to_embedding_idx: Dict[int, int], config: Dict):
+                 embeddings_optimized: np.ndarray, article_id_to_embedding_idx: Dict[int, int], config: Dict,
+                 user_index: UserInteractionIndex = None, artifacts: Dict[str, np.ndarray] = None):
         logger.info("Initializing ContentBasedRecommender...")
         self.user_interactions = user_interactions
+        self.user_index = user_index if user_index is not None else UserInteractionIndex(user_interactions)
         self.articles_metadata = articles_metadata
         self.embeddings_optimized = embeddings_optimized
         self.article_id_to_embedding_idx = article_id_to_embedding_idx
         self.config = config
+
+        # Espace d'index des articles : lignes de articles_metadata (alignées sur les lignes des embeddings)
+        self.article_ids = self.articles_metadata['article_id'].to_numpy()
+        self.n_scored_articles = min(len(self.article_ids), self.embeddings_optimized.shape[0])
+        if self.n_scored_articles < len(self.article_ids):
+            logger.warning(f"{len(self.article_ids) - self.n_scored_articles} articles have no embedding and will not be scored.")
+
+        # Normalisation L2 une fois pour toutes : un produit matrice-vecteur donne alors la similarité cosinus.
+        # En mode quantifié, seule la forme compacte est gardée en mémoire ; la liste restreinte issue du
+        # premier passage est re-scorée sur les embeddings pleine précision (mappés en mémoire depuis le bundle).
+        # Les formes déjà calculées (ex: état partagé entre workers) sont reprises des artefacts ; celles calculées
+        # ici sont exposées dans `derived_arrays`.
+        artifacts = artifacts or {}
+        self.derived_arrays = {}
+        self.quantized_embeddings = None
+        self.normalized_embeddings = None
+        quantization = self.config.get('embedding_quantization', 'none')
+        expected_shape = (self.n_scored_articles, self.embeddings_optimized.shape[1])
+        if quantization != 'none':
+            codes = artifacts.get(QUANTIZED_ARRAYS[0])
+            if codes is not None and codes.shape == expected_shape \
+                    and codes.dtype == (np.int8 if quantization == 'int8' else np.float16):
+                self.quantized_embeddings = QuantizedEmbeddings.from_arrays(artifacts)
+            else:
+                self.quantized_embeddings = QuantizedEmbeddings.from_embeddings(
+                    self.embeddings_optimized[:self.n_scored_articles], quantization
+                )
+                self.derived_arrays.update(self.quantized_embeddings.to_arrays())
+            logger.info(f"Embeddings quantized to {quantization}: {self.quantized_embeddings.nbytes / 1e6:.1f} MB.")
+        elif artifacts.get(NORMALIZED_EMBEDDINGS_ARRAY) is not None \
+                and artifacts[NORMALIZED_EMBEDDINGS_ARRAY].shape == expected_shape:
+            self.normalized_embeddings = artifacts[NORMALIZED_EMBEDDINGS_ARRAY]
+        else:
+            self.normalized_embeddings = l2_normalize_rows(self.embeddings_optimized[:self.n_scored_articles])
+            self.derived_arrays[NORMALIZED_EMBEDDINGS_ARRAY] = self.normalized_embeddings
+        scoring_embeddings = self.quantized_embeddings if self.quantized_embeddings is not None else self.normalized_embeddings
+
+        # Centroïdes des profils utilisateurs, précalculés et mis à jour à chaque nouveau clic
+        self.profile_store = UserProfileStore(
+            self.user_index, self.article_ids, self.embeddings_optimized,
+            max_users=self.config.get('user_profile_max_users', 50000)
+        )
+
+        # Index approché optionnel : rechargé depuis le bundle s'il y a été précalculé, sinon construit ici
+        self.ann_index = None
+        if self.config.get('content_index', 'exact') == 'ivf':
+            if all(name in artifacts for name in IVF_ARRAYS) \
+                    and int(np.max(artifacts['content_ivf.list_rows'], initial=-1)) < self.n_scored_articles:
+                self.ann_index = IVFIndex.from_arrays(scoring_embeddings, artifacts)
+            else:
+                self.ann_index = IVFIndex.build(scoring_embeddings, n_lists=self.config.get('ivf_n_lists'))
+                self.derived_arrays.update(self.ann_index.to_arrays())
         
         logger.info("ContentBasedRecommender initialized successfully.")
 
+    def use_shared_arrays(self, arrays: Dict[str, np.ndarray]):
+        """
+        Remplace les formes calculées à l'init par leurs copies partagées (mêmes valeurs, mappées en mémoire) :
+        le worker qui a construit l'état partagé libère ainsi ses copies privées.
+        """
+        if self.quantized_embeddings is not None and all(name in arrays for name in QUANTIZED_ARRAYS):
+            self.quantized_embeddings = QuantizedEmbeddings.from_arrays(arrays)
+        elif self.normalized_embeddings is not None and NORMALIZED_EMBEDDINGS_ARRAY in arrays:
+            self.normalized_embeddings = arrays[NORMALIZED_EMBEDDINGS_ARRAY]
+        scoring_embeddings = self.quantized_embeddings if self.quantized_embeddings is not None else self.normalized_embeddings
+        if self.ann_index is not None:
+            source = arrays if all(name in arrays for name in IVF_ARRAYS) else self.ann_index.to_arrays()
+            self.ann_index = IVFIndex.from_arrays(scoring_embeddings, source)
+        self.derived_arrays = {name: arrays.get(name, array) for name, array in self.derived_arrays.items()}
+
     def _get_article_embedding(self, article_id: int) -> np.ndarray:
         """
         Récupère l'embedding d'un article donné.
@@ -29,6 +107,166 @@ class ContentBasedRecommender:
         logging.warning(f"Embedding non trouvé pour l'article_id: {article_id}")
         return None
 
+    def _user_profile_centroid(self, user_id: int) -> np.ndarray:
+        """
+        Centroïde des embeddings des 5 derniers articles lus par l'utilisateur (None si indisponible).
+        """
+        return self.profile_store.centroid(user_id)
+
+    def record_click(self, user_id: int, article_id: int):
+        """Met à jour le profil de l'utilisateur après un nouveau clic."""
+        self.profile_store.append_click(user_id, article_id)
+
+    def _read_rows(self, user_id: int) -> np.ndarray:
+        """Lignes (espace d'index des articles) des articles déjà lus par l'utilisateur."""
+        rows = [self.article_id_to_embedding_idx.get(article_id) for article_id in self.user_index.read_articles(user_id).tolist()]
+        return np.array([row for row in rows if row is not None and row < self.n_scored_articles], dtype=np.int64)
+
+    def score_centroid(self, centroid: np.ndarray, excluded_rows: np.ndarray, n_candidates: int):
+        """
+        Noyau de scoring : un produit matrice-vecteur contre les embeddings normalisés,
+        exclusion des articles lus par masque, puis sélection top-M par argpartition.
+        Avec l'index IVF, seules les listes les plus proches du centroïde sont parcourues.
+        Avec des embeddings quantifiés, les `rescore_shortlist` meilleurs candidats sont re-scorés en pleine précision.
+
+        Returns:
+            (lignes des articles candidats, similarités cosinus), triés par score décroissant.
+        """
+        norm = np.linalg.norm(centroid)
+        if norm == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = (centroid / norm).astype(np.float32)
+        n_first_pass = n_candidates
+        if self.quantized_embeddings is not None:
+            n_first_pass = max(n_candidates, self.config.get('rescore_shortlist', 200))
+
+        if self.ann_index is not None:
+            top_rows, top_scores = self.ann_index.search(query, n_first_pass, self.config.get('ivf_nprobe', 8), excluded_rows)
+        else:
+            if self.quantized_embeddings is not None:
+                scores = self.quantized_embeddings.score(query)
+            else:
+                scores = self.normalized_embeddings @ query
+            scores[excluded_rows] = -np.inf
+            top_rows = top_k_indices(scores, n_first_pass)
+            top_scores = scores[top_rows]
+
+        if self.quantized_embeddings is not None:
+            return self._rescore(top_rows, query, n_candidates)
+        return top_rows, top_scores
+
+    def _rescore(self, rows: np.ndarray, query: np.ndarray, n_candidates: int):
+        """Re-score une liste restreinte de lignes avec les embeddings pleine précision."""
+        sorted_rows = np.sort(rows)  # accès croissants : lecture séquentielle des pages mappées
+        exact_scores = l2_normalize_rows(self.embeddings_optimized[sorted_rows]) @ query
+        top = top_k_indices(exact_scores, n_candidates)
+        return sorted_rows[top], exact_scores[top]
+
+    def recommend_candidates(self, user_id: int, n_candidates: int):
+        """
+        Retourne les `n_candidates` articles non lus les plus proches du profil de l'utilisateur.
+
+        Returns:
+            (lignes des articles dans articles_metadata, similarités cosinus), triés par score décroissant.
+        """
+        if self.user_index.count(user_id) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        centroid = self._user_profile_centroid(user_id)
+        if centroid is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        return self.score_centroid(centroid, self._read_rows(user_id), n_candidates)
+
+    def score_centroids_batch(self, centroids: np.ndarray, excluded_rows: List[np.ndarray], n_candidates: int,
+                              user_block_size: int = BATCH_USER_BLOCK_SIZE,
+                              article_block_size: int = BATCH_ARTICLE_BLOCK_SIZE):
+        """
+        Scoring par lots : un produit matrice-matrice (GEMM) par bloc d'utilisateurs et bloc d'articles,
+        exclusion des articles lus, puis top-M par ligne fusionné d'un bloc d'articles à l'autre.
+        La mémoire temporaire est bornée par user_block_size x article_block_size scores.
+        Toujours exact : l'index IVF n'est pas utilisé ; les embeddings quantifiés le sont avec re-scoring.
+
+        Args:
+            centroids: Matrice (n_utilisateurs x dimensions) des profils.
+            excluded_rows: Pour chaque utilisateur, les lignes d'articles à exclure.
+            n_candidates: Nombre de candidats par utilisateur.
+
+        Returns:
+            (lignes, scores), matrices (n_utilisateurs x n_candidates) triées par score décroissant ;
+            lignes à -1 quand il n'y a pas assez de candidats.
+        """
+        scoring_embeddings = self.quantized_embeddings if self.quantized_embeddings is not None else self.normalized_embeddings
+        n_first_pass = n_candidates
+        if self.quantized_embeddings is not None:
+            n_first_pass = max(n_candidates, self.config.get('rescore_shortlist', 200))
+        n_first_pass = min(n_first_pass, self.n_scored_articles)
+        queries = l2_normalize_rows(centroids)
+
+        all_rows = np.full((len(queries), n_first_pass), -1, dtype=np.int64)
+        all_scores = np.full((len(queries), n_first_pass), -np.inf, dtype=np.float32)
+        for user_start in range(0, len(queries), user_block_size):
+            block_queries = queries[user_start:user_start + user_block_size]
+            block_excluded = excluded_rows[user_start:user_start + user_block_size]
+            # Coordonnées (utilisateur du bloc, ligne exclue) pour masquer les articles lus
+            excluded_users = np.repeat(np.arange(len(block_excluded)), [len(rows) for rows in block_excluded])
+            excluded_articles = np.concatenate(block_excluded).astype(np.int64)
+            # Lignes nulles (profil vide) : aucun candidat
+            empty_queries = ~block_queries.any(axis=1)
+
+            best_rows = np.empty((len(block_queries), 0), dtype=np.int64)
+            best_scores = np.empty((len(block_queries), 0), dtype=np.float32)
+            for article_start in range(0, self.n_scored_articles, article_block_size):
+                article_end = min(article_start + article_block_size, self.n_scored_articles)
+                scores = block_queries @ scoring_embeddings[article_start:article_end].T
+                in_block = (excluded_articles >= article_start) & (excluded_articles < article_end)
+                scores[excluded_users[in_block], excluded_articles[in_block] - article_start] = -np.inf
+                scores[empty_queries] = -np.inf
+                top, top_scores = top_k_per_row(scores, n_first_pass)
+                # Fusion avec les meilleurs candidats des blocs précédents
+                merged_rows = np.concatenate([best_rows, np.where(top >= 0, top + article_start, -1)], axis=1)
+                merged_scores = np.concatenate([best_scores, top_scores], axis=1)
+                top, best_scores = top_k_per_row(merged_scores, n_first_pass)
+                best_rows = np.where(top >= 0, np.take_along_axis(merged_rows, np.maximum(top, 0), axis=1), -1)
+            all_rows[user_start:user_start + len(block_queries), :best_rows.shape[1]] = best_rows
+            all_scores[user_start:user_start + len(block_queries), :best_scores.shape[1]] = best_scores
+
+        if self.quantized_embeddings is None:
+            return all_rows[:, :n_candidates], all_scores[:, :n_candidates]
+        rows = np.full((len(queries), n_candidates), -1, dtype=np.int64)
+        scores = np.full((len(queries), n_candidates), -np.inf, dtype=np.float32)
+        for i, query in enumerate(queries):
+            shortlist = all_rows[i][all_rows[i] >= 0]
+            rescored_rows, rescored_scores = self._rescore(shortlist, query, n_candidates)
+            rows[i, :len(rescored_rows)] = rescored_rows
+            scores[i, :len(rescored_scores)] = rescored_scores
+        return rows, scores
+
+    def recommend_batch(self, user_ids: List[int], n_recommendations: int = 5) -> Dict[int, Dict[int, float]]:
+        """
+        Version par lots de `recommend` : les profils sont empilés et scorés par produits matrice-matrice.
+
+        Returns:
+            {user_id: {article_id: score normalisé}} (dictionnaire vide pour les utilisateurs sans profil).
+        """
+        logging.info(f"Génération de recommandations basées sur le contenu pour {len(user_ids)} utilisateurs.")
+        results = {user_id: {} for user_id in user_ids}
+        profiled_users, centroids = [], []
+        for user_id in user_ids:
+            centroid = self._user_profile_centroid(user_id) if self.user_index.count(user_id) > 0 else None
+            if centroid is not None:
+                profiled_users.append(user_id)
+                centroids.append(centroid)
+        if not profiled_users:
+            return results
+
+        rows, scores = self.score_centroids_batch(
+            np.vstack(centroids), [self._read_rows(user_id) for user_id in profiled_users], n_recommendations
+        )
+        for user_id, user_rows, user_scores in zip(profiled_users, rows, scores):
+            valid = user_rows >= 0
+            article_scores = dict(zip(self.article_ids[user_rows[valid]].tolist(), user_scores[valid].tolist()))
+            results[user_id] = normalize_scores(article_scores)
+        return results
+
     def recommend(self, user_id: int, n_recommendations: int = 5) -> Dict[int, float]:
         """
         Recommande des articles basés sur le contenu, similaires aux derniers articles lus par l'utilisateur.
@@ -38,58 +276,20 @@ class ContentBasedRecommender:
             n_recommendations: Nombre de recommandations à générer (avant combinaison).
             
         Returns:
-            Dictionnaire des scores de similarité {article_id: score}.
+            Dictionnaire des scores de similarité normalisés {article_id: score} des meilleurs candidats.
         """
         logging.info(f"Génération de recommandations basées sur le contenu pour l'utilisateur {user_id}.")
 
-        user_history = self.user_interactions[self.user_interactions['user_id'] == user_id]
-        
-        if user_history.empty:
+        if self.user_index.count(user_id) == 0:
             logging.info(f"Aucun historique d'interactions trouvé pour l'utilisateur {user_id}. Retourne des scores vides.")
             return {}
 
-        # Récupérer les 5 derniers articles lus par l'utilisateur
-        # Sort by timestamp to get the latest articles
-        latest_articles = user_history.sort_values(by='click_timestamp', ascending=False)['click_article_id'].head(5).tolist()
-        
-        user_profile_embeddings = []
-        for article_id in latest_articles:
-            embedding = self._get_article_embedding(article_id)
-            if embedding is not None:
-                user_profile_embeddings.append(embedding)
-        
-        if not user_profile_embeddings:
-            logging.info(f"Aucun embedding valide trouvé pour les derniers articles lus par l'utilisateur {user_id}. Retourne des scores vides.")
+        top_rows, top_scores = self.recommend_candidates(user_id, n_recommendations)
+        if len(top_rows) == 0:
+            logging.info(f"Aucun article candidat disponible pour l'utilisateur {user_id}. Retourne des scores vides.")
             return {}
 
-        # Calculer le centroïde des embeddings de ces articles
-        user_profile_centroid = np.mean(user_profile_embeddings, axis=0)
-
-        # Trouver les articles les plus similaires au centroïde
-        # Calculer la similarité avec tous les articles disponibles (non lus)
-        
-        # Get all article IDs that are not in the user's read history
-        read_article_ids = user_history['click_article_id'].unique()
-        
-        candidate_article_ids = [
-            aid for aid in self.articles_metadata['article_id'].tolist() 
-            if aid not in read_article_ids and self._get_article_embedding(aid) is not None
-        ]
-        
-        if not candidate_article_ids:
-            logging.info(f"Aucun article candidat disponible pour l'utilisateur {user_id} après filtrage. Retourne des scores vides.")
-            return {}
-
-        # Get embeddings for candidate articles
-        candidate_embeddings = np.array([self._get_article_embedding(aid) for aid in candidate_article_ids])
-        
-        # Calculate cosine similarity between user centroid and candidate articles
-        similarity_scores = calculate_cosine_similarity(candidate_embeddings, user_profile_centroid)
-        
-        # Map scores back to article_ids
-        article_scores = {candidate_article_ids[i]: score for i, score in enumerate(similarity_scores)}
-        
-        # Normalize scores to 0-1 range
+        article_scores = dict(zip(self.article_ids[top_rows].tolist(), top_scores.tolist()))
         normalized_article_scores = normalize_scores(article_scores)
 
         logging.info(f"Recommandations basées sur le contenu générées pour l'utilisateur {user_id}.")
@@ -4,6 +4,8 @@ import os
 import pickle
 import json
 import logging
+from .bundle import load_bundle, DEFAULT_BUNDLE_DIRNAME, INTERACTION_DTYPES, METADATA_DTYPES
+from .jsonl_reader import read_json_lines, iter_file_chunks, iter_blob_chunks, prefetch_chunks
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -16,26 +18,60 @@ class DataLoader:
         self.articles_metadata_path = os.path.join(self.processed_data_path, 'articles_metadata.json')
         self.embeddings_optimized_path = os.path.join(self.processed_data_path, 'embeddings_optimized.pkl')
         self.data_summary_path = os.path.join(self.processed_data_path, 'data_summary.json')
+        self.bundle_path = os.path.join(self.processed_data_path, DEFAULT_BUNDLE_DIRNAME)
         
         logger.info(f"Full path for user_interactions: {os.path.abspath(self.user_interactions_path)}")
         logger.info(f"Full path for articles_metadata: {os.path.abspath(self.articles_metadata_path)}")
         logger.info(f"Full path for embeddings_optimized: {os.path.abspath(self.embeddings_optimized_path)}")
         logger.info(f"Full path for data_summary: {os.path.abspath(self.data_summary_path)}")
+        logger.info(f"Full path for engine bundle: {os.path.abspath(self.bundle_path)}")
 
         self.user_interactions = None
         self.articles_metadata = None
         self.embeddings_optimized = None
         self.data_summary = None
+        self.bundle = None
 
     def load_all_data(self):
+        """
+        Charge les données du moteur depuis le bundle compilé (mappé en mémoire).
+        Le bundle est produit hors ligne par `python -m recommendation_engine.bundle`.
+        """
+        logger.info(f"Starting to load engine bundle from {self.bundle_path}...")
+        try:
+            self.bundle = load_bundle(self.bundle_path)
+            self.user_interactions = self.bundle.user_interactions
+            self.articles_metadata = self.bundle.articles_metadata
+            self.embeddings_optimized = self.bundle.embeddings
+            self.data_summary = self.bundle.data_summary
+            logger.info(f"Loaded engine bundle {self.bundle.data_version}: {len(self.user_interactions)} interactions, "
+                        f"{len(self.articles_metadata)} articles, embeddings shape {self.embeddings_optimized.shape}.")
+            return True
+        except Exception as e:
+            logger.error(f"An error occurred during bundle loading: {e}", exc_info=True)
+            return False
+
+    def load_legacy_data(self):
+        """
+        Charge les artefacts bruts (JSON lines + pickle). Réservé à la compilation hors ligne du bundle.
+        Les fichiers JSON lines sont lus en flux, bloc par bloc, dans des colonnes typées.
+        """
         logger.info(f"Starting to load all data from {self.processed_data_path}...")
         try:
+            logger.info(f"Loading data_summary.json from {self.data_summary_path}")
+            with open(self.data_summary_path, 'r') as f:
+                self.data_summary = json.load(f)
+            logger.info(f"Loaded data_summary.json: {self.data_summary}")
+
             logger.info(f"Loading user_interactions.json from {self.user_interactions_path}")
-            self.user_interactions = pd.read_json(self.user_interactions_path, lines=True)
+            self.user_interactions = read_json_lines(
+                iter_file_chunks(self.user_interactions_path), INTERACTION_DTYPES,
+                expected_rows=self.data_summary.get('total_interactions')
+            )
             logger.info(f"Loaded user_interactions.json: {len(self.user_interactions)} interactions, shape {self.user_interactions.shape}.")
             
             logger.info(f"Loading articles_metadata.json from {self.articles_metadata_path}")
-            self.articles_metadata = pd.read_json(self.articles_metadata_path, lines=True)
+            self.articles_metadata = read_json_lines(iter_file_chunks(self.articles_metadata_path), METADATA_DTYPES)
             logger.info(f"Loaded articles_metadata.json: {len(self.articles_metadata)} articles, shape {self.articles_metadata.shape}.")
             
             logger.info(f"Loading embeddings_optimized.pkl from {self.embeddings_optimized_path}")
@@ -43,11 +79,6 @@ class DataLoader:
                 self.embeddings_optimized = pickle.load(f)
             logger.info(f"Loaded embeddings_optimized.pkl: shape {self.embeddings_optimized.shape}, type {type(self.embeddings_optimized)}.")
             
-            logger.info(f"Loading data_summary.json from {self.data_summary_path}")
-            with open(self.data_summary_path, 'r') as f:
-                self.data_summary = json.load(f)
-            logger.info(f"Loaded data_summary.json: {self.data_summary}")
-            
             logger.info("All data loaded successfully.")
             return True
         except FileNotFoundError as fnf_error:
@@ -57,6 +88,39 @@ class DataLoader:
             logger.error(f"An error occurred during data loading: {e}", exc_info=True)
             return False
 
+    def load_legacy_data_from_blob(self, blob_service_client, container_name: str):
+        """
+        Charge les artefacts bruts depuis Azure Blob Storage, en parsant les JSON lines
+        au fil du téléchargement. Réservé à la compilation hors ligne du bundle.
+        """
+        logger.info(f"Starting to load all data from blob container {container_name}...")
+        try:
+            def blob_client(blob_name):
+                return blob_service_client.get_blob_client(container=container_name, blob=blob_name)
+
+            self.data_summary = json.loads(blob_client('data_summary.json').download_blob().readall())
+            logger.info(f"Loaded data_summary.json: {self.data_summary}")
+
+            self.user_interactions = read_json_lines(
+                prefetch_chunks(iter_blob_chunks(blob_client('user_interactions.json'))), INTERACTION_DTYPES,
+                expected_rows=self.data_summary.get('total_interactions')
+            )
+            logger.info(f"Loaded user_interactions.json: {len(self.user_interactions)} interactions, shape {self.user_interactions.shape}.")
+
+            self.articles_metadata = read_json_lines(
+                prefetch_chunks(iter_blob_chunks(blob_client('articles_metadata.json'))), METADATA_DTYPES
+            )
+            logger.info(f"Loaded articles_metadata.json: {len(self.articles_metadata)} articles, shape {self.articles_metadata.shape}.")
+
+            self.embeddings_optimized = pickle.loads(blob_client('embeddings_optimized.pkl').download_blob().readall())
+            logger.info(f"Loaded embeddings_optimized.pkl: shape {self.embeddings_optimized.shape}.")
+
+            logger.info("All data loaded successfully from blob storage.")
+            return True
+        except Exception as e:
+            logger.error(f"An error occurred during blob data loading: {e}", exc_info=True)
+            return False
+
     def get_user_interactions(self):
         return self.user_interactions
 
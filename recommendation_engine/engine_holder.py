@@ -0,0 +1,165 @@
+import os
+import time
+import logging
+import threading
+from typing import Any, Callable, Optional
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Limites mémoire du conteneur (cgroup v2, puis v1) ; v1 « sans limite » vaut ~2^63
+CGROUP_MEMORY_LIMIT_FILES = ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes')
+
+
+def default_memory_budget_bytes(fraction: float = 0.8) -> int:
+    """Budget par défaut : `fraction` de la limite mémoire du conteneur, à défaut de la mémoire physique (0 si inconnue)."""
+    for path in CGROUP_MEMORY_LIMIT_FILES:
+        try:
+            with open(path, 'r') as f:
+                limit = f.read().strip()
+        except OSError:
+            continue
+        if limit.isdigit() and int(limit) < 1 << 60:
+            return int(int(limit) * fraction)
+    try:
+        return int(os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') * fraction)
+    except (AttributeError, ValueError, OSError):
+        return 0
+
+
+class EngineHolder:
+    """
+    Détient l'instance courante du moteur et la remplace à chaud lorsqu'une nouvelle version
+    des données est publiée (double buffering).
+
+    Le nouveau moteur est construit en arrière-plan pendant que l'ancien continue de servir ;
+    le remplacement est une simple affectation de référence, si bien que les requêtes en cours
+    terminent sur l'ancienne instance, libérée quand plus personne ne la référence.
+    Un garde-fou mémoire empêche que deux copies complètes dépassent `memory_budget_bytes` : chaque copie
+    compte le bundle (`memory_estimate_fn`) et les tableaux que le moteur calcule ou mappe en plus
+    (`engine_footprint_fn`), ceux du moteur courant servant d'estimation pour le suivant.
+    """
+    def __init__(self, version_fn: Callable[[], Optional[str]], build_fn: Callable[[], Any],
+                 memory_estimate_fn: Optional[Callable[[], int]] = None, memory_budget_bytes: int = 0,
+                 check_interval_s: float = 300, release_on_budget_exceeded: bool = False,
+                 engine_footprint_fn: Optional[Callable[[Any], int]] = None):
+        """
+        Args:
+            version_fn: Retourne l'identifiant de la version publiée (ETag, data_version...).
+            build_fn: Construit un nouveau moteur (retourne None en cas d'échec).
+            memory_estimate_fn: Estime la mémoire (octets) d'un moteur construit sur la version publiée.
+            memory_budget_bytes: Budget pour l'ancien + le nouveau moteur (0 = pas de limite).
+            check_interval_s: Intervalle entre deux vérifications de version (0 = pas de rafraîchissement).
+            release_on_budget_exceeded: Si le budget est dépassé, libère l'ancien moteur avant de
+                                        construire le nouveau (au lieu de reporter la mise à jour).
+            engine_footprint_fn: Mémoire (octets) d'un moteur construit au-delà de `memory_estimate_fn`
+                                 (ex: tableaux dérivés des composants).
+        """
+        self.version_fn = version_fn
+        self.build_fn = build_fn
+        self.memory_estimate_fn = memory_estimate_fn
+        self.memory_budget_bytes = memory_budget_bytes
+        self.check_interval_s = check_interval_s
+        self.release_on_budget_exceeded = release_on_budget_exceeded
+        self.engine_footprint_fn = engine_footprint_fn
+
+        self._engine = None
+        self._version = None
+        self._footprint = 0
+        self._engine_footprint = 0  # part du moteur courant mesurée par engine_footprint_fn
+        self._build_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._initial_load_done = threading.Event()
+        self._thread = None
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._version
+
+    def get(self):
+        """Retourne le moteur courant (ou None s'il n'est pas encore chargé). Ne bloque jamais."""
+        return self._engine
+
+    def _swap(self, engine, version: Optional[str], footprint: int):
+        previous_version = self._version
+        self._engine = engine
+        self._version = version
+        self._engine_footprint = self.engine_footprint_fn(engine) if self.engine_footprint_fn else 0
+        self._footprint = footprint + self._engine_footprint
+        logger.info(f"Recommendation engine swapped in: version {previous_version} -> {version} "
+                    f"({self._footprint} bytes)")
+
+    def load(self):
+        """Construit le moteur initial si nécessaire (bloquant) et le retourne."""
+        with self._build_lock:
+            if self._engine is None:
+                version = self.version_fn()
+                footprint = self.memory_estimate_fn() if self.memory_estimate_fn else 0
+                engine = self.build_fn()
+                if engine is not None:
+                    self._swap(engine, version, footprint)
+            return self._engine
+
+    def refresh(self) -> bool:
+        """
+        Vérifie la version publiée et, si elle a changé, construit puis bascule vers un nouveau moteur.
+
+        Returns:
+            True si un nouveau moteur a été mis en service.
+        """
+        with self._build_lock:
+            version = self.version_fn()
+            if version is None or (self._engine is not None and version == self._version):
+                return False
+
+            footprint = self.memory_estimate_fn() if self.memory_estimate_fn else 0
+            # Les tableaux propres au nouveau moteur ne sont connus qu'après construction : ceux du moteur courant
+            # (même configuration) en tiennent lieu
+            expected_footprint = footprint + self._engine_footprint
+            if self.memory_budget_bytes and self._engine is not None \
+                    and self._footprint + expected_footprint > self.memory_budget_bytes:
+                if not self.release_on_budget_exceeded:
+                    logger.warning(f"Engine version {version} not loaded: {self._footprint + expected_footprint} bytes "
+                                   f"for two engines exceed the {self.memory_budget_bytes} bytes budget")
+                    return False
+                logger.warning(f"Memory budget exceeded, releasing engine {self._version} before loading {version}")
+                self._engine = None
+                self._footprint = 0
+
+            start_time = time.perf_counter()
+            engine = self.build_fn()
+            if engine is None:
+                logger.error(f"Failed to build engine for version {version}, keeping version {self._version}")
+                return False
+            logger.info(f"Engine version {version} built in {time.perf_counter() - start_time:.2f}s")
+            self._swap(engine, version, footprint)
+            return True
+
+    def _run(self):
+        try:
+            self.load()
+        except Exception as e:
+            logger.error(f"Initial engine load failed: {e}", exc_info=True)
+        finally:
+            self._initial_load_done.set()
+        while self.check_interval_s and not self._stop_event.wait(self.check_interval_s):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Engine refresh failed: {e}", exc_info=True)
+
+    def start(self):
+        """Charge le moteur puis vérifie périodiquement les nouvelles versions, dans un thread d'arrière-plan."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="engine-holder", daemon=True)
+        self._thread.start()
+
+    def wait_until_loaded(self, timeout: Optional[float] = None):
+        """Attend la fin de la première tentative de chargement lancée par start() et retourne le moteur."""
+        self._initial_load_done.wait(timeout)
+        return self._engine
+
+    def stop(self):
+        self._stop_event.set()
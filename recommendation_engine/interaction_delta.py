@@ -0,0 +1,207 @@
+import time
+import weakref
+import numpy as np
+import logging
+import threading
+from typing import Dict, List, Optional
+from scipy.sparse import csr_matrix
+from .jsonl_reader import ColumnBuffer
+from .neighbour_table import l2_normalize_csr
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_COMPACTION_INTERVAL_S = 60
+DEFAULT_MAX_DELTA_INTERACTIONS = 100000
+
+
+class IncrementalUserArticleMatrix:
+    """
+    Matrice utilisateur-article = matrice CSR de base (immuable) + tampon delta des nouvelles interactions.
+
+    Les nouveaux clics sont ajoutés au delta en O(1) ; les nouveaux utilisateurs / articles reçoivent
+    les index suivant ceux de la base (les dictionnaires de correspondance sont étendus sur place).
+    Les requêtes lisent les lignes combinées base + delta. Une compaction périodique (thread en arrière-plan)
+    fusionne le delta dans une nouvelle base, puis remplace la base sous verrou.
+    """
+    def __init__(self, base: csr_matrix, user_to_idx: Dict, idx_to_user: Dict, article_to_idx: Dict, idx_to_article: Dict):
+        self.base = base
+        self.user_to_idx = user_to_idx
+        self.idx_to_user = idx_to_user
+        self.article_to_idx = article_to_idx
+        self.idx_to_article = idx_to_article
+        self._lock = threading.RLock()
+        self._delta_users = ColumnBuffer(np.int32)
+        self._delta_articles = ColumnBuffer(np.int32)
+        self._delta_csr = None  # (taille du delta, CSR) en cache
+        self._normalized = None  # (base, base normalisée, transposée) en cache
+        self._article_ids = np.array([idx_to_article[i] for i in range(len(idx_to_article))])
+        self._compaction_thread = None
+        self._compaction_requested = threading.Event()
+        self._compaction_listeners = []
+        self.max_delta_interactions = DEFAULT_MAX_DELTA_INTERACTIONS
+        self.compactions = 0
+
+    @property
+    def n_users(self) -> int:
+        return len(self.user_to_idx)
+
+    @property
+    def n_articles(self) -> int:
+        return len(self.article_to_idx)
+
+    @property
+    def delta_size(self) -> int:
+        return self._delta_users.size
+
+    @property
+    def article_ids(self) -> np.ndarray:
+        """article_id de chaque colonne (articles ajoutés par le delta compris)."""
+        if len(self._article_ids) < self.n_articles:
+            with self._lock:
+                self._article_ids = np.array([self.idx_to_article[i] for i in range(self.n_articles)])
+        return self._article_ids
+
+    def add_interaction(self, user_id, article_id):
+        """Ajoute un clic ; crée l'utilisateur et/ou l'article s'ils sont nouveaux. Retourne (ligne, colonne)."""
+        with self._lock:
+            user_idx = self.user_to_idx.get(user_id)
+            if user_idx is None:
+                user_idx = len(self.user_to_idx)
+                self.user_to_idx[user_id] = user_idx
+                self.idx_to_user[user_idx] = user_id
+            article_idx = self.article_to_idx.get(article_id)
+            if article_idx is None:
+                article_idx = len(self.article_to_idx)
+                self.article_to_idx[article_id] = article_idx
+                self.idx_to_article[article_idx] = article_id
+            self._delta_users.extend([user_idx], self._delta_users.size)
+            self._delta_articles.extend([article_idx], self._delta_articles.size)
+            if self.delta_size >= self.max_delta_interactions:
+                self._compaction_requested.set()
+        return user_idx, article_idx
+
+    def _delta_matrix(self) -> csr_matrix:
+        """Delta sous forme CSR (n_utilisateurs x n_articles courants), reconstruit seulement s'il a changé."""
+        with self._lock:
+            size = self.delta_size
+            shape = (self.n_users, self.n_articles)
+            if self._delta_csr is None or self._delta_csr[0] != size or self._delta_csr[1].shape != shape:
+                delta = csr_matrix((np.ones(size, dtype=np.float64),
+                                    (self._delta_users.values[:size], self._delta_articles.values[:size])), shape=shape)
+                self._delta_csr = (size, delta)
+            return self._delta_csr[1]
+
+    def _padded_base(self, base: csr_matrix, shape) -> csr_matrix:
+        if base.shape == shape:
+            return base
+        # Ajout de lignes / colonnes vides sans copier les données
+        indptr = np.concatenate((base.indptr, np.full(shape[0] - base.shape[0], base.indptr[-1], dtype=base.indptr.dtype)))
+        return csr_matrix((base.data, base.indices, indptr), shape=shape)
+
+    def rows(self, user_indices) -> csr_matrix:
+        """Lignes combinées (base + delta) des utilisateurs donnés, sur toutes les colonnes courantes."""
+        user_indices = np.atleast_1d(np.asarray(user_indices, dtype=np.int64))
+        with self._lock:
+            base, delta = self.base, self._delta_matrix()
+            in_base = user_indices < base.shape[0]
+            base_rows = base[np.where(in_base, user_indices, 0)]
+            base_rows = csr_matrix(base_rows.multiply(in_base[:, None]))
+            base_rows = self._padded_base(base_rows, (len(user_indices), delta.shape[1]))
+            return (base_rows + delta[user_indices]).tocsr()
+
+    def row(self, user_idx: int) -> csr_matrix:
+        return self.rows([user_idx])
+
+    def touched_users(self) -> np.ndarray:
+        """Utilisateurs ayant des interactions dans le delta (leurs lignes de base sont incomplètes)."""
+        with self._lock:
+            return np.unique(self._delta_users.values[:self.delta_size])
+
+    def _normalized_base(self):
+        with self._lock:
+            base = self.base
+            if self._normalized is None or self._normalized[0] is not base:
+                normalized = l2_normalize_csr(base)
+                self._normalized = (base, normalized, normalized.T.tocsr())
+            return self._normalized
+
+    def normalized_base(self) -> csr_matrix:
+        """Base normalisée par ligne (sans le delta), mise en cache par version de base."""
+        return self._normalized_base()[1]
+
+    def normalized_base_transposed(self) -> csr_matrix:
+        """Transposée (articles x utilisateurs) de la base normalisée par ligne, mise en cache par version de base."""
+        return self._normalized_base()[2]
+
+    def combined(self) -> csr_matrix:
+        """Matrice complète base + delta (coût proportionnel au nombre d'interactions)."""
+        with self._lock:
+            delta = self._delta_matrix()
+            return (self._padded_base(self.base, delta.shape) + delta).tocsr()
+
+    def compact(self) -> bool:
+        """
+        Fusionne le delta dans une nouvelle base. La fusion est calculée hors verrou ;
+        les clics arrivés pendant la fusion restent dans le delta.
+        """
+        with self._lock:
+            size = self.delta_size
+            if size == 0:
+                return False
+            base = self.base
+            merged_users = self._delta_users.values[:size].copy()
+            merged_articles = self._delta_articles.values[:size].copy()
+            shape = (self.n_users, self.n_articles)
+
+        start_time = time.perf_counter()
+        delta = csr_matrix((np.ones(size, dtype=base.dtype), (merged_users, merged_articles)), shape=shape)
+        new_base = (self._padded_base(base, shape) + delta).tocsr()
+        new_base.sort_indices()
+
+        with self._lock:
+            remaining = self.delta_size - size
+            remaining_users = self._delta_users.values[size:self.delta_size].copy()
+            remaining_articles = self._delta_articles.values[size:self.delta_size].copy()
+            self._delta_users, self._delta_articles = ColumnBuffer(np.int32), ColumnBuffer(np.int32)
+            if remaining:
+                self._delta_users.extend(remaining_users, 0)
+                self._delta_articles.extend(remaining_articles, 0)
+            self.base = new_base
+            self._delta_csr = None
+            self.compactions += 1
+            self._compaction_requested.clear()
+        logger.info(f"User-article delta compacted: {size} interactions merged into base {new_base.shape} "
+                    f"in {time.perf_counter() - start_time:.3f}s")
+        merged_user_indices = np.unique(merged_users)
+        for callback in self._compaction_listeners:
+            callback(merged_user_indices, new_base)
+        return True
+
+    def add_compaction_listener(self, callback):
+        """`callback(user_indices, base)` est appelé après chaque compaction avec les lignes fusionnées et la nouvelle base."""
+        self._compaction_listeners.append(callback)
+
+    def start_compaction(self, interval_s: float = DEFAULT_COMPACTION_INTERVAL_S):
+        """Démarre la compaction périodique en arrière-plan (anticipée si le delta dépasse sa taille maximale)."""
+        if self._compaction_thread is not None:
+            return
+        # Le thread ne garde qu'une référence faible : il s'arrête quand la matrice est libérée (ex: après un hot swap)
+        matrix_ref = weakref.ref(self)
+        requested = self._compaction_requested
+
+        def run():
+            while True:
+                requested.wait(interval_s)
+                matrix = matrix_ref()
+                if matrix is None:
+                    return
+                try:
+                    matrix.compact()
+                except Exception as e:
+                    logger.error(f"Delta compaction failed: {e}", exc_info=True)
+                    requested.clear()
+                del matrix
+
+        self._compaction_thread = threading.Thread(target=run, name="delta-compaction", daemon=True)
+        self._compaction_thread.start()
@@ -0,0 +1,131 @@
+import time
+import threading
+import numpy as np
+import logging
+from scipy.sparse import csr_matrix
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+MERSENNE_PRIME = (1 << 31) - 1
+EMPTY_SIGNATURE = np.uint64(MERSENNE_PRIME)  # signature d'un ensemble vide (aucun hash ne l'atteint)
+# Nombre maximal d'éléments du tableau temporaire (interactions x fonctions de hachage) par passe
+HASH_BLOCK_ELEMENTS = 1 << 23
+# Part d'utilisateurs modifiés au-delà de laquelle les bandes sont re-triées
+REINDEX_FRACTION = 0.1
+
+
+class MinHashLSH:
+    """
+    Index MinHash / LSH sur les ensembles d'articles cliqués par utilisateur (lignes de la matrice utilisateur-article).
+
+    Chaque utilisateur a une signature de `n_hashes` minima de hachages universels (a * article + b) mod p ;
+    la signature est découpée en `n_bands` bandes, chacune réduite à une clé 64 bits. Deux utilisateurs sont
+    candidats s'ils partagent la clé d'au moins une bande : probabilité 1 - (1 - J^r)^b pour une similarité
+    de Jaccard J et r = n_hashes / n_bands lignes par bande. Le numéro de bande occupe les 8 bits de poids fort
+    de la clé : toutes les bandes tiennent dans un seul tableau trié, et une requête coûte une recherche
+    dichotomique vectorisée, indépendamment du nombre d'utilisateurs.
+    Les candidats sont à re-scorer exactement par l'appelant.
+    """
+    def __init__(self, n_hashes: int = 128, n_bands: int = 64, seed: int = 0):
+        if n_hashes % n_bands or n_bands > 256:
+            raise ValueError(f"n_hashes ({n_hashes}) doit être un multiple de n_bands ({n_bands}), au plus 256 bandes")
+        rng = np.random.default_rng(seed)
+        self.n_hashes, self.n_bands = n_hashes, n_bands
+        self._hash_a = rng.integers(1, MERSENNE_PRIME, n_hashes, dtype=np.uint64)
+        self._hash_b = rng.integers(0, MERSENNE_PRIME, n_hashes, dtype=np.uint64)
+        # Multiplicateurs impairs : combinaison des r minima d'une bande en une clé (modulo 2^64)
+        self._band_multipliers = rng.integers(0, 1 << 63, n_hashes // n_bands, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._lock = threading.Lock()
+        self._keys = np.empty((0, n_bands), dtype=np.uint64)
+        self._has_clicks = np.zeros(0, dtype=bool)
+        self._sorted_keys = np.empty(0, dtype=np.uint64)
+        self._sorted_users = np.empty(0, dtype=np.int64)
+        self._pending_users = np.empty(0, dtype=np.int64)  # utilisateurs mis à jour depuis le dernier tri
+
+    @classmethod
+    def build(cls, user_article_matrix: csr_matrix, n_hashes: int = 128, n_bands: int = 64, seed: int = 0) -> 'MinHashLSH':
+        start_time = time.perf_counter()
+        index = cls(n_hashes, n_bands, seed)
+        index._keys = index.band_keys(user_article_matrix)
+        index._has_clicks = np.diff(user_article_matrix.indptr) > 0
+        index._reindex()
+        logger.info(f"MinHash LSH index built: {user_article_matrix.shape[0]} users, {n_hashes} hashes, "
+                    f"{n_bands} bands in {time.perf_counter() - start_time:.2f}s")
+        return index
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def signatures(self, matrix: csr_matrix) -> np.ndarray:
+        """Signatures MinHash (n_lignes x n_hashes) ; minima segmentés par ligne, par blocs de fonctions de hachage."""
+        matrix = csr_matrix(matrix)
+        signatures = np.full((matrix.shape[0], self.n_hashes), EMPTY_SIGNATURE, dtype=np.uint64)
+        non_empty = np.diff(matrix.indptr) > 0
+        if not non_empty.any():
+            return signatures
+        starts = matrix.indptr[:-1][non_empty]
+        columns = matrix.indices.astype(np.uint64)[:, None]
+        hash_block = max(1, min(self.n_hashes, HASH_BLOCK_ELEMENTS // max(1, matrix.nnz)))
+        for start in range(0, self.n_hashes, hash_block):
+            end = min(start + hash_block, self.n_hashes)
+            hashed = (columns * self._hash_a[start:end] + self._hash_b[start:end]) % np.uint64(MERSENNE_PRIME)
+            signatures[non_empty, start:end] = np.minimum.reduceat(hashed, starts, axis=0)
+        return signatures
+
+    def band_keys(self, matrix: csr_matrix) -> np.ndarray:
+        """Clé de chaque bande (n_lignes x n_bands) : numéro de bande sur 8 bits + 56 bits de hachage."""
+        signatures = self.signatures(matrix).reshape(matrix.shape[0], self.n_bands, -1)
+        keys = (signatures * self._band_multipliers).sum(axis=2, dtype=np.uint64) >> np.uint64(8)
+        return keys | (np.arange(self.n_bands, dtype=np.uint64) << np.uint64(56))
+
+    def _reindex(self):
+        users = np.flatnonzero(self._has_clicks)
+        keys = self._keys[users].ravel()
+        order = np.argsort(keys, kind='stable')
+        self._sorted_keys = keys[order]
+        self._sorted_users = users[order // self.n_bands]
+        self._pending_users = np.empty(0, dtype=np.int64)
+
+    def candidates(self, article_columns: np.ndarray) -> np.ndarray:
+        """Utilisateurs partageant au moins une bande avec l'ensemble d'articles donné (indices triés, uniques)."""
+        article_columns = np.asarray(article_columns)
+        if len(article_columns) == 0:
+            return np.empty(0, dtype=np.int64)
+        query = csr_matrix((np.ones(len(article_columns)), article_columns, [0, len(article_columns)]),
+                           shape=(1, int(article_columns.max()) + 1))
+        keys = self.band_keys(query)[0]
+        with self._lock:
+            low = np.searchsorted(self._sorted_keys, keys, 'left')
+            high = np.searchsorted(self._sorted_keys, keys, 'right')
+            # Concaténation des plages [low, high) de chaque bande
+            lengths = high - low
+            positions = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(low, lengths)
+            found = [self._sorted_users[positions]]
+            if len(self._pending_users):
+                # Utilisateurs mis à jour depuis le dernier tri : comparaison directe de leurs clés
+                pending = self._pending_users
+                found.append(pending[(self._keys[pending] == keys).any(axis=1) & self._has_clicks[pending]])
+        return np.unique(np.concatenate(found))
+
+    def update(self, user_indices: np.ndarray, user_article_matrix: csr_matrix):
+        """
+        Recalcule les clés des utilisateurs donnés (nouveaux ou ayant de nouveaux clics) depuis leurs lignes
+        de la matrice ; les bandes sont re-triées quand la part d'utilisateurs modifiés devient importante.
+        """
+        user_indices = np.unique(np.asarray(user_indices, dtype=np.int64))
+        if len(user_indices) == 0:
+            return
+        rows = user_article_matrix[user_indices]
+        keys = self.band_keys(rows)
+        has_clicks = np.diff(rows.indptr) > 0
+        with self._lock:
+            n_users = max(len(self._keys), int(user_indices[-1]) + 1)
+            if n_users > len(self._keys):
+                self._keys = np.concatenate((self._keys, np.zeros((n_users - len(self._keys), self.n_bands), dtype=np.uint64)))
+                self._has_clicks = np.concatenate((self._has_clicks, np.zeros(n_users - len(self._has_clicks), dtype=bool)))
+            self._keys[user_indices] = keys
+            self._has_clicks[user_indices] = has_clicks
+            self._pending_users = np.union1d(self._pending_users, user_indices)
+            if len(self._pending_users) > REINDEX_FRACTION * len(self._keys):
+                self._reindex()
@@ -0,0 +1,170 @@
+import os
+import time
+import multiprocessing
+import numpy as np
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+from scipy.sparse import csr_matrix, diags
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+USER_NEIGHBOUR_ARRAYS = ('user_neighbours.indices', 'user_neighbours.similarities')
+ITEM_NEIGHBOUR_ARRAYS = ('item_neighbours.indices', 'item_neighbours.similarities')
+DEFAULT_BLOCK_SIZE = 512
+# Workers lancés par 'spawn' et non par fork : le calcul part souvent d'un thread (construction parallèle des
+# composants, rafraîchissement à chaud du moteur), et un fork hériterait des verrous tenus par les autres threads
+# (logging, BLAS), avec un risque d'interblocage dans les workers
+POOL_START_METHOD = 'spawn'
+
+# Matrice normalisée partagée par les blocs d'un même processus worker
+_worker_matrix = None
+
+
+def l2_normalize_csr(matrix: csr_matrix) -> csr_matrix:
+    """Copie float32 de la matrice creuse dont chaque ligne non vide est de norme L2 égale à 1."""
+    matrix = csr_matrix(matrix, dtype=np.float32)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return csr_matrix(diags(1.0 / norms) @ matrix, dtype=np.float32)
+
+
+def sparse_top_k_per_row(block: csr_matrix, k: int, row_offset: int = 0):
+    """
+    Top-k des valeurs strictement positives de chaque ligne d'un bloc creux, en excluant la diagonale
+    (ligne `row_offset + i` du bloc = colonne de l'élément lui-même). À score égal, l'indice le plus petit passe devant.
+
+    Returns:
+        (indices int32, valeurs float32), matrices (n_lignes x k), complétées par -1 / 0.
+    """
+    coo = block.tocoo()
+    keep = (coo.data > 0) & (coo.col != coo.row + row_offset)
+    rows, cols, values = coo.row[keep], coo.col[keep], coo.data[keep]
+    order = np.lexsort((cols, -values, rows))
+    rows, cols, values = rows[order], cols[order], values[order]
+    # Rang de chaque élément dans sa ligne (les lignes sont contiguës après le tri)
+    row_starts = np.searchsorted(rows, np.arange(block.shape[0]))
+    rank = np.arange(len(rows)) - row_starts[rows]
+    selected = rank < k
+
+    indices = np.full((block.shape[0], k), -1, dtype=np.int32)
+    similarities = np.zeros((block.shape[0], k), dtype=np.float32)
+    indices[rows[selected], rank[selected]] = cols[selected]
+    similarities[rows[selected], rank[selected]] = values[selected]
+    return indices, similarities
+
+
+def _init_worker(normalized_matrix: csr_matrix):
+    global _worker_matrix
+    _worker_matrix = normalized_matrix
+
+
+def _neighbours_block(start: int, end: int, k: int):
+    block = _worker_matrix[start:end] @ _worker_matrix.T
+    return start, sparse_top_k_per_row(block, k, row_offset=start)
+
+
+def compute_row_neighbours(matrix: csr_matrix, k: int, block_size: int = DEFAULT_BLOCK_SIZE,
+                           n_workers: Optional[int] = None):
+    """
+    Calcule, pour chaque ligne de la matrice, ses `k` plus proches lignes en similarité cosinus (similarité > 0).
+
+    Les produits creux sont calculés par blocs de `block_size` lignes, répartis sur `n_workers`
+    processus lancés par POOL_START_METHOD (1 : dans le processus courant). La mémoire par worker est
+    bornée par la taille d'un bloc de similarités.
+
+    Returns:
+        (indices int32, similarités float32), matrices (n_lignes x k) ; -1 / 0 quand il n'y a pas de voisin.
+    """
+    start_time = time.perf_counter()
+    n_rows = matrix.shape[0]
+    n_workers = n_workers or os.cpu_count() or 1
+    normalized = l2_normalize_csr(matrix)
+    blocks = [(start, min(start + block_size, n_rows)) for start in range(0, n_rows, block_size)]
+
+    indices = np.full((n_rows, k), -1, dtype=np.int32)
+    similarities = np.zeros((n_rows, k), dtype=np.float32)
+    if n_workers <= 1 or len(blocks) <= 1:
+        _init_worker(normalized)
+        results = (_neighbours_block(start, end, k) for start, end in blocks)
+        for start, (block_indices, block_similarities) in results:
+            indices[start:start + len(block_indices)] = block_indices
+            similarities[start:start + len(block_similarities)] = block_similarities
+        _init_worker(None)
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context(POOL_START_METHOD),
+                                 initializer=_init_worker, initargs=(normalized,)) as executor:
+            futures = [executor.submit(_neighbours_block, start, end, k) for start, end in blocks]
+            for future in futures:
+                start, (block_indices, block_similarities) = future.result()
+                indices[start:start + len(block_indices)] = block_indices
+                similarities[start:start + len(block_similarities)] = block_similarities
+
+    logger.info(f"Neighbour table computed: {n_rows} rows x {k} neighbours, {len(blocks)} blocks, "
+                f"{n_workers} workers in {time.perf_counter() - start_time:.2f}s")
+    return indices, similarities
+
+
+def compute_user_neighbours(user_article_matrix: csr_matrix, k: int, block_size: int = DEFAULT_BLOCK_SIZE,
+                            n_workers: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Table des `k` plus proches voisins de chaque utilisateur (lignes dans l'ordre de la matrice).
+
+    Returns:
+        {'user_neighbours.indices': int32 (n_utilisateurs x k, -1 si pas de voisin),
+         'user_neighbours.similarities': float32 (n_utilisateurs x k)}.
+    """
+    return dict(zip(USER_NEIGHBOUR_ARRAYS, compute_row_neighbours(user_article_matrix, k, block_size, n_workers)))
+
+
+def compute_item_neighbours(user_article_matrix: csr_matrix, k: int, block_size: int = DEFAULT_BLOCK_SIZE,
+                            n_workers: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Table des `k` articles les plus similaires à chaque article (cosinus entre colonnes de la matrice
+    utilisateur-article), c'est-à-dire une matrice article-article élaguée au top-K par ligne.
+
+    Returns:
+        {'item_neighbours.indices': int32 (n_articles x k, -1 si pas de voisin),
+         'item_neighbours.similarities': float32 (n_articles x k)}.
+    """
+    item_user_matrix = csr_matrix(user_article_matrix.T)
+    return dict(zip(ITEM_NEIGHBOUR_ARRAYS, compute_row_neighbours(item_user_matrix, k, block_size, n_workers)))
+
+
+def neighbour_table_to_csr(indices: np.ndarray, similarities: np.ndarray, n_columns: int) -> csr_matrix:
+    """Convertit une table de voisins (n_lignes x k, -1 = vide) en matrice creuse de similarités."""
+    valid = indices >= 0
+    row_counts = valid.sum(axis=1)
+    indptr = np.concatenate(([0], np.cumsum(row_counts))).astype(np.int64)
+    return csr_matrix((similarities[valid].astype(np.float32), indices[valid], indptr),
+                      shape=(indices.shape[0], n_columns))
+
+
+# Calcul hors ligne : python -m recommendation_engine.neighbour_table processed_data/engine_bundle
+if __name__ == "__main__":
+    import argparse
+    from .bundle import load_bundle, add_arrays_to_bundle
+    from .collaborative_filtering import CollaborativeFilteringRecommender
+    from config import RECOMMENDATION_CONFIG
+
+    parser = argparse.ArgumentParser(description="Précalcule une table de voisins (utilisateurs ou articles) et l'ajoute au bundle.")
+    parser.add_argument('bundle_path')
+    parser.add_argument('--mode', choices=('user', 'item'), default='user')
+    parser.add_argument('--k', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE)
+    args = parser.parse_args()
+
+    bundle = load_bundle(args.bundle_path)
+    recommender = CollaborativeFilteringRecommender(bundle.user_interactions, bundle.articles_metadata,
+                                                    dict(RECOMMENDATION_CONFIG, collaborative_mode='user',
+                                                         user_neighbours='on_request'))
+    if args.mode == 'user':
+        k = args.k or RECOMMENDATION_CONFIG['max_similar_users']
+        table = compute_user_neighbours(recommender.user_article_matrix, k, args.block_size, args.workers)
+    else:
+        k = args.k or RECOMMENDATION_CONFIG['item_similarity_top_k']
+        table = compute_item_neighbours(recommender.user_article_matrix, k, args.block_size, args.workers)
+    add_arrays_to_bundle(args.bundle_path, table)
+    print(f"Table des voisins ({args.mode}, {k} par ligne) ajoutée au bundle {args.bundle_path}")
@@ -1,33 +1,41 @@
 import pandas as pd
 import numpy as np
 import logging
+import threading
+import weakref
 from datetime import datetime, timedelta
 from typing import List, Dict
 from .utils import normalize_scores, get_top_n, ensure_diversity
+from .user_index import UserInteractionIndex
+from .trending import TrendingCounters
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class PopularityBasedRecommender:
-    def __init__(self, user_interactions: pd.DataFrame, articles_metadata: pd.DataFrame, config: Dict):
+    def __init__(self, user_interactions: pd.DataFrame, articles_metadata: pd.DataFrame, config: Dict,
+                 user_index: UserInteractionIndex = None):
         logger.info("Initializing PopularityBasedRecommender...")
         self.user_interactions = user_interactions
+        self.user_index = user_index if user_index is not None else UserInteractionIndex(user_interactions)
         self.articles_metadata = articles_metadata
         self.config = config
-        
-        self.article_popularity_scores = self._calculate_global_popularity()
-        self.category_popularity_scores = self._calculate_category_popularity()
+
+        # Compteurs de clics (décrus si config['trending_half_life_hours']), mis à jour à chaque nouveau clic
+        self.trending = TrendingCounters.from_interactions(user_interactions, articles_metadata,
+                                                           self.config.get('trending_half_life_hours'))
+        self._refresh_thread = None
+        self._ranked_version = None
+        self.refresh()
         
         logger.info("PopularityBasedRecommender initialized successfully.")
 
     def _calculate_global_popularity(self) -> Dict[int, float]:
         """
-        Calcule la popularité globale des articles basée sur le nombre de vues.
+        Calcule la popularité globale des articles basée sur le nombre de vues (décru dans le temps si configuré).
         """
         logging.info("Calcul de la popularité globale des articles...")
-        article_views = self.user_interactions['click_article_id'].value_counts()
-        # Normalize scores to 0-1 range
-        scores = normalize_scores(article_views.to_dict())
+        scores = self.trending.article_popularity()
         logging.info(f"Popularité globale calculée pour {len(scores)} articles.")
         return scores
 
@@ -36,18 +44,56 @@ class PopularityBasedRecommender:
         Calcule la popularité des catégories basée sur le nombre total de vues des articles dans chaque catégorie.
         """
         logging.info("Calcul de la popularité des catégories...")
-        # Merge interactions with metadata to get category_id for each click
-        clicks_with_category = self.user_interactions.merge(
-            self.articles_metadata[['article_id', 'category_id']],
-            left_on='click_article_id',
-            right_on='article_id',
-            how='left'
-        )
-        category_views = clicks_with_category['category_id'].value_counts()
-        scores = normalize_scores(category_views.to_dict())
+        scores = self.trending.category_popularity()
         logging.info(f"Popularité des catégories calculée pour {len(scores)} catégories.")
         return scores
 
+    def refresh(self):
+        """
+        Recalcule popularités et classements depuis les compteurs (s'ils ont changé depuis le dernier calcul).
+        Les nouveaux classements remplacent les anciens d'un bloc : les requêtes en cours ne sont pas bloquées.
+        """
+        version = self.trending.version
+        if self._ranked_version == version:
+            return False
+        self.article_popularity_scores = self._calculate_global_popularity()
+        self.category_popularity_scores = self._calculate_category_popularity()
+        # Classements indépendants de l'utilisateur : (article_ids, category_ids, scores, lignes des métadonnées)
+        # triés par score décroissant, pour les poids cold start et les poids standards
+        self.rankings = {is_cold_start: self._ranked_arrays(is_cold_start) for is_cold_start in (True, False)}
+        # Cold start : listes par catégorie issues du classement cold start, fusionnées à tour de rôle
+        self.category_lists = self._category_lists(self.rankings[True], self.config.get('category_list_size', 50))
+        # Réponses prêtes pour les utilisateurs sans historique, par (cold start, nombre de recommandations)
+        self._responses_without_history = {}
+        self._ranked_version = version
+        return True
+
+    def record_click(self, article_id: int, timestamp: int = None):
+        """Compte un nouveau clic ; les classements sont recalculés périodiquement en arrière-plan."""
+        self.trending.record_click(article_id, timestamp)
+        self.start_refresh(self.config.get('trending_refresh_interval_s', 30))
+
+    def start_refresh(self, interval_s: float):
+        """Démarre le reclassement périodique (thread ne gardant qu'une référence faible sur le recommandeur)."""
+        if self._refresh_thread is not None:
+            return
+        recommender_ref = weakref.ref(self)
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval_s):
+                recommender = recommender_ref()
+                if recommender is None:
+                    return
+                try:
+                    recommender.refresh()
+                except Exception as e:
+                    logger.error(f"Popularity refresh failed: {e}", exc_info=True)
+                del recommender
+
+        self._refresh_thread = threading.Thread(target=run, name="popularity-refresh", daemon=True)
+        self._refresh_thread.start()
+
     def get_popularity_scores(self, article_ids: List[int] = None) -> Dict[int, float]:
         """
         Retourne les scores de popularité globale pour les articles donnés ou pour tous les articles.
@@ -57,21 +103,17 @@ class PopularityBasedRecommender:
         else:
             return {aid: self.article_popularity_scores.get(aid, 0.0) for aid in article_ids}
 
-    def recommend(self, user_id: int, n_recommendations: int = 5, is_cold_start: bool = False) -> List[Dict]:
+    def rank_articles(self, is_cold_start: bool = False) -> pd.DataFrame:
         """
-        Recommande des articles basés sur la popularité et la fraîcheur.
-        Gère la stratégie cold start.
+        Calcule le score final (popularité + fraîcheur) de tous les articles du catalogue.
+        Ce score ne dépend pas de l'utilisateur.
         
         Args:
-            user_id: ID de l'utilisateur (utilisé pour le filtrage des articles déjà lus).
-            n_recommendations: Nombre de recommandations.
-            is_cold_start: Booléen indiquant si l'utilisateur est en cold start.
+            is_cold_start: Utilise les poids cold start si vrai.
             
         Returns:
-            Liste de dictionnaires avec les articles recommandés et leurs scores.
+            Copie des métadonnées des articles avec une colonne 'final_score'.
         """
-        logging.info(f"Génération de recommandations basées sur la popularité pour l'utilisateur {user_id} (cold start: {is_cold_start}).")
-
         # Start with all popular articles
         candidate_articles = self.articles_metadata.copy()
         
@@ -113,33 +155,132 @@ class PopularityBasedRecommender:
             candidate_articles['final_score'] = (candidate_articles['popularity_score'] * 0.7 + # Heuristic for now
                                                  candidate_articles['freshness_score'] * 0.3) # Heuristic for now
             # These weights will be overridden by the main combiner, but this gives a base score for this component
+        return candidate_articles
+
+    def _ranked_arrays(self, is_cold_start: bool):
+        ranked = self.rank_articles(is_cold_start)
+        order = np.argsort(-ranked['final_score'].to_numpy(), kind='stable')
+        return (ranked['article_id'].to_numpy()[order], ranked['category_id'].to_numpy()[order],
+                ranked['final_score'].to_numpy(dtype=np.float64)[order], order)
+
+    def _category_lists(self, ranking, list_size: int):
+        """
+        Listes pré-classées par catégorie : les `list_size` premières positions du classement de chaque catégorie.
+
+        Returns:
+            (classement ; positions dans le classement, regroupées par catégorie ; offsets de chaque catégorie ;
+             catégories dans l'ordre de leur meilleur article)
+        """
+        category_ids = ranking[1]
+        order = np.argsort(category_ids, kind='stable')  # regroupement par catégorie, ordre du classement conservé
+        _, starts, counts = np.unique(category_ids[order], return_index=True, return_counts=True)
+        rank_in_category = np.arange(len(order)) - np.repeat(starts, counts)
+        positions = order[rank_in_category < list_size]
+        offsets = np.concatenate(([0], np.cumsum(np.minimum(counts, list_size)))).astype(np.int64)
+        category_order = np.argsort(positions[offsets[:-1]], kind='stable')
+        return ranking, positions, offsets, category_order
 
-        # Filter out articles already read by the user
-        read_article_ids = self.user_interactions[self.user_interactions['user_id'] == user_id]['click_article_id'].unique()
-        candidate_articles = candidate_articles[~candidate_articles['article_id'].isin(read_article_ids)]
-
-        # Sort by final score
-        candidate_articles = candidate_articles.sort_values(by='final_score', ascending=False)
-
-        # Prepare recommendations list
-        recommendations = []
-        for _, row in candidate_articles.head(n_recommendations * 5).iterrows(): # Take more to allow for diversity filtering
-            recommendations.append({
-                'article_id': row['article_id'],
-                'title': f"Article {row['article_id']}", # Placeholder for title
-                'category_id': row['category_id'],
-                'score': row['final_score'],
-                'reason': "Popularité/Tendance"
-            })
+    def _to_recommendations(self, positions, ranking) -> List[Dict]:
+        article_ids, category_ids, scores, _ = ranking
+        positions = np.asarray(positions, dtype=np.int64)
+        return [{
+            'article_id': article_id,
+            'title': f"Article {article_id}", # Placeholder for title
+            'category_id': category_id,
+            'score': score,
+            'reason': "Popularité/Tendance"
+        } for article_id, category_id, score in zip(article_ids[positions].tolist(), category_ids[positions].tolist(),
+                                                     scores[positions].tolist())]
+
+    def _round_robin_recommendations(self, read_article_ids: np.ndarray, n_recommendations: int) -> List[Dict]:
+        """
+        Cold start : tour à tour, le meilleur article non lu de chaque catégorie (catégories dans l'ordre de
+        leur meilleur article), jusqu'à `n_recommendations` articles. Le coût dépend de n, pas du catalogue.
+        """
+        ranking, positions, offsets, category_order = self.category_lists
+        article_ids = ranking[0]
+        read = set(read_article_ids.tolist())
+        cursors = offsets[:-1].copy()
+        selected = []
+        active = category_order.tolist()
+        while active and len(selected) < n_recommendations:
+            still_active = []
+            for category in active:
+                cursor, end = cursors[category], offsets[category + 1]
+                while cursor < end and int(article_ids[positions[cursor]]) in read:
+                    cursor += 1
+                if cursor < end:
+                    selected.append(int(positions[cursor]))
+                    cursor += 1
+                    if cursor < end:
+                        still_active.append(category)
+                cursors[category] = cursor
+                if len(selected) >= n_recommendations:
+                    break
+            active = still_active
+        if len(selected) < n_recommendations:
+            # Listes épuisées : complément dans l'ordre du classement global, sans les articles lus ni déjà retenus
+            excluded = np.concatenate((read_article_ids, article_ids[np.asarray(selected, dtype=np.int64)]))
+            selected.extend(self._unread_head(ranking, excluded, n_recommendations - len(selected)).tolist())
+        # Positions croissantes dans le classement = scores décroissants
+        return self._to_recommendations(sorted(selected), ranking)
+
+    @staticmethod
+    def _unread_head(ranking, read_article_ids: np.ndarray, n_candidates: int) -> np.ndarray:
+        """Positions des `n_candidates` premiers articles non lus du classement."""
+        # Les articles lus ne peuvent retirer qu'au plus len(read_article_ids) entrées de la tête du classement
+        head = slice(0, n_candidates + len(read_article_ids))
+        return np.flatnonzero(~np.isin(ranking[0][head], read_article_ids))[:n_candidates]
+
+    def recommend_candidates(self, user_id: int, n_candidates: int):
+        """
+        Retourne les `n_candidates` articles non lus les mieux classés (poids standards), sans filtre de diversité.
+
+        Returns:
+            (lignes des articles dans articles_metadata, scores popularité/fraîcheur), triés par score décroissant.
+        """
+        ranking = self.rankings[False]
+        positions = self._unread_head(ranking, self.user_index.read_articles(user_id), n_candidates)
+        return ranking[3][positions], ranking[2][positions]
+
+    def _ranked_recommendations(self, read_article_ids: np.ndarray, n_recommendations: int, is_cold_start: bool) -> List[Dict]:
+        """Parcourt le classement précalculé en sautant les articles lus, puis applique la diversité."""
+        if is_cold_start:
+            return self._round_robin_recommendations(read_article_ids, n_recommendations)
+        ranking = self.rankings[False]
+        n_candidates = n_recommendations * 5 # Take more to allow for diversity filtering
+        candidates = self._unread_head(ranking, read_article_ids, n_candidates)
+        recommendations = self._to_recommendations(candidates, ranking)
+
+        # Apply general diversity factor, within the n_recommendations returned
+        return ensure_diversity(recommendations, self.articles_metadata, self.config['category_diversity_factor'],
+                                n_results=n_recommendations)
+
+    def recommend(self, user_id: int, n_recommendations: int = 5, is_cold_start: bool = False) -> List[Dict]:
+        """
+        Recommande des articles basés sur la popularité et la fraîcheur.
+        Gère la stratégie cold start.
         
-        # Ensure diversity for cold start or if specified
-        if is_cold_start: # Apply diversity for cold start
-            recommendations = ensure_diversity(recommendations, self.articles_metadata, self.config['cold_start_weights']['category_diversity'])
-        else: # Apply general diversity factor
-            recommendations = ensure_diversity(recommendations, self.articles_metadata, self.config['category_diversity_factor'])
-
-        # Trim to n_recommendations
-        recommendations = recommendations[:n_recommendations]
+        Args:
+            user_id: ID de l'utilisateur (utilisé pour le filtrage des articles déjà lus).
+            n_recommendations: Nombre de recommandations.
+            is_cold_start: Booléen indiquant si l'utilisateur est en cold start.
+            
+        Returns:
+            Liste de dictionnaires avec les articles recommandés et leurs scores.
+        """
+        logging.info(f"Génération de recommandations basées sur la popularité pour l'utilisateur {user_id} (cold start: {is_cold_start}).")
+
+        read_article_ids = self.user_index.read_articles(user_id)
+        if len(read_article_ids) == 0:
+            # Utilisateur sans historique : réponse identique pour tous, construite une seule fois
+            key = (is_cold_start, n_recommendations)
+            responses = self._responses_without_history
+            if key not in responses:
+                responses[key] = self._ranked_recommendations(read_article_ids, n_recommendations, is_cold_start)
+            recommendations = [dict(rec) for rec in responses[key]]
+        else:
+            recommendations = self._ranked_recommendations(read_article_ids, n_recommendations, is_cold_start)
 
         logging.info(f"Recommandations basées sur la popularité générées pour l'utilisateur {user_id}.")
         return recommendations
@@ -0,0 +1,94 @@
+import pandas as pd
+import numpy as np
+import logging
+from typing import List, Dict, Optional
+from .popularity_based import PopularityBasedRecommender
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+POPULARITY_TIER_ARRAYS = (
+    'popularity_tier.article_ids',
+    'popularity_tier.category_ids',
+    'popularity_tier.scores',
+)
+DEFAULT_TIER_SIZE = 1000
+
+
+def compute_popularity_tier(user_interactions: pd.DataFrame, articles_metadata: pd.DataFrame,
+                            config: Dict, size: int = DEFAULT_TIER_SIZE) -> Dict[str, np.ndarray]:
+    """
+    Précalcule le classement cold start (popularité + fraîcheur) des `size` meilleurs articles,
+    à stocker dans le bundle pour servir des recommandations avant le chargement complet du moteur.
+    """
+    ranked = PopularityBasedRecommender(user_interactions, articles_metadata, config) \
+        .rank_articles(is_cold_start=True) \
+        .sort_values(by='final_score', ascending=False) \
+        .head(size)
+    return {
+        'popularity_tier.article_ids': ranked['article_id'].to_numpy(dtype=np.int32),
+        'popularity_tier.category_ids': ranked['category_id'].to_numpy(dtype=np.int32),
+        'popularity_tier.scores': ranked['final_score'].to_numpy(dtype=np.float32),
+    }
+
+
+class PopularityTier:
+    """
+    Tier de démarrage : recommandations de popularité servies depuis un classement précalculé,
+    disponible en quelques millisecondes pendant que le moteur complet se charge.
+    Sans historique (`user_ids` / `click_article_ids`), les articles déjà lus ne sont pas filtrés.
+    """
+    name = "popularity"
+
+    def __init__(self, article_ids: np.ndarray, category_ids: np.ndarray, scores: np.ndarray,
+                 user_ids: Optional[np.ndarray] = None, click_article_ids: Optional[np.ndarray] = None):
+        self.article_ids = article_ids
+        self.category_ids = category_ids
+        self.scores = scores
+        self.user_ids = user_ids
+        self.click_article_ids = click_article_ids
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> 'PopularityTier':
+        """Construit le tier à partir des tableaux d'un bundle (historique inclus s'il est présent)."""
+        return cls(
+            arrays['popularity_tier.article_ids'],
+            arrays['popularity_tier.category_ids'],
+            arrays['popularity_tier.scores'],
+            arrays.get('user_interactions.user_id'),
+            arrays.get('user_interactions.click_article_id'),
+        )
+
+    def _read_article_ids(self, user_id: int) -> set:
+        if self.user_ids is None or self.click_article_ids is None:
+            return set()
+        return set(np.asarray(self.click_article_ids[self.user_ids == user_id]).tolist())
+
+    def recommend(self, user_id: int, n_recommendations: int = 5) -> List[Dict]:
+        """
+        Recommande les articles les mieux classés, une catégorie différente par article
+        tant que possible, puis complète dans l'ordre du classement.
+        """
+        read_article_ids = self._read_article_ids(user_id)
+        candidates = [i for i in range(len(self.article_ids)) if int(self.article_ids[i]) not in read_article_ids]
+
+        selected = []
+        seen_categories = set()
+        for i in candidates:
+            if int(self.category_ids[i]) not in seen_categories:
+                selected.append(i)
+                seen_categories.add(int(self.category_ids[i]))
+                if len(selected) >= n_recommendations:
+                    break
+        if len(selected) < n_recommendations:
+            selected_set = set(selected)
+            selected.extend([i for i in candidates if i not in selected_set][:n_recommendations - len(selected)])
+        selected.sort(key=lambda i: self.scores[i], reverse=True)
+
+        return [{
+            'article_id': int(self.article_ids[i]),
+            'title': f"Article {int(self.article_ids[i])}",
+            'category_id': int(self.category_ids[i]),
+            'score': float(self.scores[i]),
+            'reason': "Popularité/Tendance"
+        } for i in selected]
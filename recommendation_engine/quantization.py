@@ -0,0 +1,94 @@
+import numpy as np
+import logging
+from typing import Dict
+from .utils import l2_normalize_rows
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+QUANTIZATION_MODES = ('float16', 'int8')
+QUANTIZED_ARRAYS = ('content.quantized_codes', 'content.quantized_scales')
+# Nombre de lignes déquantifiées à la fois : borne la mémoire temporaire d'un scan complet
+# (des blocs qui tiennent en cache sont aussi plus rapides à convertir)
+SCORE_BLOCK_SIZE = 1024
+
+
+class QuantizedEmbeddings:
+    """
+    Embeddings normalisés L2 stockés sous forme compacte pour le premier passage de scoring.
+
+    - 'float16' : demi-précision (2 octets par valeur) ;
+    - 'int8' : codes entiers avec une échelle par dimension (1 octet par valeur).
+
+    Le scan complet déquantifie la matrice par blocs de lignes, ce qui borne la mémoire temporaire.
+    L'indexation (`embeddings[rows]`, `embeddings[a:b]`) renvoie des lignes déquantifiées en float32,
+    ce qui permet de les utiliser à la place de la matrice float32 (ex: dans l'index IVF).
+    """
+    def __init__(self, codes: np.ndarray, scales: np.ndarray = None):
+        self.codes = codes
+        self.scales = scales
+        self.mode = 'int8' if scales is not None else 'float16'
+
+    @classmethod
+    def from_embeddings(cls, embeddings: np.ndarray, mode: str, block_size: int = SCORE_BLOCK_SIZE) -> 'QuantizedEmbeddings':
+        """
+        Normalise et quantifie les embeddings bloc par bloc (la matrice float32 complète n'est jamais matérialisée).
+        """
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown embedding quantization mode: {mode} (expected one of {QUANTIZATION_MODES})")
+        n_rows, dim = embeddings.shape
+        blocks = range(0, n_rows, block_size)
+        if mode == 'float16':
+            codes = np.empty((n_rows, dim), dtype=np.float16)
+            for start in blocks:
+                codes[start:start + block_size] = l2_normalize_rows(embeddings[start:start + block_size])
+            return cls(codes)
+
+        # int8 : premier passage pour l'échelle par dimension (max |x| / 127), second pour les codes
+        max_abs = np.zeros(dim, dtype=np.float32)
+        for start in blocks:
+            np.maximum(max_abs, np.abs(l2_normalize_rows(embeddings[start:start + block_size])).max(axis=0), out=max_abs)
+        scales = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+        codes = np.empty((n_rows, dim), dtype=np.int8)
+        for start in blocks:
+            block = l2_normalize_rows(embeddings[start:start + block_size]) / scales
+            codes[start:start + block_size] = np.clip(np.rint(block), -127, 127)
+        return cls(codes, scales)
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> 'QuantizedEmbeddings':
+        """Recharge des embeddings déjà quantifiés (ex: état partagé entre workers)."""
+        return cls(arrays[QUANTIZED_ARRAYS[0]], arrays.get(QUANTIZED_ARRAYS[1]))
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        arrays = {QUANTIZED_ARRAYS[0]: self.codes}
+        if self.scales is not None:
+            arrays[QUANTIZED_ARRAYS[1]] = self.scales
+        return arrays
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, key) -> np.ndarray:
+        rows = self.codes[key].astype(np.float32)
+        if self.scales is not None:
+            rows *= self.scales
+        return rows
+
+    def score(self, query: np.ndarray) -> np.ndarray:
+        """Produit scalaire approché de chaque ligne avec `query` (float32), calculé par blocs."""
+        # int8 : l'échelle est appliquée à la requête plutôt qu'à chaque ligne
+        scaled_query = (query * self.scales if self.scales is not None else query).astype(np.float32)
+        scores = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), SCORE_BLOCK_SIZE):
+            block = self.codes[start:start + SCORE_BLOCK_SIZE]
+            scores[start:start + len(block)] = block.astype(np.float32) @ scaled_query
+        return scores
@@ -1,22 +1,27 @@
 import pandas as pd
 import numpy as np
 import os
+import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict
 from .data_loader import DataLoader
 from .popularity_based import PopularityBasedRecommender
 from .content_based import ContentBasedRecommender
 from .collaborative_filtering import CollaborativeFilteringRecommender # Import collaborative filtering
-from .utils import normalize_scores, filter_read_articles, ensure_diversity # Import utilities
+from .user_index import UserInteractionIndex
+from .score_fusion import DenseScoreFusion, ThresholdFusion
+from .utils import ensure_diversity # Import utilities
 from config import RECOMMENDATION_CONFIG # Assuming config.py is in the root directory
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class RecommendationEngine:
-    def __init__(self, articles_metadata, user_interactions, embeddings, data_summary):
+    def __init__(self, articles_metadata, user_interactions, embeddings, data_summary, artifacts: Dict[str, np.ndarray] = None):
         """
         Initialise le système de recommandation avec les données pré-chargées.
+        `artifacts` : tableaux précalculés hors ligne (ex: tableaux du bundle), utilisés par les composants s'ils sont présents.
         """
         logger.info("Initializing RecommendationEngine...")
         
@@ -27,6 +32,7 @@ class RecommendationEngine:
         self.user_interactions = user_interactions
         self.embeddings_optimized = embeddings
         self.data_summary = data_summary
+        self.artifacts = artifacts or {}
         self.config = RECOMMENDATION_CONFIG
 
         logger.info("Data successfully passed to RecommendationEngine.")
@@ -42,28 +48,80 @@ class RecommendationEngine:
             idx: article_id for article_id, idx in self.article_id_to_embedding_idx.items()
         }
         logger.info(f"Created article_id to embedding index mapping for {len(self.article_id_to_embedding_idx)} articles.")
+        self.article_ids = self.articles_metadata['article_id'].to_numpy()
+        self.category_ids = self.articles_metadata['category_id'].to_numpy()
+        # Combinaison des scores des composants dans l'espace des lignes d'articles
+        self.score_fusion = DenseScoreFusion(len(self.articles_metadata))
+        self.threshold_fusion = ThresholdFusion(len(self.articles_metadata), ('content_based', 'collaborative', 'popularity'))
+
+        # Index des interactions par utilisateur, partagé par tous les composants
+        self.user_index = UserInteractionIndex(self.user_interactions)
 
         # Initialize recommender components
+        # Les trois composants sont indépendants : ils sont construits en parallèle sur un pool de threads
+        # (la construction passe l'essentiel de son temps dans NumPy / pandas / SciPy, qui libèrent le GIL).
+        component_builders = {
+            'content_based_recommender': lambda: ContentBasedRecommender(
+                self.user_interactions, self.articles_metadata,
+                self.embeddings_optimized, self.article_id_to_embedding_idx, self.config, self.user_index,
+                self.artifacts
+            ),
+            'collaborative_recommender': lambda: CollaborativeFilteringRecommender(
+                self.user_interactions, self.articles_metadata, self.config, self.user_index, self.artifacts
+            ),
+            'popularity_recommender': lambda: PopularityBasedRecommender(
+                self.user_interactions, self.articles_metadata, self.config, self.user_index
+            ),
+        }
+        self.component_build_times = {}
+        init_start = time.perf_counter()
         try:
-            logger.info("Initializing ContentBasedRecommender...")
-            self.content_based_recommender = ContentBasedRecommender(
-                self.user_interactions, self.articles_metadata, 
-                self.embeddings_optimized, self.article_id_to_embedding_idx, self.config
-            )
-            logger.info("Initializing CollaborativeFilteringRecommender...")
-            self.collaborative_recommender = CollaborativeFilteringRecommender(
-                self.user_interactions, self.articles_metadata, self.config
-            )
-            logger.info("Initializing PopularityBasedRecommender...")
-            self.popularity_recommender = PopularityBasedRecommender(
-                self.user_interactions, self.articles_metadata, self.config
-            )
-            logger.info("All recommender components initialized successfully.")
+            with ThreadPoolExecutor(max_workers=self.config.get('init_workers', len(component_builders)),
+                                    thread_name_prefix="engine-init") as executor:
+                futures = {name: executor.submit(self._timed_build, builder)
+                           for name, builder in component_builders.items()}
+                for name, future in futures.items():
+                    component, build_time = future.result()
+                    setattr(self, name, component)
+                    self.component_build_times[name] = build_time
+                    logger.info(f"{type(component).__name__} built in {build_time:.3f}s.")
+            logger.info(f"All recommender components initialized successfully in {time.perf_counter() - init_start:.3f}s.")
         except Exception as e:
             logger.error(f"Failed to initialize recommender components: {e}", exc_info=True)
             raise
 
         logger.info("RecommendationEngine initialized successfully.")
+
+    @property
+    def derived_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Tableaux calculés par les composants à l'initialisation (embeddings normalisés, index, tables...).
+        Repassés dans `artifacts`, ils évitent ce calcul aux moteurs suivants (ex: autres workers du même hôte).
+        """
+        return {**self.content_based_recommender.derived_arrays, **self.collaborative_recommender.derived_arrays}
+
+    def use_shared_arrays(self, arrays: Dict[str, np.ndarray]):
+        """Remplace les tableaux dérivés des composants par leurs copies partagées (voir `derived_arrays`)."""
+        self.content_based_recommender.use_shared_arrays(arrays)
+        self.collaborative_recommender.use_shared_arrays(arrays)
+
+    @staticmethod
+    def _timed_build(builder):
+        start_time = time.perf_counter()
+        component = builder()
+        return component, time.perf_counter() - start_time
+
+    def record_interaction(self, user_id: int, article_id: int, timestamp: int = None):
+        """
+        Prend en compte un nouveau clic sans reconstruire le moteur : delta de la matrice utilisateur-article
+        (filtrage collaboratif), fenêtre de profil (content-based), compteurs de tendance (popularité), puis
+        historique de l'index des interactions (comptage cold start et filtre des articles lus).
+        """
+        self.collaborative_recommender.record_interaction(user_id, article_id)
+        # Avant l'index : un profil absent du cache est chargé depuis l'historique connu, puis le clic y est ajouté
+        self.content_based_recommender.record_click(user_id, article_id)
+        self.popularity_recommender.record_click(article_id, timestamp)
+        self.user_index.record_click(user_id, article_id)
     
     def recommend_articles(self, user_id: int, n_recommendations: int = 5) -> List[Dict]:
         """
@@ -83,11 +141,8 @@ class RecommendationEngine:
         """
         logging.info(f"Génération de recommandations pour l'utilisateur {user_id}...")
 
-        # Gérer le Cold Start Problem
-        user_interactions_count = self.user_interactions[self.user_interactions['user_id'] == user_id].shape[0]
-        
         # Handle Cold Start Problem
-        user_interactions_count = self.user_interactions[self.user_interactions['user_id'] == user_id].shape[0]
+        user_interactions_count = self.user_index.count(user_id)
         
         if user_interactions_count < self.config['min_interactions_collab']: # Cold start user (<3 interactions)
             logging.info(f"Utilisateur {user_id} en cold start ({user_interactions_count} interactions). Applique la stratégie cold start.")
@@ -103,93 +158,46 @@ class RecommendationEngine:
         else:
             logging.info(f"Utilisateur {user_id} avec historique suffisant ({user_interactions_count} interactions). Utilise les poids par défaut.")
 
-        # Get scores from individual recommenders
-        content_scores = self.content_based_recommender.recommend(user_id, n_recommendations * 2) # Get more for combining
-        collab_scores = self.collaborative_recommender.recommend(user_id, n_recommendations * 2) # Get more for combining
-        popularity_scores_list = self.popularity_recommender.recommend(user_id, n_recommendations * 2) # Get more for combining
-        popularity_scores = {rec['article_id']: rec['score'] for rec in popularity_scores_list}
-
-        # Combine scores
-        final_scores = self._combine_scores(content_scores, collab_scores, popularity_scores, current_weights)
+        # Filter out already read articles
+        read_rows = [self.article_id_to_embedding_idx.get(article_id) for article_id in self.user_index.read_articles(user_id).tolist()]
+        read_rows = np.array([row for row in read_rows if row is not None], dtype=np.int64)
+        # Candidats (lignes d'articles, scores bruts) de chaque composant, combinés selon config['fusion_mode']
+        n_candidates = n_recommendations * 2 # Get more for combining
+        components = [
+            (*self.content_based_recommender.recommend_candidates(user_id, n_candidates), current_weights['content_based']),
+            (*self.collaborative_recommender.recommend_candidates(user_id, n_candidates), current_weights['collaborative']),
+            (*self.popularity_recommender.recommend_candidates(user_id, n_candidates), current_weights['popularity']),
+        ]
+        fusion = self.threshold_fusion if self.config.get('fusion_mode', 'dense') == 'threshold' else self.score_fusion
+        rows, scores = fusion.fuse(components, read_rows, n_recommendations * 5) # Take more to allow for diversity filtering
+
+        recommendations = [{
+            'article_id': article_id,
+            'title': f"Article {article_id}", # Placeholder for title, assuming no title in metadata
+            'category_id': category_id,
+            'score': score,
+            'reason': "Combinaison hybride"
+        } for article_id, category_id, score in zip(self.article_ids[rows].tolist(), self.category_ids[rows].tolist(),
+                                                     scores.tolist())]
 
-        # Filter out already read articles and unavailable articles
-        user_read_article_ids = self.user_interactions[self.user_interactions['user_id'] == user_id]['click_article_id'].unique()
-        available_article_ids = self.articles_metadata['article_id'].unique()
-        
-        sorted_final_scores = sorted(final_scores.items(), key=lambda item: item[1], reverse=True)
-        
-        recommendations = []
-        seen_article_ids_for_dedup = set(user_read_article_ids)
-        
-        for article_id, score in sorted_final_scores:
-            if article_id not in seen_article_ids_for_dedup and article_id in available_article_ids:
-                article_meta = self.articles_metadata[self.articles_metadata['article_id'] == article_id]
-                if not article_meta.empty:
-                    article_meta = article_meta.iloc[0]
-                    recommendations.append({
-                        'article_id': article_id,
-                        'title': f"Article {article_id}", # Placeholder for title, assuming no title in metadata
-                        'category_id': article_meta['category_id'],
-                        'score': score,
-                        'reason': "Combinaison hybride"
-                    })
-                    seen_article_ids_for_dedup.add(article_id)
-                    if len(recommendations) >= n_recommendations:
-                        break
-                else:
-                    logging.warning(f"Article {article_id} not found in metadata during final recommendation assembly.")
-        
         # Ensure diversity
-        recommendations = ensure_diversity(recommendations, self.articles_metadata, self.config['category_diversity_factor'])
-        recommendations = recommendations[:n_recommendations] # Trim again after diversity
+        # Re-classement par catégorie au sein des n retenus, parmi les 5n candidats fusionnés
+        recommendations = ensure_diversity(recommendations, self.articles_metadata, self.config['category_diversity_factor'],
+                                           n_results=n_recommendations)
 
         logging.info(f"Recommandations générées pour l'utilisateur {user_id}.")
         return recommendations
-        
-    def _combine_scores(self, content_scores: Dict[int, float], collab_scores: Dict[int, float], popularity_scores: Dict[int, float], weights: Dict[str, float]) -> Dict[int, float]:
-        """
-        Combine les scores des 3 approches avec pondération.
-        """
-        logging.info("Combinaison des scores des différentes approches...")
-        
-        all_article_ids = set(content_scores.keys()) | set(collab_scores.keys()) | set(popularity_scores.keys())
-        
-        final_scores = {}
-
-        # Collect all scores for normalization
-        all_content_scores = list(content_scores.values())
-        all_collab_scores = list(collab_scores.values())
-        all_popularity_scores = list(popularity_scores.values())
-
-        # Normalize scores from each component to 0-1 range
-        # Use a global min/max for each component if possible, or per-call if dynamic
-        # For simplicity, normalize based on the scores present in this call
-        normalized_content_scores = normalize_scores(content_scores)
-        normalized_collab_scores = normalize_scores(collab_scores)
-        normalized_popularity_scores = normalize_scores(popularity_scores)
-        
-        for article_id in all_article_ids:
-            c_score_norm = normalized_content_scores.get(article_id, 0.0)
-            col_score_norm = normalized_collab_scores.get(article_id, 0.0)
-            pop_score_norm = normalized_popularity_scores.get(article_id, 0.0)
-            
-            combined_score = (c_score_norm * weights['content_based'] +
-                              col_score_norm * weights['collaborative'] +
-                              pop_score_norm * weights['popularity'])
-            final_scores[article_id] = combined_score
-            
-        logging.info("Scores combinés.")
-        return final_scores
 
 # Example usage (for testing purposes)
 if __name__ == "__main__":
+    from .bundle import compile_bundle
+
     # Ensure processed_data exists and contains the necessary files
     # You might need to run data_preparation.py first
     
     # Create dummy processed_data for testing if not available
-    if not os.path.exists("processed_data/user_interactions.json"):
+    if not os.path.exists("processed_data/engine_bundle/manifest.json"):
         print("Creating dummy processed_data for testing...")
-        os.makedirs("processed_data", exist_ok=True)
         
         dummy_clicks = pd.DataFrame({
             'user_id': [1, 1, 1, 2, 2, 3, 3, 3, 3, 10001, 10001],
@@ -197,7 +205,6 @@ if __name__ == "__main__":
             'click_article_id': [10, 11, 12, 10, 13, 11, 14, 15, 16, 10, 11],
             'click_timestamp': [1678886400000, 1678886500000, 1678886600000, 1678886700000, 1678886800000, 1678886900000, 1678887000000, 1678887100000, 1678887200000, 1678887300000, 1678887400000]
         })
-        dummy_clicks.to_json("processed_data/user_interactions.json", orient='records', lines=True, date_unit='ms')
 
         dummy_meta = pd.DataFrame({
             'article_id': [10, 11, 12, 13, 14, 15, 16],
@@ -206,24 +213,23 @@ if __name__ == "__main__":
             'publisher_id': [1, 1, 2, 2, 1, 1, 2],
             'words_count': [100, 120, 150, 110, 130, 140, 160]
         })
-        dummy_meta.to_json("processed_data/articles_metadata.json", orient='records', lines=True, date_unit='ms')
 
         dummy_embeddings = np.random.rand(7, 52).astype(np.float32) # 7 articles, 52 dimensions
-        with open("processed_data/embeddings_optimized.pkl", 'wb') as f:
-            pickle.dump(dummy_embeddings, f)
 
         dummy_summary = {
             "total_interactions": len(dummy_clicks),
-            "total_users": dummy_clicks['user_id'].nunique(),
-            "total_articles": dummy_clicks['click_article_id'].nunique(),
-            "total_sessions": dummy_clicks['session_id'].nunique(),
+            "total_users": int(dummy_clicks['user_id'].nunique()),
+            "total_articles": int(dummy_clicks['click_article_id'].nunique()),
+            "total_sessions": int(dummy_clicks['session_id'].nunique()),
             "embedding_dimensions": dummy_embeddings.shape[1]
         }
-        with open("processed_data/data_summary.json", 'w') as f:
-            json.dump(dummy_summary, f, indent=4)
+        compile_bundle(dummy_meta, dummy_clicks, dummy_embeddings, dummy_summary, "processed_data/engine_bundle")
         print("Dummy data created.")
 
-    recommender = RecommendationEngine()
+    loader = DataLoader("processed_data/")
+    loader.load_all_data()
+    recommender = RecommendationEngine(loader.get_articles_metadata(), loader.get_user_interactions(),
+                                       loader.get_embeddings_optimized(), loader.get_data_summary())
     
     # Test with a user who has interactions
     user_id_test = 1
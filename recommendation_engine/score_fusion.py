@@ -0,0 +1,167 @@
+import threading
+import numpy as np
+import logging
+from typing import Dict, List, Tuple
+from .utils import top_k_indices
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def min_max_normalize(scores: np.ndarray) -> np.ndarray:
+    """Équivalent vectorisé de normalize_scores : scores ramenés entre 0 et 1, 0.5 si tous égaux."""
+    scores = np.asarray(scores, dtype=np.float32)
+    if len(scores) == 0:
+        return scores
+    min_score, max_score = scores.min(), scores.max()
+    if max_score == min_score:
+        return np.full(len(scores), 0.5, dtype=np.float32)
+    return (scores - min_score) / (max_score - min_score)
+
+
+class DenseScoreFusion:
+    """
+    Combinaison pondérée des scores des composants dans l'espace des lignes d'articles (articles_metadata).
+
+    Chaque composant fournit (lignes, scores) ; ses scores sont normalisés min-max puis ajoutés, pondérés,
+    dans un tampon float32 d'une case par article, préalloué une fois par thread. Seules les cases touchées
+    sont lues puis remises à zéro : le coût dépend du nombre de candidats, pas de la taille du catalogue.
+    """
+    def __init__(self, n_articles: int):
+        self.n_articles = n_articles
+        self._local = threading.local()
+
+    def _buffer(self) -> np.ndarray:
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = self._local.buffer = np.zeros(self.n_articles, dtype=np.float32)
+        return buffer
+
+    def fuse(self, components: List[Tuple[np.ndarray, np.ndarray, float]], excluded_rows: np.ndarray,
+             n_results: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Args:
+            components: (lignes, scores bruts, poids) de chaque composant.
+            excluded_rows: Lignes à ne jamais retourner (articles déjà lus).
+            n_results: Nombre de lignes retournées.
+
+        Returns:
+            (lignes, scores combinés), triés par score décroissant.
+        """
+        components = [(np.asarray(rows, dtype=np.int64), scores, weight) for rows, scores, weight in components
+                      if len(rows)]
+        if not components:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        buffer = self._buffer()
+        for rows, scores, weight in components:
+            np.add.at(buffer, rows, np.float32(weight) * min_max_normalize(scores))
+        touched = np.unique(np.concatenate([rows for rows, _, _ in components]))
+        combined = buffer[touched]
+        buffer[touched] = 0.0
+        combined[np.isin(touched, excluded_rows)] = -np.inf
+        top = top_k_indices(combined, n_results)
+        return touched[top], combined[top]
+
+
+class ThresholdFusion:
+    """
+    Même combinaison que DenseScoreFusion (mêmes scores, à l'ordre des ex aequo près), calculée par l'algorithme à seuil de Fagin
+    sur les listes de candidats des composants (lignes uniques au sein d'une liste).
+
+    Chaque liste est lue par ordre décroissant de score, par blocs doublés à chaque tour ; chaque nouvel
+    article reçoit son score complet par accès direct aux autres listes, dispersées dans un tampon float32
+    par composant (préalloué une fois par thread, remis à zéro après l'appel). Le seuil, somme des prochains
+    scores non lus de chaque liste, majore le score de tout article pas encore vu : la lecture s'arrête dès
+    que le k-ième meilleur score l'atteint. Les profondeurs lues dans chaque liste sont cumulées pour
+    l'instrumentation (`depth_stats`).
+    """
+    def __init__(self, n_articles: int, component_names: Tuple[str, ...], initial_block_size: int = 8):
+        self.n_articles = n_articles
+        self.component_names = component_names
+        self.initial_block_size = initial_block_size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.total_rounds = 0
+        self.total_depths = dict.fromkeys(component_names, 0)
+
+    def _buffers(self) -> np.ndarray:
+        buffers = getattr(self._local, 'buffers', None)
+        if buffers is None:
+            buffers = self._local.buffers = np.zeros((len(self.component_names), self.n_articles), dtype=np.float32)
+        return buffers
+
+    def fuse(self, components: List[Tuple[np.ndarray, np.ndarray, float]], excluded_rows: np.ndarray,
+             n_results: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Args:
+            components: (lignes, scores bruts, poids) de chaque composant, dans l'ordre de `component_names`.
+            excluded_rows: Lignes à ne jamais retourner (articles déjà lus).
+            n_results: Nombre de lignes retournées.
+
+        Returns:
+            (lignes, scores combinés), triés par score décroissant.
+        """
+        buffers = self._buffers()
+        streams = {}
+        for index, (name, (rows, scores, weight)) in enumerate(zip(self.component_names, components)):
+            if len(rows) == 0:
+                continue
+            rows = np.asarray(rows, dtype=np.int64)
+            weighted = np.float32(weight) * min_max_normalize(scores)
+            # Les candidats des composants sont déjà triés par score décroissant : tri seulement sinon
+            if np.any(np.diff(weighted) > 0):
+                order = np.argsort(-weighted, kind='stable')
+                rows, weighted = rows[order], weighted[order]
+            buffers[index, rows] = weighted
+            streams[name] = (index, rows, weighted)
+        cursors = dict.fromkeys(streams, 0)
+        seen = np.zeros(0, dtype=np.int64)
+        best_rows, best_scores = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        block_size = self.initial_block_size
+        rounds = 0
+        try:
+            while n_results > 0 and any(cursors[name] < len(rows) for name, (_, rows, _) in streams.items()):
+                rounds += 1
+                blocks = []
+                for name, (_, rows, _) in streams.items():
+                    blocks.append(rows[cursors[name]:cursors[name] + block_size])
+                    cursors[name] = min(cursors[name] + block_size, len(rows))
+                rows = np.setdiff1d(np.concatenate(blocks), seen)
+                seen = np.concatenate((seen, rows))
+                rows = rows[~np.isin(rows, excluded_rows)]
+                scores = np.zeros(len(rows), dtype=np.float32)
+                for index, _, _ in streams.values():
+                    scores += buffers[index, rows]
+                best_rows, best_scores = np.concatenate((best_rows, rows)), np.concatenate((best_scores, scores))
+                top = top_k_indices(best_scores, n_results)
+                best_rows, best_scores = best_rows[top], best_scores[top]
+
+                # Seuil : score maximal d'un article encore jamais lu dans aucune liste
+                threshold = sum(float(weighted[cursors[name]]) for name, (_, _, weighted) in streams.items()
+                                if cursors[name] < len(weighted))
+                # Arrêt strict : un article non lu à égalité avec le k-ième pourrait le précéder (ligne plus petite)
+                if len(best_rows) >= n_results and best_scores[-1] > threshold:
+                    break
+                block_size *= 2
+        finally:
+            for index, rows, _ in streams.values():
+                buffers[index, rows] = 0.0
+
+        # Ex aequo par ligne croissante : ordre déterministe
+        order = np.lexsort((best_rows, -best_scores))
+        with self._lock:
+            self.calls += 1
+            self.total_rounds += rounds
+            for name in streams:
+                self.total_depths[name] += cursors[name]
+        return best_rows[order], best_scores[order]
+
+    def depth_stats(self) -> Dict[str, float]:
+        """Profondeur moyenne lue dans chaque liste de candidats par appel, et nombre moyen de tours."""
+        with self._lock:
+            if self.calls == 0:
+                return {}
+            stats = {name: depth / self.calls for name, depth in self.total_depths.items()}
+            stats['rounds'] = self.total_rounds / self.calls
+            return stats
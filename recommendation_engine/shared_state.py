@@ -0,0 +1,203 @@
+import os
+import json
+import errno
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+import weakref
+import numpy as np
+from typing import Any, Callable, Dict, List
+from .bundle import _array_filename
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrous de fichiers, chaque worker peut construire l'état
+    fcntl = None
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+STATE_INDEX_FILENAME = "arrays.json"
+IN_USE_FILENAME = ".in_use"
+TMP_SUFFIX = ".tmp"
+NPY_HEADER_BYTES = 4096  # marge par fichier (en-tête .npy, index, blocs du système de fichiers)
+
+
+def default_shared_state_root() -> str:
+    """Racine des états partagés : /dev/shm (tmpfs, donc mémoire partagée) si disponible, sinon le dossier temporaire."""
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, 'recommendation_engine_state')
+
+
+def state_key(data_version: str, config: Dict) -> str:
+    """Clé d'un état partagé : version des données + empreinte de la configuration qui l'a produit."""
+    fingerprint = hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:12]
+    return f"{data_version}-{fingerprint}"
+
+
+def _lock(path: str, mode: int, blocking: bool = True):
+    """Ouvre `path` et y pose un verrou flock ; retourne le descripteur, ou None si le verrou n'est pas disponible."""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    if fcntl is None:
+        return fd
+    try:
+        fcntl.flock(fd, mode | (0 if blocking else fcntl.LOCK_NB))
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+class SharedEngineState:
+    """
+    Tableaux dérivés du moteur (embeddings normalisés ou quantifiés, index, tables de voisins, facteurs...)
+    partagés entre les processus workers d'un même hôte.
+
+    Le premier worker construit les tableaux sous un verrou exclusif et les écrit en .npy dans un dossier
+    propre à (version des données, configuration), placé par défaut sur /dev/shm. Les autres workers
+    attendent le verrou puis mappent les fichiers en lecture seule : les pages sont partagées, sans copie.
+    Chaque worker garde un verrou partagé sur le dossier tant qu'il l'utilise ; `cleanup` ne supprime
+    que les dossiers qu'aucun worker n'utilise plus (anciennes versions après un rafraîchissement).
+    """
+    def __init__(self, root: str, data_version: str, config: Dict):
+        self.root = root
+        self.key = state_key(data_version, config)
+        self.path = os.path.join(root, self.key)
+        self._in_use_fd = None
+        self._finalizer = None
+
+    def _attach(self) -> Dict[str, np.ndarray]:
+        with open(os.path.join(self.path, STATE_INDEX_FILENAME), 'r', encoding='utf-8') as f:
+            files = json.load(f)
+        self._in_use_fd = _lock(os.path.join(self.path, IN_USE_FILENAME), fcntl.LOCK_SH if fcntl else 0)
+        self._finalizer = weakref.finalize(self, os.close, self._in_use_fd)
+        return {name: np.load(os.path.join(self.path, filename), mmap_mode='r', allow_pickle=False)
+                for name, filename in files.items()}
+
+    def _write(self, arrays: Dict[str, np.ndarray]):
+        tmp_path = self.path + TMP_SUFFIX
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)  # reste d'une construction interrompue (le verrou exclusif est à nous)
+        # /dev/shm est souvent limité à 64 Mo dans les conteneurs : pas d'écriture partielle vouée à l'échec
+        required = sum(np.asarray(array).nbytes for array in arrays.values()) + NPY_HEADER_BYTES * (len(arrays) + 1)
+        available = shutil.disk_usage(self.root).free
+        if required > available:
+            raise OSError(errno.ENOSPC, f"Shared engine state needs {required} bytes, {available} available in {self.root}")
+        os.makedirs(tmp_path)
+        try:
+            files = {}
+            for name, array in arrays.items():
+                files[name] = _array_filename(name)
+                np.save(os.path.join(tmp_path, files[name]), np.ascontiguousarray(array), allow_pickle=False)
+            with open(os.path.join(tmp_path, STATE_INDEX_FILENAME), 'w', encoding='utf-8') as f:
+                json.dump(files, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+
+    def attach_or_build(self, builder: Callable[[], Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+        """
+        Mappe l'état partagé s'il existe ; sinon le construit avec `builder()` (un seul worker à la fois)
+        puis le mappe. Retourne les tableaux en lecture seule.
+        """
+        if os.path.exists(os.path.join(self.path, STATE_INDEX_FILENAME)):
+            logger.info(f"Attaching shared engine state {self.key}")
+            return self._attach()
+
+        os.makedirs(self.root, exist_ok=True)
+        build_lock = _lock(self.path + '.lock', fcntl.LOCK_EX if fcntl else 0)
+        try:
+            # Un autre worker a pu construire l'état pendant l'attente du verrou
+            if not os.path.exists(os.path.join(self.path, STATE_INDEX_FILENAME)):
+                start_time = time.perf_counter()
+                arrays = builder()
+                self._write(arrays)
+                logger.info(f"Shared engine state {self.key} built: {len(arrays)} arrays, "
+                            f"{sum(np.asarray(a).nbytes for a in arrays.values()) / 1e6:.1f} MB "
+                            f"in {time.perf_counter() - start_time:.2f}s")
+        finally:
+            os.close(build_lock)
+        return self._attach()
+
+    def release(self):
+        """Libère le verrou partagé : le dossier pourra être supprimé par `cleanup` une fois les tableaux libérés."""
+        if self._finalizer is not None:
+            self._finalizer()
+
+    @staticmethod
+    def cleanup(root: str, keep: List[str] = ()) -> List[str]:
+        """
+        Supprime les états partagés (et constructions interrompues) qu'aucun worker n'utilise,
+        sauf ceux dont la clé est dans `keep`. Retourne les clés supprimées.
+        """
+        if not os.path.isdir(root) or fcntl is None:
+            return []
+        removed = []
+        for name in sorted(os.listdir(root)):
+            key = name[:-len(TMP_SUFFIX)] if name.endswith(TMP_SUFFIX) else name
+            path = os.path.join(root, key)
+            if key in keep or not os.path.isdir(os.path.join(root, name)):
+                continue
+            # Verrou de construction puis verrou d'utilisation : aucun worker ne construit ni n'utilise cet état
+            build_lock = _lock(path + '.lock', fcntl.LOCK_EX, blocking=False)
+            if build_lock is None:
+                continue
+            try:
+                in_use_path = os.path.join(path, IN_USE_FILENAME)
+                in_use = None
+                if os.path.exists(in_use_path):
+                    in_use = _lock(in_use_path, fcntl.LOCK_EX, blocking=False)
+                    if in_use is None:
+                        continue
+                shutil.rmtree(path, ignore_errors=True)
+                shutil.rmtree(path + TMP_SUFFIX, ignore_errors=True)
+                if in_use is not None:
+                    os.close(in_use)
+                os.remove(path + '.lock')
+                removed.append(key)
+            finally:
+                os.close(build_lock)
+        if removed:
+            logger.info(f"Removed unused shared engine states: {removed}")
+        return removed
+
+
+def build_with_shared_state(state: SharedEngineState, build_fn: Callable[[Dict[str, np.ndarray]], Any],
+                            artifacts: Dict[str, np.ndarray]):
+    """
+    Construit un moteur avec `build_fn(artifacts)` en partageant ses tableaux dérivés (`derived_arrays`) via
+    `state` : le premier worker le construit une seule fois puis remplace ses copies privées par les tableaux
+    mappés (`use_shared_arrays`), les suivants le construisent directement sur les tableaux mappés.
+
+    Si l'état partagé ne peut être écrit ou mappé (OSError : /dev/shm plein, droits...), le moteur est servi
+    avec ses tableaux privés plutôt que perdu.
+    """
+    engine = None
+
+    def build_derived():
+        nonlocal engine
+        engine = build_fn(artifacts)
+        return engine.derived_arrays
+
+    try:
+        shared_arrays = state.attach_or_build(build_derived)
+    except OSError as e:
+        logger.warning(f"Shared engine state {state.key} unavailable, serving an unshared engine: {e}")
+        state.release()
+        return engine if engine is not None else build_fn(artifacts)
+
+    if engine is None:
+        engine = build_fn({**artifacts, **shared_arrays})
+    else:
+        # Premier worker : moteur construit une seule fois, ses copies privées remplacées par les tableaux mappés
+        engine.use_shared_arrays(shared_arrays)
+    engine.shared_state = state  # verrou d'utilisation gardé tant que ce moteur est servi
+    engine.shared_arrays = shared_arrays
+    try:
+        SharedEngineState.cleanup(state.root, keep=[state.key])
+    except OSError as e:
+        logger.warning(f"Unable to clean up old shared engine states: {e}")
+    return engine
@@ -6,6 +6,9 @@ import json
 from recommendation_engine.content_based import ContentBasedRecommender
 from recommendation_engine.popularity_based import PopularityBasedRecommender
 from recommendation_engine.collaborative_filtering import CollaborativeFilteringRecommender
+from recommendation_engine.user_index import UserInteractionIndex
+from recommendation_engine.utils import normalize_scores
+from scipy.sparse import csr_matrix
 from config import RECOMMENDATION_CONFIG
 
 # Helper function to create dummy processed_data for testing
@@ -85,6 +88,88 @@ class TestRecommendationComponents(unittest.TestCase):
             self.assertGreaterEqual(rec['score'], 0)
             self.assertLessEqual(rec['score'], 1)
 
+    def test_popularity_precomputed_ranking(self):
+        recommender = PopularityBasedRecommender(self.user_interactions, self.articles_metadata, self.config)
+        # Classement précalculé == tri du DataFrame complet, articles lus exclus
+        for is_cold_start in (True, False):
+            ranked = recommender.rank_articles(is_cold_start).sort_values(by='final_score', ascending=False, kind='stable')
+            self.assertEqual(recommender.rankings[is_cold_start][0].tolist(), ranked['article_id'].tolist())
+        recommendations = recommender.recommend(3, 3)
+        self.assertTrue(all(rec['article_id'] not in (11, 14, 15, 16) for rec in recommendations))
+        self.assertEqual(len(recommendations), 3)
+
+        # Utilisateur inconnu : réponse prête, copiée à chaque appel
+        first = recommender.recommend(99999, 4, is_cold_start=True)
+        first[0]['score'] = -1
+        second = recommender.recommend(99999, 4, is_cold_start=True)
+        self.assertNotEqual(second[0]['score'], -1)
+        self.assertEqual([rec['article_id'] for rec in second], [rec['article_id'] for rec in first])
+
+    def test_cold_start_category_round_robin(self):
+        recommender = PopularityBasedRecommender(self.user_interactions, self.articles_metadata, self.config)
+        ranked_ids, ranked_categories = recommender.rankings[True][:2]
+        category_of = dict(zip(ranked_ids.tolist(), ranked_categories.tolist()))
+
+        # Moins d'articles que de catégories : une catégorie par article, le meilleur de chacune, articles lus exclus
+        recommendations = recommender.recommend(10001, 4, is_cold_start=True)
+        categories = [rec['category_id'] for rec in recommendations]
+        self.assertEqual(len(set(categories)), 4)
+        self.assertTrue(all(rec['article_id'] not in (10, 11) for rec in recommendations))
+        best_unread = {}
+        for article_id in ranked_ids.tolist():
+            if article_id not in (10, 11):
+                best_unread.setdefault(category_of[article_id], article_id)
+        self.assertEqual([rec['article_id'] for rec in recommendations],
+                         [a for a in ranked_ids.tolist() if a in best_unread.values()][:4])
+        scores = [rec['score'] for rec in recommendations]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+        # Plus d'articles que de catégories (7) : toutes les catégories, puis deuxième tour
+        recommendations = recommender.recommend(10001, 9, is_cold_start=True)
+        self.assertEqual(len(recommendations), 9)
+        self.assertEqual(len({rec['category_id'] for rec in recommendations}), 7)
+
+        # Listes d'un seul article par catégorie, épuisées : complément dans l'ordre du classement global
+        short_lists = PopularityBasedRecommender(self.user_interactions, self.articles_metadata,
+                                                 {**self.config, 'category_list_size': 1})
+        recommendations = short_lists.recommend(10001, 9, is_cold_start=True)
+        ids = [rec['article_id'] for rec in recommendations]
+        best = {}
+        for article_id in ranked_ids.tolist():
+            best.setdefault(category_of[article_id], article_id)
+        first_round = [a for a in ranked_ids.tolist() if a in best.values() and a not in (10, 11)]
+        fill = [a for a in ranked_ids.tolist() if a not in (10, 11) and a not in first_round][:9 - len(first_round)]
+        self.assertEqual(ids, [a for a in ranked_ids.tolist() if a in first_round + fill])
+
+    def test_trending_counters(self):
+        from recommendation_engine.trending import TrendingCounters
+        # Sans demi-vie : nombres de clics, popularité identique au value_counts normalisé de l'historique
+        counters = TrendingCounters.from_interactions(self.user_interactions, self.articles_metadata)
+        expected = normalize_scores(self.user_interactions['click_article_id'].value_counts().to_dict())
+        self.assertEqual(counters.article_popularity().keys(), expected.keys())
+        for article_id, score in expected.items():
+            self.assertAlmostEqual(counters.article_popularity()[article_id], score)
+
+        # Demi-vie d'une heure : un clic d'il y a une heure compte pour moitié
+        counters = TrendingCounters([1, 2, 3], [7, 7, 8], half_life_hours=1)
+        counters.record_clicks(np.array([1, 1, 99]), np.array([0, 0, 0]))
+        counters.record_click(2, 3600 * 1000)
+        np.testing.assert_allclose(counters.article_scores(), [1.0, 1.0, 0.0])
+        np.testing.assert_allclose(counters.category_scores(), [2.0, 0.0])
+        self.assertEqual(counters.ignored_clicks, 1)
+        counters.record_click(3, 1000 * 3600 * 1000)  # rebasage de la référence : pas de débordement
+        np.testing.assert_allclose(counters.article_scores(), [0.0, 0.0, 1.0], atol=1e-12)
+
+        # Le recommandeur relit les compteurs au reclassement
+        recommender = PopularityBasedRecommender(self.user_interactions, self.articles_metadata,
+                                                 dict(self.config, trending_half_life_hours=1))
+        for _ in range(10):
+            recommender.trending.record_click(20, 1678887500000 + 60 * 1000)
+        self.assertTrue(recommender.refresh())
+        self.assertFalse(recommender.refresh())
+        self.assertEqual(recommender.article_popularity_scores[20], 1.0)
+        self.assertEqual(recommender.rankings[False][0][0], 20)
+
     def test_content_based_recommender(self):
         recommender = ContentBasedRecommender(self.user_interactions, self.articles_metadata, 
                                               self.embeddings_optimized, self.article_id_to_embedding_idx, self.config)
@@ -105,6 +190,130 @@ class TestRecommendationComponents(unittest.TestCase):
         self.assertNotIn(11, scores)
         self.assertNotIn(12, scores)
 
+    def test_content_based_kernel_matches_brute_force(self):
+        recommender = ContentBasedRecommender(self.user_interactions, self.articles_metadata,
+                                              self.embeddings_optimized, self.article_id_to_embedding_idx, self.config)
+        rows, scores = recommender.recommend_candidates(3, 3)
+        
+        # Référence : similarité cosinus sklearn entre le centroïde des 5 derniers articles et tous les articles non lus
+        from sklearn.metrics.pairwise import cosine_similarity
+        centroid = self.embeddings_optimized[[self.article_id_to_embedding_idx[a] for a in [16, 15, 14, 11]]].mean(axis=0)
+        reference = cosine_similarity(centroid.reshape(1, -1), self.embeddings_optimized)[0]
+        candidates = [i for i, aid in enumerate(self.articles_metadata['article_id']) if aid not in (11, 14, 15, 16)]
+        expected = sorted(candidates, key=lambda i: reference[i], reverse=True)[:3]
+        
+        self.assertEqual(rows.tolist(), expected)
+        np.testing.assert_allclose(scores, reference[expected], rtol=1e-5)
+
+    def test_ivf_index_matches_exact_search(self):
+        from recommendation_engine.ann_index import IVFIndex
+        from recommendation_engine.utils import l2_normalize_rows
+        rng = np.random.default_rng(0)
+        vectors = l2_normalize_rows(rng.standard_normal((500, 16)).astype(np.float32))
+        index = IVFIndex.build(vectors, n_lists=10)
+        self.assertEqual(sorted(index.list_rows.tolist()), list(range(500)))
+
+        query = vectors[7]
+        excluded = np.array([7, 8])
+        exact_scores = vectors @ query
+        exact_scores[excluded] = -np.inf
+        # Toutes les listes sondées : résultat identique à la recherche exacte
+        rows, scores = index.search(query, 10, nprobe=index.n_lists, excluded_rows=excluded)
+        self.assertEqual(rows.tolist(), np.argsort(-exact_scores, kind='stable')[:10].tolist())
+        # Moins de listes sondées : sous-ensemble trié, sans articles exclus
+        rows, scores = index.search(query, 10, nprobe=2, excluded_rows=excluded)
+        self.assertTrue(np.all(np.diff(scores) <= 0))
+        self.assertFalse(np.isin(rows, excluded).any())
+
+        # Rechargement depuis les tableaux (bundle) et branchement dans le recommender content-based
+        reloaded = IVFIndex.from_arrays(vectors, index.to_arrays())
+        self.assertEqual(reloaded.search(query, 5, nprobe=3)[0].tolist(), index.search(query, 5, nprobe=3)[0].tolist())
+        config = dict(self.config, content_index='ivf', ivf_n_lists=2, ivf_nprobe=2)
+        recommender = ContentBasedRecommender(self.user_interactions, self.articles_metadata,
+                                              self.embeddings_optimized, self.article_id_to_embedding_idx, config)
+        exact = ContentBasedRecommender(self.user_interactions, self.articles_metadata,
+                                        self.embeddings_optimized, self.article_id_to_embedding_idx, self.config)
+        self.assertEqual(recommender.recommend_candidates(3, 3)[0].tolist(), exact.recommend_candidates(3, 3)[0].tolist())
+
+    def test_quantized_embeddings_rescoring(self):
+        from recommendation_engine.quantization import QuantizedEmbeddings
+        from recommendation_engine.utils import l2_normalize_rows
+        normalized = l2_normalize_rows(self.embeddings_optimized)
+        exact = ContentBasedRecommender(self.user_interactions, self.articles_metadata,
+                                        self.embeddings_optimized, self.article_id_to_embedding_idx, self.config)
+        expected_rows, expected_scores = exact.recommend_candidates(3, 3)
+
+        for mode, tolerance in (('float16', 1e-3), ('int8', 2e-2)):
+            quantized = QuantizedEmbeddings.from_embeddings(self.embeddings_optimized, mode, block_size=4)
+            self.assertLess(quantized.nbytes, normalized.nbytes)
+            np.testing.assert_allclose(quantized.score(normalized[0]), normalized @ normalized[0], atol=tolerance)
+            np.testing.assert_allclose(quantized[[1, 2]], normalized[[1, 2]], atol=tolerance)
+
+            # Liste restreinte re-scorée en pleine précision : même classement et mêmes scores que le mode exact
+            config = dict(self.config, embedding_quantization=mode, rescore_shortlist=5)
+            recommender = ContentBasedRecommender(self.user_interactions, self.articles_metadata,
+                                                  self.embeddings_optimized, self.article_id_to_embedding_idx, config)
+            self.assertIsNone(recommender.normalized_embeddings)
+            rows, scores = recommender.recommend_candidates(3, 3)
+            self.assertEqual(rows.tolist(), expected_rows.tolist())
+            np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+
+    def test_content_based_batch_matches_single_user(self):
+        user_ids = [1, 2, 3, 10001, 10002, 99999]
+        for config in (self.config, dict(self.config, embedding_quantization='int8', rescore_shortlist=4)):
+            recommender = ContentBasedRecommender(self.user_interactions, self.articles_metadata,
+                                                  self.embeddings_optimized, self.article_id_to_embedding_idx, config)
+            # Petits blocs pour exercer la fusion des top-k entre blocs d'utilisateurs et d'articles
+            centroids = np.vstack([recommender._user_profile_centroid(u) for u in user_ids[:5]])
+            rows, scores = recommender.score_centroids_batch(centroids, [recommender._read_rows(u) for u in user_ids[:5]], 4,
+                                                             user_block_size=2, article_block_size=3)
+            for i, user_id in enumerate(user_ids[:5]):
+                expected_rows, expected_scores = recommender.recommend_candidates(user_id, 4)
+                self.assertEqual(rows[i][rows[i] >= 0].tolist(), expected_rows.tolist())
+                np.testing.assert_allclose(scores[i][rows[i] >= 0], expected_scores, rtol=1e-5)
+
+            batch = recommender.recommend_batch(user_ids, 4)
+            for user_id in user_ids:
+                expected = recommender.recommend(user_id, 4)
+                self.assertEqual(list(batch[user_id]), list(expected))
+                for article_id, score in expected.items():
+                    self.assertAlmostEqual(batch[user_id][article_id], score, places=4)
+
+    def test_user_profile_store(self):
+        from recommendation_engine.user_profiles import UserProfileStore
+        index = UserInteractionIndex(self.user_interactions)
+        article_ids = self.articles_metadata['article_id'].to_numpy()
+        rows_of = lambda ids: [self.article_id_to_embedding_idx[a] for a in ids]
+
+        store = UserProfileStore(index, article_ids, self.embeddings_optimized, max_users=100)
+        self.assertEqual(len(store), 5)  # 10002 compris : une interaction
+        np.testing.assert_allclose(store.centroid(3), self.embeddings_optimized[rows_of([11, 14, 15, 16])].mean(axis=0), rtol=1e-5)
+        self.assertIsNone(store.centroid(99999))  # Aucun historique
+        np.testing.assert_allclose(store.centroid(10002), self.embeddings_optimized[rows_of([17])][0], rtol=1e-5)
+        # Mise à jour incrémentale : fenêtre glissante des 5 derniers clics
+        for article_id in (18, 19):
+            store.append_click(3, article_id)
+        np.testing.assert_allclose(store.centroid(3), self.embeddings_optimized[rows_of([14, 15, 16, 18, 19])].mean(axis=0), rtol=1e-5)
+
+        # Budget : seuls les 2 utilisateurs les plus récemment actifs sont précalculés, les autres à la demande (LRU)
+        small_store = UserProfileStore(index, article_ids, self.embeddings_optimized, max_users=2)
+        self.assertEqual(set(small_store._slots), {10001, 10002})
+        np.testing.assert_allclose(small_store.centroid(1), self.embeddings_optimized[rows_of([10, 11, 12])].mean(axis=0), rtol=1e-5)
+        self.assertEqual(set(small_store._slots), {10002, 1})
+
+        # Éviction d'un profil modifié en ligne : rechargé depuis l'index, qui reçoit aussi le clic (cf. record_interaction)
+        single_store = UserProfileStore(index, article_ids, self.embeddings_optimized, max_users=1)
+        single_store.append_click(3, 18)
+        index.record_click(3, 18)
+        expected = self.embeddings_optimized[rows_of([11, 14, 15, 16, 18])].mean(axis=0)
+        np.testing.assert_allclose(single_store.centroid(1), self.embeddings_optimized[rows_of([10, 11, 12])].mean(axis=0), rtol=1e-5)
+        self.assertNotIn(3, single_store)
+        np.testing.assert_allclose(single_store.centroid(3), expected, rtol=1e-5)
+        single_store.centroid(1)
+        single_store.append_click(3, 19)
+        index.record_click(3, 19)
+        np.testing.assert_allclose(single_store.centroid(3), self.embeddings_optimized[rows_of([14, 15, 16, 18, 19])].mean(axis=0), rtol=1e-5)
+
     def test_collaborative_filtering_recommender(self):
         recommender = CollaborativeFilteringRecommender(self.user_interactions, self.articles_metadata, self.config)
         user_id = 1 # User with history
@@ -125,5 +334,297 @@ class TestRecommendationComponents(unittest.TestCase):
         self.assertNotIn(11, scores)
         self.assertNotIn(12, scores)
 
+    def test_collaborative_kernel_matches_brute_force(self):
+        recommender = CollaborativeFilteringRecommender(self.user_interactions, self.articles_metadata,
+                                                        dict(self.config, user_neighbours='on_request'))
+        scores = recommender.recommend(2, 3)
+
+        # Référence dense : somme des lignes normalisées des voisins pondérées par leur similarité cosinus
+        from sklearn.metrics.pairwise import cosine_similarity
+        from sklearn.preprocessing import normalize
+        matrix = recommender.user_article_matrix.toarray()
+        user_idx = recommender.user_to_idx[2]
+        similarities = cosine_similarity(matrix)[user_idx]
+        similarities[user_idx] = 0
+        reference = np.clip(similarities, 0, None) @ normalize(matrix)
+        reference[matrix[user_idx] > 0] = 0
+        expected = [i for i in np.argsort(-reference, kind='stable') if reference[i] > 0][:3]
+        self.assertEqual(list(scores), recommender.article_ids[expected].tolist())
+        expected_scores = normalize_scores(dict(zip(recommender.article_ids[expected].tolist(), reference[expected])))
+        for article_id, score in expected_scores.items():
+            self.assertAlmostEqual(scores[article_id], score, places=5)
+
+    def test_user_neighbour_table(self):
+        from recommendation_engine.neighbour_table import compute_user_neighbours
+        on_request = CollaborativeFilteringRecommender(self.user_interactions, self.articles_metadata,
+                                                       dict(self.config, user_neighbours='on_request'))
+        matrix = on_request.user_article_matrix
+        table = compute_user_neighbours(matrix, 3, n_workers=1)
+        # Blocs répartis sur plusieurs processus, lancés depuis un thread comme à l'init du moteur : même résultat,
+        # workers démarrés par 'spawn' (pas de fork d'un processus multi-thread)
+        from concurrent.futures import ThreadPoolExecutor
+        from unittest.mock import patch
+        import recommendation_engine.neighbour_table as neighbour_table
+        with patch.object(neighbour_table, 'ProcessPoolExecutor', wraps=neighbour_table.ProcessPoolExecutor) as pool, \
+                ThreadPoolExecutor(max_workers=1) as threads:
+            parallel_table = threads.submit(compute_user_neighbours, matrix, 3, block_size=2, n_workers=2).result()
+        self.assertEqual(pool.call_args.kwargs['mp_context'].get_start_method(), 'spawn')
+        for name, array in table.items():
+            np.testing.assert_array_equal(parallel_table[name], array)
+        self.assertEqual(table['user_neighbours.indices'].dtype, np.int32)
+        self.assertEqual(table['user_neighbours.similarities'].dtype, np.float32)
+
+        from sklearn.metrics.pairwise import cosine_similarity
+        reference = cosine_similarity(matrix)
+        for user_idx, (neighbours, similarities) in enumerate(zip(*table.values())):
+            valid = neighbours >= 0
+            expected = [i for i in np.argsort(-reference[user_idx], kind='stable') if i != user_idx and reference[user_idx, i] > 0][:3]
+            self.assertEqual(neighbours[valid].tolist(), expected)
+            np.testing.assert_allclose(similarities[valid], reference[user_idx, expected], rtol=1e-5)
+
+        recommender = CollaborativeFilteringRecommender(self.user_interactions, self.articles_metadata,
+                                                        dict(self.config, user_neighbours='auto'), artifacts=table)
+        self.assertIsNotNone(recommender.neighbour_indices)
+        self.assertEqual(recommender.recommend(1, 5), on_request.recommend(1, 5))
+
+    def test_item_item_collaborative_mode(self):
+        config = dict(self.config, collaborative_mode='item', item_similarity_top_k=20, neighbour_workers=1)
+        recommender = CollaborativeFilteringRecommender(self.user_interactions, self.articles_metadata, config)
+        self.assertIsNone(recommender.neighbour_indices)
+        scores = recommender.recommend(3, 3)
+
+        # Référence dense : vecteur de lecture x similarité cosinus article-article (sans la diagonale)
+        from sklearn.metrics.pairwise import cosine_similarity
+        matrix = recommender.user_article_matrix
+        item_similarity = cosine_similarity(matrix.T)
+        np.fill_diagonal(item_similarity, 0)
+        reference = np.asarray(matrix[recommender.user_to_idx[3]] @ item_similarity).ravel()
+        read = {11, 14, 15, 16}
+        candidates = [i for i in np.argsort(-reference, kind='stable')
+                      if reference[i] > 0 and recommender.article_ids[i] not in read][:3]
+        self.assertEqual(list(scores), recommender.article_ids[candidates].tolist())
+        for article_id in read:
+            self.assertNotIn(article_id, scores)
+
+        # Table précalculée (artefacts) : mêmes recommandations
+        from recommendation_engine.neighbour_table import compute_item_neighbours
+        table = compute_item_neighbours(matrix, 20, n_workers=1)
+        precomputed = CollaborativeFilteringRecommender(self.user_interactions, self.articles_metadata, config, artifacts=table)
+        self.assertEqual(precomputed.recommend(3, 3), scores)
+        self.assertEqual(recommender.recommend(99999, 3), {})
+
+    def test_matrix_factorization_mode(self):
+        from recommendation_engine.matrix_factorization import solve_als_block, train_implicit_als
+        base = CollaborativeFilteringRecommender(self.user_interactions, self.articles_metadata, self.config)
+        matrix = base.user_article_matrix
+
+        # Demi-étape par lots == résolution dense utilisateur par utilisateur
+        rng = np.random.default_rng(0)
+        item_factors = rng.standard_normal((matrix.shape[1], 4)).astype(np.float32)
+        solved = solve_als_block(csr_matrix(matrix, dtype=np.float32), item_factors, item_factors.T @ item_factors, 0.1, 40.0)
+        dense = matrix.toarray()
+        for user_idx in range(matrix.shape[0]):
+            confidence = 1 + 40.0 * dense[user_idx]
+            lhs = item_factors.T @ (confidence[:, None] * item_factors) + 0.1 * np.eye(4)
+            rhs = item_factors.T @ (confidence * (dense[user_idx] > 0))
+            np.testing.assert_allclose(solved[user_idx], np.linalg.solve(lhs, rhs), rtol=1e-3, atol=1e-4)
+
+        factors = train_implicit_als(matrix, n_factors=4, iterations=3, n_workers=2, block_nnz=3)
+        self.assertEqual(factors['mf.user_factors'].shape, (matrix.shape[0], 4))
+        self.assertEqual(factors['mf.item_factors'].dtype, np.float32)
+        config = dict(self.config, collaborative_mode='mf')
+        recommender = CollaborativeFilteringRecommender(self.user_interactions, self.articles_metadata, config,
+                                                        artifacts=factors)
+        scores = recommender.recommend(1, 4)
+        self.assertEqual(len(scores), 4)
+        for article_id in (10, 11, 12):
+            self.assertNotIn(article_id, scores)
+        expected = factors['mf.item_factors'] @ factors['mf.user_factors'][recommender.user_to_idx[1]]
+        unread = [i for i, article_id in enumerate(recommender.article_ids) if article_id not in (10, 11, 12)]
+        top_idx = recommender.article_to_idx[list(scores)[0]]
+        self.assertAlmostEqual(float(expected[top_idx]), float(expected[unread].max()), places=5)
+
+    def test_interaction_delta(self):
+        config = dict(self.config, user_neighbours='on_request')
+        recommender = CollaborativeFilteringRecommender(self.user_interactions, self.articles_metadata, config)
+        new_clicks = [(500, 10), (500, 11), (500, 18), (2, 19)]  # nouvel utilisateur + utilisateur existant
+        for user_id, article_id in new_clicks:
+            recommender.interactions.add_interaction(user_id, article_id)
+
+        # Base + delta == reconstruction complète avec les nouveaux clics
+        extra = pd.DataFrame({'user_id': [u for u, _ in new_clicks], 'click_article_id': [a for _, a in new_clicks],
+                              'click_timestamp': 1678887600000})
+        rebuilt = CollaborativeFilteringRecommender(pd.concat([self.user_interactions, extra], ignore_index=True),
+                                                    self.articles_metadata, config)
+        for user_id in (1, 2, 3, 500):
+            self.assertEqual(recommender.recommend(user_id, 5).keys(), rebuilt.recommend(user_id, 5).keys())
+
+        # Nouvel article inconnu des métadonnées : nouvelle colonne, recommandable aussitôt
+        recommender.interactions.add_interaction(500, 999)
+        self.assertIn(999, recommender.recommend(1, 10))
+        before = {user_id: recommender.recommend(user_id, 10) for user_id in (1, 2, 500)}
+
+        self.assertTrue(recommender.interactions.compact())
+        self.assertEqual(recommender.interactions.delta_size, 0)
+        self.assertEqual(recommender.user_article_matrix.shape, (len(recommender.user_to_idx), 12))
+        for user_id, scores in before.items():
+            self.assertEqual(recommender.recommend(user_id, 10), scores)
+
+    def test_minhash_lsh_neighbour_search(self):
+        from recommendation_engine.minhash_lsh import MinHashLSH
+        rng = np.random.default_rng(0)
+        dense = (rng.random((200, 300)) < 0.05).astype(np.float64)
+        dense[199] = dense[3]  # ensemble identique : toujours candidat
+        matrix = csr_matrix(dense)
+        index = MinHashLSH.build(matrix, n_hashes=32, n_bands=8)
+        self.assertIn(3, index.candidates(matrix[199].indices))
+        self.assertIn(199, index.candidates(matrix[3].indices))
+        self.assertEqual(len(index.candidates(np.array([], dtype=np.int32))), 0)
+
+        # Une bande par minimum : candidats = utilisateurs ayant un article en commun (sur ces données), même voisinage
+        exact = CollaborativeFilteringRecommender(self.user_interactions, self.articles_metadata,
+                                                  dict(self.config, user_neighbours='on_request'))
+        config = dict(self.config, user_neighbours='on_request', neighbour_search='lsh', lsh_hashes=128, lsh_bands=128)
+        recommender = CollaborativeFilteringRecommender(self.user_interactions, self.articles_metadata, config)
+        for user_idx in range(len(recommender.user_to_idx)):
+            for expected, found in zip(exact._find_similar_users(user_idx, 10), recommender._find_similar_users(user_idx, 10)):
+                np.testing.assert_allclose(found, expected, rtol=1e-6)
+
+        # Nouvel utilisateur : trouvé via le delta, puis via l'index mis à jour par la compaction
+        recommender.interactions.add_interaction(500, 12)
+        self.assertIn(recommender.user_to_idx[500], recommender._find_similar_users(recommender.user_to_idx[1], 10)[0])
+        recommender.interactions.compact()
+        self.assertIn(recommender.user_to_idx[500], recommender.lsh_index.candidates(recommender.user_article_matrix[0].indices))
+        self.assertIn(recommender.user_to_idx[500], recommender._find_similar_users(recommender.user_to_idx[1], 10)[0])
+
+    def test_shared_engine_state(self):
+        import tempfile
+        from recommendation_engine.shared_state import SharedEngineState, state_key
+        root = tempfile.mkdtemp()
+        builds = []
+
+        def build():
+            recommender = ContentBasedRecommender(self.user_interactions, self.articles_metadata, self.embeddings_optimized,
+                                                  self.article_id_to_embedding_idx, self.config)
+            builds.append(recommender)
+            return recommender.derived_arrays
+
+        # Premier worker : construction ; second : simple mappage en lecture seule
+        first = SharedEngineState(root, 'v1', self.config)
+        first.attach_or_build(build)
+        second = SharedEngineState(root, 'v1', self.config)
+        arrays = second.attach_or_build(build)
+        self.assertEqual(len(builds), 1)
+        self.assertIsInstance(arrays['content.normalized_embeddings'], np.memmap)
+        self.assertFalse(arrays['content.normalized_embeddings'].flags.writeable)
+
+        attached = ContentBasedRecommender(self.user_interactions, self.articles_metadata, self.embeddings_optimized,
+                                           self.article_id_to_embedding_idx, self.config, artifacts=arrays)
+        self.assertIs(attached.normalized_embeddings, arrays['content.normalized_embeddings'])
+        self.assertEqual(attached.derived_arrays, {})
+        self.assertEqual(attached.recommend(1, 5), builds[0].recommend(1, 5))
+
+        # Premier worker : ses copies privées sont remplacées par les tableaux mappés, sans reconstruction
+        builds[0].use_shared_arrays(arrays)
+        self.assertIs(builds[0].normalized_embeddings, arrays['content.normalized_embeddings'])
+        self.assertEqual(builds[0].recommend(1, 5), attached.recommend(1, 5))
+
+        # La matrice utilisateur-article CF est partagée de la même façon (tableaux CSR)
+        from recommendation_engine.collaborative_filtering import USER_ARTICLE_ARRAYS
+        collaborative = CollaborativeFilteringRecommender(self.user_interactions, self.articles_metadata, self.config)
+        csr_arrays = {name: collaborative.derived_arrays[name] for name in USER_ARTICLE_ARRAYS}
+        reloaded = CollaborativeFilteringRecommender(self.user_interactions, self.articles_metadata, self.config,
+                                                     artifacts=csr_arrays)
+        self.assertTrue(np.shares_memory(reloaded.user_article_matrix.data, csr_arrays[USER_ARTICLE_ARRAYS[2]]))
+        self.assertNotIn(USER_ARTICLE_ARRAYS[0], reloaded.derived_arrays)
+        self.assertEqual(reloaded.recommend(1, 5), collaborative.recommend(1, 5))
+
+        # Changement de version : l'ancien état n'est supprimé qu'une fois libéré par tous les workers
+        SharedEngineState(root, 'v2', self.config).attach_or_build(dict)
+        self.assertEqual(SharedEngineState.cleanup(root, keep=[state_key('v2', self.config)]), [])
+        first.release()
+        second.release()
+        self.assertEqual(SharedEngineState.cleanup(root, keep=[state_key('v2', self.config)]), [first.key])
+        self.assertEqual(sorted(os.listdir(root)), sorted([state_key('v2', self.config), state_key('v2', self.config) + '.lock']))
+        shutil.rmtree(root)
+
+    def test_shared_engine_state_write_failure(self):
+        import errno
+        import tempfile
+        from collections import namedtuple
+        from unittest.mock import patch
+        from recommendation_engine.shared_state import SharedEngineState, build_with_shared_state
+        root = tempfile.mkdtemp()
+        builds = []
+
+        def build(artifacts):
+            recommender = ContentBasedRecommender(self.user_interactions, self.articles_metadata, self.embeddings_optimized,
+                                                  self.article_id_to_embedding_idx, self.config, artifacts=artifacts)
+            builds.append(recommender)
+            return recommender
+
+        # /dev/shm trop petit (refus avant écriture), puis écriture interrompue : moteur privé servi, construit une fois
+        disk_full = namedtuple('usage', 'total used free')(64 << 20, 64 << 20, 0)
+        failures = [patch('recommendation_engine.shared_state.shutil.disk_usage', return_value=disk_full),
+                    patch('recommendation_engine.shared_state.np.save', side_effect=OSError(errno.ENOSPC, 'No space left'))]
+        for failure in failures:
+            builds.clear()
+            with failure:
+                engine = build_with_shared_state(SharedEngineState(root, 'v1', self.config), build, {})
+            self.assertEqual(builds, [engine])
+            self.assertFalse(hasattr(engine, 'shared_state'))
+            self.assertNotIsInstance(engine.normalized_embeddings, np.memmap)
+            self.assertEqual(len(engine.recommend(1, 5)), 5)
+            self.assertEqual([name for name in os.listdir(root) if not name.endswith('.lock')], [])
+
+        # Sans erreur : état écrit et mappé
+        engine = build_with_shared_state(SharedEngineState(root, 'v1', self.config), build, {})
+        self.assertIsInstance(engine.normalized_embeddings, np.memmap)
+        engine.shared_state.release()
+        shutil.rmtree(root)
+
+    def test_threshold_fusion_matches_dense_fusion(self):
+        from recommendation_engine.score_fusion import DenseScoreFusion, ThresholdFusion
+        rng = np.random.default_rng(0)
+        n_articles = 5000
+        names = ('content_based', 'collaborative', 'popularity')
+        # Listes de candidats triées par score décroissant, en partie communes, comme celles des composants
+        components = []
+        for weight, size in zip((0.4, 0.3, 0.3), (400, 150, 400)):
+            rows = rng.choice(1000, size, replace=False)
+            scores = np.sort(rng.random(size).astype(np.float32))[::-1]
+            components.append((rows, scores, weight))
+        excluded = rng.choice(1000, 30, replace=False)
+
+        dense, threshold = DenseScoreFusion(n_articles), ThresholdFusion(n_articles, names)
+        for n_results in (1, 10, 50, 2000):
+            expected_rows, expected_scores = dense.fuse(components, excluded, n_results)
+            rows, scores = threshold.fuse(components, excluded, n_results)
+            np.testing.assert_allclose(scores, expected_scores, rtol=1e-6)
+            self.assertEqual(rows.tolist(), expected_rows.tolist())
+        # Arrêt anticipé : pour un petit k, les longues listes ne sont lues qu'en partie
+        threshold = ThresholdFusion(n_articles, names)
+        threshold.fuse(components, excluded, 10)
+        stats = threshold.depth_stats()
+        self.assertEqual(stats['rounds'], threshold.total_rounds)
+        self.assertLess(stats['content_based'], len(components[0][0]))
+        self.assertLess(stats['popularity'], len(components[2][0]))
+        # Liste vide et k nul
+        self.assertEqual(len(threshold.fuse([components[0], (np.empty(0), np.empty(0), 0.3), components[2]], excluded, 0)[0]), 0)
+        rows, _ = threshold.fuse([components[0], (np.empty(0, dtype=np.int64), np.empty(0), 0.3), components[2]], excluded, 5)
+        self.assertEqual(rows.tolist(), dense.fuse([components[0], components[2]], excluded, 5)[0].tolist())
+
+    def test_user_interaction_index(self):
+        # Ids épars (10001, 10002) : recherche dichotomique ; ids compacts : table dense
+        for interactions in (self.user_interactions, self.user_interactions[self.user_interactions['user_id'] < 10]):
+            index = UserInteractionIndex(interactions)
+            self.assertEqual(index.count(3), 4)
+            self.assertEqual(index.count(99999), 0)
+            self.assertEqual(index.count(-1), 0)
+            self.assertEqual(index.latest_articles(3, 2).tolist(), [16, 15])
+            self.assertEqual(index.history(1).tolist(), [10, 11, 12])
+            self.assertEqual(index.read_articles(2).tolist(), [10, 13])
+            self.assertEqual(len(index.read_articles(99999)), 0)
+
 if __name__ == '__main__':
     unittest.main()
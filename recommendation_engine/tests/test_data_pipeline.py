@@ -0,0 +1,230 @@
+import unittest
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from recommendation_engine.bundle import compile_bundle, load_bundle, load_arrays, add_arrays_to_bundle, BundleError, INTERACTION_DTYPES
+from recommendation_engine.popularity_tier import PopularityTier, POPULARITY_TIER_ARRAYS
+from recommendation_engine.jsonl_reader import read_json_lines, prefetch_chunks
+from recommendation_engine.blob_download import download_blobs
+from recommendation_engine.artifact_cache import ArtifactCache
+from recommendation_engine.engine_holder import EngineHolder
+
+BUNDLE_TEST_PATH = "processed_data_pipeline_test/engine_bundle"
+DOWNLOAD_TEST_PATH = "processed_data_pipeline_test/downloads"
+
+class FakeBlobProperties:
+    def __init__(self, size, etag):
+        self.size = size
+        self.etag = etag
+
+class FakeDownloader:
+    def __init__(self, data):
+        self.data = data
+
+    def readall(self):
+        return self.data
+
+    def chunks(self):
+        yield self.data
+
+class FakeBlobClient:
+    """Client de blob adossé à un fichier local, compatible avec l'API utilisée par le moteur."""
+    def __init__(self, path, service):
+        self.path = path
+        self.service = service
+
+    def get_blob_properties(self):
+        stat = os.stat(self.path)
+        return FakeBlobProperties(stat.st_size, f"{stat.st_mtime_ns}-{stat.st_size}")
+
+    def download_blob(self, offset=0, length=None):
+        self.service.range_requests.append((os.path.basename(self.path), offset, length))
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return FakeDownloader(f.read() if length is None else f.read(length))
+
+class FakeBlobServiceClient:
+    """Remplace BlobServiceClient : un conteneur est un dossier local."""
+    def __init__(self, root):
+        self.root = root
+        self.range_requests = []
+
+    def get_blob_client(self, container, blob):
+        return FakeBlobClient(os.path.join(self.root, container, blob), self)
+
+def create_dummy_frames():
+    user_interactions = pd.DataFrame({
+        'user_id': [1, 1, 1, 2, 2, 3],
+        'session_id': [101, 101, 102, 201, 202, 301],
+        'click_article_id': [10, 11, 12, 10, 13, 11],
+        'click_timestamp': [1678886400000, 1678886500000, 1678886600000, 1678886700000, 1678886800000, 1678886900000]
+    })
+    articles_metadata = pd.DataFrame({
+        'article_id': [10, 11, 12, 13],
+        'category_id': [1, 2, 1, 3],
+        'created_at_ts': [1678886000000] * 4,
+        'publisher_id': [1, 1, 2, 2],
+        'words_count': [100, 120, 150, 110]
+    })
+    embeddings = np.random.rand(len(articles_metadata), 8).astype(np.float32)
+    data_summary = {"total_interactions": len(user_interactions)}
+    return articles_metadata, user_interactions, embeddings, data_summary
+
+class TestEngineBundle(unittest.TestCase):
+    def setUp(self):
+        self.articles_metadata, self.user_interactions, self.embeddings, self.data_summary = create_dummy_frames()
+        self.manifest = compile_bundle(self.articles_metadata, self.user_interactions,
+                                       self.embeddings, self.data_summary, BUNDLE_TEST_PATH)
+
+    def tearDown(self):
+        shutil.rmtree(os.path.dirname(BUNDLE_TEST_PATH), ignore_errors=True)
+
+    def test_round_trip_is_memory_mapped(self):
+        bundle = load_bundle(BUNDLE_TEST_PATH, verify_checksums=True)
+        self.assertIsInstance(bundle.embeddings, np.memmap)
+        np.testing.assert_array_equal(bundle.embeddings, self.embeddings)
+        self.assertEqual(list(bundle.user_interactions.columns), list(self.user_interactions.columns))
+        np.testing.assert_array_equal(bundle.user_interactions['click_timestamp'], self.user_interactions['click_timestamp'])
+        self.assertEqual(bundle.user_interactions['click_timestamp'].dtype, np.int64)
+        self.assertEqual(bundle.data_summary, self.data_summary)
+        np.testing.assert_array_equal(bundle.get_array('id_maps.user_ids'), [1, 2, 3])
+
+    def test_checksum_mismatch_is_detected(self):
+        path = os.path.join(BUNDLE_TEST_PATH, self.manifest['arrays']['embeddings']['file'])
+        with open(path, 'r+b') as f:
+            f.seek(-4, os.SEEK_END)
+            f.write(b'\xff\xff\xff\xff')
+        with self.assertRaises(BundleError):
+            load_bundle(BUNDLE_TEST_PATH, verify_checksums=True)
+
+    def test_add_arrays_keeps_data_version(self):
+        add_arrays_to_bundle(BUNDLE_TEST_PATH, {'extra.table': np.arange(3, dtype=np.int32)})
+        bundle = load_bundle(BUNDLE_TEST_PATH, verify_checksums=True)
+        self.assertEqual(bundle.data_version, self.manifest['data_version'])
+        np.testing.assert_array_equal(bundle.get_array('extra.table'), [0, 1, 2])
+
+    def test_popularity_tier_from_bundle(self):
+        arrays = load_arrays(BUNDLE_TEST_PATH, POPULARITY_TIER_ARRAYS + ('user_interactions.user_id', 'user_interactions.click_article_id'))
+        tier = PopularityTier.from_arrays(arrays)
+        recommendations = tier.recommend(2, 2)  # L'utilisateur 2 a lu 10 et 13
+
+        self.assertEqual(len(recommendations), 2)
+        self.assertEqual(recommendations[0]['reason'], "Popularité/Tendance")
+        self.assertTrue({rec['article_id'] for rec in recommendations}.isdisjoint({10, 13}))
+        self.assertEqual(len({rec['category_id'] for rec in recommendations}), 2)
+
+class TestJsonLinesReader(unittest.TestCase):
+    def test_chunked_parsing_matches_full_parse(self):
+        _, user_interactions, _, _ = create_dummy_frames()
+        text = user_interactions.to_json(orient='records', lines=True).encode('utf-8')
+        # Blocs de 7 octets : les lignes sont coupées à des positions arbitraires
+        chunks = [text[i:i + 7] for i in range(0, len(text), 7)]
+        parsed = read_json_lines(prefetch_chunks(iter(chunks)), INTERACTION_DTYPES, expected_rows=2)
+
+        self.assertEqual(list(parsed.columns), list(user_interactions.columns))
+        self.assertEqual(parsed['user_id'].dtype, np.int32)
+        self.assertEqual(parsed['click_timestamp'].dtype, np.int64)
+        for col in user_interactions.columns:
+            np.testing.assert_array_equal(parsed[col].to_numpy(), user_interactions[col].to_numpy())
+
+class TestBlobDownload(unittest.TestCase):
+    def setUp(self):
+        self.container_path = os.path.join(DOWNLOAD_TEST_PATH, 'source', 'processed-data')
+        os.makedirs(self.container_path)
+        self.payloads = {'small.bin': os.urandom(10), 'large.bin': os.urandom(1000), 'empty.bin': b''}
+        for name, payload in self.payloads.items():
+            with open(os.path.join(self.container_path, name), 'wb') as f:
+                f.write(payload)
+
+    def tearDown(self):
+        shutil.rmtree(os.path.dirname(DOWNLOAD_TEST_PATH), ignore_errors=True)
+
+    def test_ranged_concurrent_download(self):
+        client = FakeBlobServiceClient(os.path.join(DOWNLOAD_TEST_PATH, 'source'))
+        destinations = {name: os.path.join(DOWNLOAD_TEST_PATH, name) for name in self.payloads}
+        sizes = download_blobs(client, 'processed-data', destinations, max_concurrency=4, range_size=64)
+
+        self.assertEqual(sizes['large.bin'], 1000)
+        for name, payload in self.payloads.items():
+            with open(destinations[name], 'rb') as f:
+                self.assertEqual(f.read(), payload)
+        # 1000 octets en plages de 64 -> 16 requêtes pour le gros blob
+        self.assertEqual(sum(1 for name, _, _ in client.range_requests if name == 'large.bin'), 16)
+
+    def test_artifact_cache_reuses_unchanged_blobs(self):
+        client = FakeBlobServiceClient(os.path.join(DOWNLOAD_TEST_PATH, 'source'))
+        cache = ArtifactCache(os.path.join(DOWNLOAD_TEST_PATH, 'cache'), range_size=64)
+        paths = cache.fetch(client, 'processed-data', ['small.bin', 'large.bin'])
+        self.assertEqual(sorted(cache.last_fetch_misses), ['large.bin', 'small.bin'])
+
+        # Redémarrage : seules les propriétés sont lues
+        client.range_requests.clear()
+        cached_paths = ArtifactCache(os.path.join(DOWNLOAD_TEST_PATH, 'cache')).fetch(client, 'processed-data', ['small.bin', 'large.bin'])
+        self.assertEqual(cached_paths, paths)
+        self.assertEqual(client.range_requests, [])
+
+        # Nouvelle version du blob : nouvelle entrée, l'ancienne est évincée si le budget est dépassé
+        with open(os.path.join(self.container_path, 'large.bin'), 'wb') as f:
+            f.write(os.urandom(1200))
+        cache = ArtifactCache(os.path.join(DOWNLOAD_TEST_PATH, 'cache'), max_bytes=1500)
+        new_paths = cache.fetch(client, 'processed-data', ['small.bin', 'large.bin'])
+        self.assertEqual(cache.last_fetch_misses, ['large.bin'])
+        self.assertNotEqual(new_paths['large.bin'], paths['large.bin'])
+        self.assertFalse(os.path.exists(paths['large.bin']))
+        self.assertEqual(os.path.getsize(new_paths['large.bin']), 1200)
+
+class TestEngineHolder(unittest.TestCase):
+    def setUp(self):
+        self.published_version = "v1"
+        self.builds = []
+
+    def build(self):
+        engine = {'version': self.published_version}
+        self.builds.append(engine)
+        return engine
+
+    def test_refresh_swaps_only_on_new_version(self):
+        holder = EngineHolder(lambda: self.published_version, self.build, check_interval_s=0)
+        old_engine = holder.load()
+        self.assertFalse(holder.refresh())
+
+        self.published_version = "v2"
+        self.assertTrue(holder.refresh())
+        self.assertEqual(holder.get()['version'], "v2")
+        self.assertEqual(holder.version, "v2")
+        # Une requête en cours garde sa référence vers l'ancien moteur
+        self.assertEqual(old_engine['version'], "v1")
+
+    def test_memory_budget_defers_swap(self):
+        holder = EngineHolder(lambda: self.published_version, self.build, memory_estimate_fn=lambda: 600,
+                              memory_budget_bytes=1000, check_interval_s=0)
+        holder.load()
+        self.published_version = "v2"
+        self.assertFalse(holder.refresh())
+        self.assertEqual(holder.get()['version'], "v1")
+
+        holder.release_on_budget_exceeded = True
+        self.assertTrue(holder.refresh())
+        self.assertEqual(holder.get()['version'], "v2")
+
+    def test_memory_budget_counts_engine_footprint(self):
+        # Bundle seul : deux copies de 400 octets tiennent ; avec 300 octets de tableaux dérivés par moteur, non
+        holder = EngineHolder(lambda: self.published_version, self.build, memory_estimate_fn=lambda: 400,
+                              memory_budget_bytes=1000, check_interval_s=0, engine_footprint_fn=lambda engine: 300)
+        holder.load()
+        self.published_version = "v2"
+        self.assertFalse(holder.refresh())
+        self.assertEqual(holder.get()['version'], "v1")
+
+        holder.memory_budget_bytes = 1400
+        self.assertTrue(holder.refresh())
+        self.assertEqual(holder.get()['version'], "v2")
+
+    def test_default_memory_budget(self):
+        from recommendation_engine.engine_holder import default_memory_budget_bytes
+        self.assertGreater(default_memory_budget_bytes(), 0)
+        self.assertLess(default_memory_budget_bytes(0.5), default_memory_budget_bytes(1.0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,5 @@
 import unittest
+from unittest.mock import patch
 import os
 import pandas as pd
 import numpy as np
@@ -7,8 +8,19 @@ import time
 import pickle # Import pickle
 import shutil # Import shutil for rmtree
 from recommendation_engine.recommender import RecommendationEngine
+from recommendation_engine.data_loader import DataLoader
+from recommendation_engine.bundle import compile_bundle
+from recommendation_engine.utils import normalize_scores
 from config import RECOMMENDATION_CONFIG
 
+def combine_scores_reference(component_scores, weights):
+    """Combinaison de référence, en dictionnaires : somme pondérée des scores {article_id: score} normalisés."""
+    combined = {}
+    for scores, weight in zip(component_scores, weights):
+        for article_id, score in normalize_scores(scores).items():
+            combined[article_id] = combined.get(article_id, 0.0) + score * weight
+    return combined
+
 # Helper function to create dummy processed_data for testing
 def create_dummy_processed_data(processed_data_path="processed_data_test/"):
     # Ensure the directory exists and is empty for a clean test environment
@@ -55,7 +67,13 @@ class TestRecommendationEngine(unittest.TestCase):
     def setUpClass(cls):
         # Create dummy data once for all tests in a dedicated test directory
         cls.test_data_path = create_dummy_processed_data()
-        cls.recommender = RecommendationEngine(data_path=cls.test_data_path)
+        loader = DataLoader(cls.test_data_path)
+        loader.load_legacy_data()
+        compile_bundle(loader.get_articles_metadata(), loader.get_user_interactions(),
+                       loader.get_embeddings_optimized(), loader.get_data_summary(), loader.bundle_path)
+        loader.load_all_data()
+        cls.recommender = RecommendationEngine(loader.get_articles_metadata(), loader.get_user_interactions(),
+                                               loader.get_embeddings_optimized(), loader.get_data_summary())
 
     def test_initialization(self):
         self.assertIsNotNone(self.recommender.user_interactions)
@@ -66,6 +84,8 @@ class TestRecommendationEngine(unittest.TestCase):
         self.assertIsNotNone(self.recommender.popularity_recommender)
         self.assertIsNotNone(self.recommender.collaborative_recommender)
         self.assertGreater(len(self.recommender.article_id_to_embedding_idx), 0)
+        self.assertEqual(set(self.recommender.component_build_times),
+                         {'content_based_recommender', 'collaborative_recommender', 'popularity_recommender'})
 
     def test_recommend_articles_existing_user(self):
         # User 1 has 3 interactions (10, 11, 12)
@@ -112,6 +132,68 @@ class TestRecommendationEngine(unittest.TestCase):
         self.assertIsInstance(recommendations[0], dict)
         self.assertEqual(recommendations[0]['reason'], "Popularité/Tendance") # Should be popularity-based (cold start path)
 
+    def test_ivf_index_with_quantized_embeddings(self):
+        engine = self.recommender
+        for quantization in ('none', 'float16', 'int8'):
+            with patch.dict(RECOMMENDATION_CONFIG, {'content_index': 'ivf', 'embedding_quantization': quantization,
+                                                    'ivf_n_lists': 4, 'ivf_nprobe': 4}):
+                ivf_engine = RecommendationEngine(engine.articles_metadata, engine.user_interactions,
+                                                  engine.embeddings_optimized, engine.data_summary)
+                self.assertIsNotNone(ivf_engine.content_based_recommender.ann_index)
+                self.assertEqual(len(ivf_engine.recommend_articles(1, 5)), 5)
+
+    def test_record_interaction_updates_read_filter_and_cold_start(self):
+        base = self.recommender
+        engine = RecommendationEngine(base.articles_metadata, base.user_interactions, base.embeddings_optimized,
+                                      base.data_summary)
+        # Article cliqué en ligne : exclu des recommandations suivantes
+        clicked = engine.recommend_articles(1, 5)[0]['article_id']
+        engine.record_interaction(1, clicked)
+        self.assertEqual(engine.user_index.count(1), 4)
+        self.assertNotIn(clicked, [rec['article_id'] for rec in engine.recommend_articles(1, 5)])
+
+        # Nouvel utilisateur : sort du cold start après min_interactions_collab clics
+        for article_id in (10, 11, 13):
+            engine.record_interaction(777, article_id)
+        recommendations = engine.recommend_articles(777, 5)
+        self.assertTrue(all(rec['reason'] == "Combinaison hybride" for rec in recommendations))
+        self.assertFalse({10, 11, 13} & {rec['article_id'] for rec in recommendations})
+        self.assertIsNotNone(engine.content_based_recommender._user_profile_centroid(777))
+
+    def test_dense_score_fusion_matches_dict_combination(self):
+        engine = self.recommender
+        user_id = 1
+        weights = engine.config['weights']
+        components = [
+            (*engine.content_based_recommender.recommend_candidates(user_id, 10), weights['content_based']),
+            (*engine.collaborative_recommender.recommend_candidates(user_id, 10), weights['collaborative']),
+            (*engine.popularity_recommender.recommend_candidates(user_id, 10), weights['popularity']),
+        ]
+        as_dicts = [dict(zip(engine.article_ids[rows].tolist(), scores.tolist())) for rows, scores, _ in components]
+        expected = combine_scores_reference(as_dicts, [weight for _, _, weight in components])
+
+        read_rows = np.array([engine.article_id_to_embedding_idx[article_id] for article_id in (10, 11, 12)])
+        rows, scores = engine.score_fusion.fuse(components, read_rows, len(expected))
+        fused = dict(zip(engine.article_ids[rows].tolist(), scores.tolist()))
+        self.assertEqual(set(fused), set(expected) - {10, 11, 12})
+        for article_id, score in fused.items():
+            self.assertAlmostEqual(score, expected[article_id], places=5)
+        self.assertTrue(np.all(np.diff(scores) <= 0))
+        # Le tampon est remis à zéro entre deux appels
+        rows_again, scores_again = engine.score_fusion.fuse(components, read_rows, len(expected))
+        np.testing.assert_allclose(scores_again, scores)
+
+    def test_threshold_fusion_mode(self):
+        engine = self.recommender
+        for user_id in (1, 3):
+            dense = engine.recommend_articles(user_id, 5)
+            with patch.dict(engine.config, {'fusion_mode': 'threshold'}):
+                threshold = engine.recommend_articles(user_id, 5)
+            self.assertEqual([rec['article_id'] for rec in threshold], [rec['article_id'] for rec in dense])
+            for rec, expected in zip(threshold, dense):
+                self.assertAlmostEqual(rec['score'], expected['score'], places=5)
+        self.assertEqual(engine.threshold_fusion.calls, 2)
+
     def test_performance(self):
         user_id = 1 # An existing user
         n_recs = 5
@@ -134,5 +216,19 @@ class TestRecommendationEngine(unittest.TestCase):
         if n_recs > 1:
             self.assertGreaterEqual(len(set(categories)), min(n_recs, 2)) # At least 2 unique categories if possible
 
+    def test_diversity_reranks_within_final_results(self):
+        engine = self.recommender
+        # Candidats fusionnés : deux articles de la catégorie 3 (13, 16), puis un article moins bien noté de la catégorie 1 (15)
+        rows = np.array([engine.article_id_to_embedding_idx[article_id] for article_id in (13, 16, 15)])
+        fused = (rows, np.array([0.9, 0.8, 0.1], dtype=np.float32))
+        with patch.object(engine.score_fusion, 'fuse', return_value=fused), \
+                patch.dict(engine.config, {'category_diversity_factor': 0.5}):
+            recommendations = engine.recommend_articles(1, 2)
+        # L'article d'une nouvelle catégorie remplace le second article de la catégorie 3
+        self.assertEqual([rec['article_id'] for rec in recommendations], [13, 15])
+        with patch.object(engine.score_fusion, 'fuse', return_value=fused), \
+                patch.dict(engine.config, {'category_diversity_factor': 0.0}):
+            self.assertEqual([rec['article_id'] for rec in engine.recommend_articles(1, 2)], [13, 16])
+
 if __name__ == '__main__':
     unittest.main()
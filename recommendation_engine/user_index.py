@@ -0,0 +1,98 @@
+import pandas as pd
+import numpy as np
+import logging
+import threading
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Au-delà de ce facteur (id max / nombre d'utilisateurs), la table de correspondance dense
+# coûterait trop de mémoire : on bascule sur une recherche dichotomique.
+DENSE_LOOKUP_MAX_RATIO = 4
+
+
+class UserInteractionIndex:
+    """
+    Index des interactions par utilisateur, partagé par tous les composants.
+
+    Les interactions sont triées par (utilisateur, timestamp) ; un tableau d'offsets donne la
+    tranche de chaque utilisateur. Le nombre d'interactions, l'historique chronologique et les
+    articles lus d'un utilisateur s'obtiennent sans parcourir tout le DataFrame.
+    Les clics reçus en ligne (`record_click`) sont gardés par utilisateur à côté de ces tableaux
+    et ajoutés à son historique par toutes les méthodes de lecture.
+    """
+    def __init__(self, user_interactions: pd.DataFrame):
+        logger.info("Building UserInteractionIndex...")
+        user_ids = user_interactions['user_id'].to_numpy()
+        article_ids = user_interactions['click_article_id'].to_numpy()
+        if 'click_timestamp' in user_interactions.columns:
+            timestamps = user_interactions['click_timestamp'].to_numpy()
+            order = np.lexsort((timestamps, user_ids))
+        else:
+            timestamps = np.zeros(len(user_ids), dtype=np.int64)
+            order = np.argsort(user_ids, kind='stable')
+
+        sorted_user_ids = user_ids[order]
+        self.article_ids = np.ascontiguousarray(article_ids[order], dtype=np.int32)
+        self.timestamps = np.ascontiguousarray(timestamps[order], dtype=np.int64)
+        self.user_ids, starts = np.unique(sorted_user_ids, return_index=True)
+        self.offsets = np.append(starts, len(sorted_user_ids)).astype(np.int64)
+
+        # Table dense id -> position quand les ids sont compacts (cas du jeu Globo : 0..N-1)
+        self._dense_positions = None
+        if len(self.user_ids) and self.user_ids[0] >= 0 \
+                and self.user_ids[-1] < DENSE_LOOKUP_MAX_RATIO * len(self.user_ids) + 1024:
+            self._dense_positions = np.full(int(self.user_ids[-1]) + 1, -1, dtype=np.int32)
+            self._dense_positions[self.user_ids] = np.arange(len(self.user_ids), dtype=np.int32)
+
+        self._lock = threading.Lock()
+        self._new_clicks = {}  # user_id -> articles cliqués en ligne, du plus ancien au plus récent
+
+        logger.info(f"UserInteractionIndex built: {len(self.user_ids)} users, {len(self.article_ids)} interactions.")
+
+    def position(self, user_id: int) -> int:
+        """Position de l'utilisateur dans l'index, ou -1 s'il n'a aucune interaction."""
+        if self._dense_positions is not None:
+            if 0 <= user_id < len(self._dense_positions):
+                return int(self._dense_positions[user_id])
+            return -1
+        pos = int(np.searchsorted(self.user_ids, user_id))
+        if pos < len(self.user_ids) and self.user_ids[pos] == user_id:
+            return pos
+        return -1
+
+    def _slice(self, user_id: int) -> slice:
+        pos = self.position(user_id)
+        if pos < 0:
+            return slice(0, 0)
+        return slice(self.offsets[pos], self.offsets[pos + 1])
+
+    def record_click(self, user_id: int, article_id: int):
+        """Ajoute un clic reçu en ligne (plus récent que l'historique connu) à l'historique de l'utilisateur."""
+        with self._lock:
+            self._new_clicks.setdefault(user_id, []).append(article_id)
+
+    def count(self, user_id: int) -> int:
+        """Nombre d'interactions de l'utilisateur."""
+        n_new_clicks = len(self._new_clicks.get(user_id, ()))
+        pos = self.position(user_id)
+        if pos < 0:
+            return n_new_clicks
+        return int(self.offsets[pos + 1] - self.offsets[pos]) + n_new_clicks
+
+    def history(self, user_id: int) -> np.ndarray:
+        """Articles cliqués par l'utilisateur, du plus ancien au plus récent."""
+        history = self.article_ids[self._slice(user_id)]
+        new_clicks = self._new_clicks.get(user_id)
+        if new_clicks:
+            history = np.concatenate((history, np.array(new_clicks, dtype=np.int32)))
+        return history
+
+    def latest_articles(self, user_id: int, n: int) -> np.ndarray:
+        """Les `n` derniers articles cliqués, du plus récent au plus ancien."""
+        history = self.history(user_id)
+        return history[::-1][:n]
+
+    def read_articles(self, user_id: int) -> np.ndarray:
+        """Articles distincts lus par l'utilisateur (triés)."""
+        return np.unique(self.history(user_id))
@@ -0,0 +1,162 @@
+import numpy as np
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+from .user_index import UserInteractionIndex
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_WINDOW = 5
+DEFAULT_MAX_USERS = 50000
+# Nombre d'utilisateurs traités à la fois lors du calcul initial (borne la mémoire temporaire)
+BUILD_BLOCK_SIZE = 65536
+
+
+class UserProfileStore:
+    """
+    Profils utilisateurs content-based : centroïde des embeddings des `window` derniers articles cliqués.
+
+    Les profils des `max_users` utilisateurs les plus récemment actifs sont calculés à l'initialisation en
+    une passe vectorisée. Chaque profil garde la fenêtre de ses derniers articles (lignes d'embeddings,
+    -1 si l'embedding est absent) et la somme de leurs embeddings : un nouveau clic met à jour la somme
+    en O(dim). Les autres utilisateurs sont calculés à la demande ; au-delà de `max_users`, le profil
+    le moins récemment utilisé est évincé, puis recalculé depuis l'index au besoin (qui reçoit aussi les
+    clics en ligne, voir `UserInteractionIndex.record_click`).
+    """
+    def __init__(self, user_index: UserInteractionIndex, article_ids: np.ndarray, embeddings: np.ndarray,
+                 window: int = DEFAULT_PROFILE_WINDOW, max_users: int = DEFAULT_MAX_USERS):
+        logger.info("Building UserProfileStore...")
+        self.user_index = user_index
+        self.embeddings = embeddings
+        self.window = window
+        self.max_users = max(1, max_users)
+        self._lock = threading.Lock()
+
+        # Correspondance article_id -> ligne d'embedding (recherche dichotomique dans les ids triés)
+        n_rows = min(len(article_ids), embeddings.shape[0])
+        self._article_order = np.argsort(article_ids[:n_rows], kind='stable')
+        self._sorted_article_ids = np.asarray(article_ids[:n_rows])[self._article_order]
+
+        dim = embeddings.shape[1]
+        self._windows = np.full((self.max_users, window), -1, dtype=np.int32)
+        self._sums = np.zeros((self.max_users, dim), dtype=np.float32)
+        self._counts = np.zeros(self.max_users, dtype=np.int32)
+        self._appends_since_sync = np.zeros(self.max_users, dtype=np.int32)
+        self._slots = OrderedDict()  # user_id -> slot, du moins au plus récemment utilisé
+        self._free_slots = list(range(self.max_users - 1, -1, -1))
+
+        self._preload_active_users()
+        logger.info(f"UserProfileStore built: {len(self._slots)} profiles (capacity {self.max_users}).")
+
+    def _article_rows(self, article_ids: np.ndarray) -> np.ndarray:
+        """Lignes d'embeddings des articles (-1 si l'article n'a pas d'embedding)."""
+        article_ids = np.asarray(article_ids)
+        if len(self._sorted_article_ids) == 0:
+            return np.full(article_ids.shape, -1, dtype=np.int32)
+        pos = np.minimum(np.searchsorted(self._sorted_article_ids, article_ids), len(self._sorted_article_ids) - 1)
+        found = self._sorted_article_ids[pos] == article_ids
+        return np.where(found, self._article_order[pos], -1).astype(np.int32)
+
+    def _preload_active_users(self):
+        """Calcule en une passe vectorisée les profils des utilisateurs les plus récemment actifs."""
+        index = self.user_index
+        n_users = len(index.user_ids)
+        if n_users == 0:
+            return
+        last_click = index.timestamps[index.offsets[1:] - 1]
+        # Les plus actifs en dernier, pour que l'ordre LRU les garde le plus longtemps
+        positions = np.argsort(last_click, kind='stable')[-self.max_users:]
+
+        for block_start in range(0, len(positions), BUILD_BLOCK_SIZE):
+            block = positions[block_start:block_start + BUILD_BLOCK_SIZE]
+            starts, ends = index.offsets[block], index.offsets[block + 1]
+            # Fenêtre alignée à droite : colonne window-1 = clic le plus récent
+            click_positions = ends[:, None] - self.window + np.arange(self.window)
+            in_history = click_positions >= starts[:, None]
+            rows = self._article_rows(index.article_ids[np.where(in_history, click_positions, 0)])
+            rows[~in_history] = -1
+
+            slots = np.array([self._free_slots.pop() for _ in range(len(block))], dtype=np.int64)
+            self._windows[slots] = rows
+            sums = np.zeros((len(block), self._sums.shape[1]), dtype=np.float32)
+            for column in range(self.window):
+                valid = rows[:, column] >= 0
+                sums[valid] += self.embeddings[rows[valid, column]]
+            self._sums[slots] = sums
+            self._counts[slots] = (rows >= 0).sum(axis=1)
+            self._slots.update(zip(index.user_ids[block].tolist(), slots.tolist()))
+
+    def _acquire_slot(self, user_id: int) -> int:
+        if self._free_slots:
+            slot = self._free_slots.pop()
+        else:
+            _, slot = self._slots.popitem(last=False)
+        self._slots[user_id] = slot
+        return slot
+
+    def _sync(self, slot: int):
+        """Recalcule la somme depuis la fenêtre (limite la dérive des mises à jour incrémentales)."""
+        rows = self._windows[slot][self._windows[slot] >= 0]
+        self._sums[slot] = np.asarray(self.embeddings[np.sort(rows)], dtype=np.float32).sum(axis=0)
+        self._counts[slot] = len(rows)
+        self._appends_since_sync[slot] = 0
+
+    def _load(self, user_id: int) -> Optional[int]:
+        """Calcule le profil d'un utilisateur absent du cache depuis son historique (None sans historique)."""
+        latest_articles = self.user_index.latest_articles(user_id, self.window)
+        if len(latest_articles) == 0:
+            return None
+        slot = self._acquire_slot(user_id)
+        self._windows[slot] = -1
+        self._windows[slot, self.window - len(latest_articles):] = self._article_rows(latest_articles[::-1])
+        self._sync(slot)
+        return slot
+
+    def _slot(self, user_id: int) -> Optional[int]:
+        slot = self._slots.get(user_id)
+        if slot is not None:
+            self._slots.move_to_end(user_id)
+            return slot
+        return self._load(user_id)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._slots
+
+    def centroid(self, user_id: int) -> Optional[np.ndarray]:
+        """Centroïde des derniers articles de l'utilisateur (None sans historique ni embedding disponible)."""
+        with self._lock:
+            slot = self._slot(user_id)
+            if slot is None or self._counts[slot] == 0:
+                return None
+            return self._sums[slot] / self._counts[slot]
+
+    def append_click(self, user_id: int, article_id: int):
+        """
+        Ajoute un clic (plus récent que l'historique connu) au profil de l'utilisateur, en O(dim).
+        """
+        with self._lock:
+            slot = self._slot(user_id)
+            if slot is None:
+                slot = self._acquire_slot(user_id)
+                self._windows[slot] = -1
+                self._sums[slot] = 0
+                self._counts[slot] = 0
+                self._appends_since_sync[slot] = 0
+            row = int(self._article_rows(np.array([article_id]))[0])
+            oldest = int(self._windows[slot, 0])
+            if oldest >= 0:
+                self._sums[slot] -= self.embeddings[oldest]
+                self._counts[slot] -= 1
+            self._windows[slot, :-1] = self._windows[slot, 1:]
+            self._windows[slot, -1] = row
+            if row >= 0:
+                self._sums[slot] += self.embeddings[row]
+                self._counts[slot] += 1
+            self._appends_since_sync[slot] += 1
+            if self._appends_since_sync[slot] >= self.window:
+                self._sync(slot)
@@ -30,6 +30,55 @@ def calculate_cosine_similarity(embedding_matrix: np.ndarray, vector: np.ndarray
         # Consider using approximate nearest neighbors (ANN) for production.
         return sk_cosine_similarity(embedding_matrix)
 
+def l2_normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    Retourne une copie float32 de la matrice dont chaque ligne est de norme L2 égale à 1
+    (les lignes nulles restent nulles). Un produit scalaire avec ces lignes donne la similarité cosinus.
+    """
+    normalized = np.array(matrix, dtype=np.float32)
+    norms = np.linalg.norm(normalized, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    normalized /= norms
+    return normalized
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices des `k` plus grands scores, triés par score décroissant.
+    Sélection en O(n) avec argpartition, puis tri des seuls k retenus.
+    Les scores à -inf (candidats exclus) ne sont jamais retournés.
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(len(scores))
+    top = top[np.argsort(-scores[top], kind='stable')]
+    return top[scores[top] > -np.inf]
+
+def top_k_per_row(scores: np.ndarray, k: int):
+    """
+    Version ligne par ligne de `top_k_indices` pour une matrice de scores.
+
+    Returns:
+        (indices de colonnes, scores), matrices (n_lignes x k) triées par score décroissant ;
+        les positions sans candidat (score -inf) ont l'indice -1.
+    """
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64), np.empty((scores.shape[0], 0), dtype=scores.dtype)
+    if k < scores.shape[1]:
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape).copy()
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind='stable')
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+    top[top_scores == -np.inf] = -1
+    return top, top_scores
+
 def normalize_scores(scores: dict) -> dict:
     """
     Normalise un dictionnaire de scores entre 0 et 1.
@@ -54,33 +103,38 @@ def get_top_n(scores: Dict[int, float], n: int) -> List[Dict]:
     top_n_articles = [{'article_id': article_id, 'score': score} for article_id, score in sorted_scores[:n]]
     return top_n_articles
 
-def filter_read_articles(recommendations: List[Dict], user_id: int, user_interactions: pd.DataFrame) -> List[Dict]:
-    """
-    Filtre les articles déjà lus par l'utilisateur des recommandations.
-    """
-    read_article_ids = user_interactions[user_interactions['user_id'] == user_id]['click_article_id'].unique()
-    filtered_recommendations = [rec for rec in recommendations if rec['article_id'] not in read_article_ids]
-    return filtered_recommendations
-
-def ensure_diversity(recommendations: List[Dict], articles_metadata: pd.DataFrame, diversity_factor: float = 0.2) -> List[Dict]:
+def ensure_diversity(recommendations: List[Dict], articles_metadata: pd.DataFrame, diversity_factor: float = 0.2,
+                     n_results: int = None) -> List[Dict]:
     """
     Assure la diversité des catégories dans les recommandations.
     Priorise les articles de catégories moins représentées si le facteur de diversité est élevé.
     Ceci est une implémentation simplifiée.
+
+    Avec `n_results`, la sélection se fait dans les `n_results` articles retournés, parmi un plus grand
+    nombre de candidats : un article d'une catégorie déjà retenue n'entre que tant que la liste compte
+    moins de n_results * (1 - diversity_factor) articles ; les places restantes vont aux meilleurs articles
+    de nouvelles catégories, puis, à défaut, aux meilleurs articles écartés.
     """
     if not recommendations:
         return []
 
-    # Map article_id to category_id
-    article_to_category = articles_metadata.set_index('article_id')['category_id'].to_dict()
+    # Map article_id to category_id (catégories déjà portées par les recommandations : pas de parcours du catalogue)
+    if all('category_id' in rec for rec in recommendations):
+        article_to_category = {rec['article_id']: rec['category_id'] for rec in recommendations}
+    else:
+        article_to_category = articles_metadata.set_index('article_id')['category_id'].to_dict()
     
+    budget = len(recommendations) if n_results is None else min(n_results, len(recommendations))
     final_recommendations = []
+    skipped_recommendations = []
     seen_categories = set()
     
     # Sort by score initially
     sorted_recs = sorted(recommendations, key=lambda x: x['score'], reverse=True)
     
     for rec in sorted_recs:
+        if len(final_recommendations) >= budget:
+            break
         category_id = article_to_category.get(rec['article_id'])
         
         if category_id is None: # Article not found in metadata, include it but log warning
@@ -96,8 +150,12 @@ def ensure_diversity(recommendations: List[Dict], articles_metadata: pd.DataFram
             # Only add if its score is significantly higher than others in its category,
             # or if we haven't reached n_recommendations yet and need more articles.
             # This is a heuristic. A more robust approach would involve re-ranking.
-            if len(final_recommendations) < len(recommendations) * (1 - diversity_factor):
+            if len(final_recommendations) < budget * (1 - diversity_factor):
                 final_recommendations.append(rec)
+            else:
+                skipped_recommendations.append(rec)
+    if n_results is not None:
+        final_recommendations.extend(skipped_recommendations[:budget - len(final_recommendations)])
     
     # Re-sort by score after diversity adjustment (if any)
     final_recommendations = sorted(final_recommendations, key=lambda x: x['score'], reverse=True)